@@ -0,0 +1,128 @@
+"""Measure the time for a new worker to produce its first Metadata.json.
+
+Run from the repository root, with the root on the import path:
+
+    PYTHONPATH=. python benchmarks/bench_bundle.py
+
+Bundles are given to workers three ways: pickled to a freshly spawned
+interpreter, forked before they have compiled anything, and forked after
+warm. The first two compile in the worker while the last inherits the
+compiled matchers. Spawned workers report the time spent importing
+separately. Nothing is compiled at import, so it is the same for the
+default bundle and one with its own top level domains and a large emoticon
+catalog.
+"""
+
+from __future__ import division
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import io
+import os
+import pickle
+import shutil
+import subprocess
+import sys
+import tempfile
+import timeit
+
+from chattools import bundle
+
+
+SHORTCUTS = 20000
+RUNS = 5
+MESSAGE = 'ship it :shortcut_42: (beer) @mary'
+SPAWNED = """
+import pickle, sys, timeit
+start = timeit.default_timer()
+import chattools.bundle
+imported = timeit.default_timer()
+extractor = pickle.loads(getattr(sys.stdin, 'buffer', sys.stdin).read())
+extractor({0!r}).json
+print(imported - start, timeit.default_timer() - imported)
+""".format(MESSAGE)
+
+
+def write_catalog(path):
+    """Write a catalog of generated shortcuts."""
+    with io.open(path, 'w', encoding='utf-8') as catalog_file:
+
+        for index in range(SHORTCUTS):
+
+            catalog_file.write(':shortcut_{0}:\tshortcut {0}\n'.format(index))
+
+
+def spawned(extractor):
+    """Get the seconds a new interpreter takes to import and to extract."""
+    child = subprocess.Popen(
+        (sys.executable, '-c', SPAWNED),
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+    )
+    output, _ = child.communicate(pickle.dumps(extractor))
+    imported, extracted = output.split()
+    return float(imported), float(extracted)
+
+
+def forked(extractor):
+    """Get the seconds a forked worker takes to extract, with no import."""
+    read, write = os.pipe()
+    child = os.fork()
+    if child == 0:  # pragma: no cover
+
+        start = timeit.default_timer()
+        extractor(MESSAGE).json  # pylint: disable=pointless-statement
+        os.write(write, '{0}'.format(
+            timeit.default_timer() - start,
+        ).encode('ascii'))
+        os._exit(0)  # pylint: disable=protected-access
+
+    os.close(write)
+    output = os.read(read, 64)
+    os.close(read)
+    os.waitpid(child, 0)
+    return 0.0, float(output)
+
+
+def main():
+    """Print the median time to the first Metadata.json of each worker."""
+    directory = tempfile.mkdtemp()
+    try:
+
+        path = os.path.join(directory, 'catalog.txt')
+        write_catalog(path)
+
+        def fresh():
+            """Create a bundle that has not compiled anything."""
+            return bundle.Bundle(
+                tlds=('com', 'net', 'org', 'io'),
+                catalog_path=path,
+            )
+
+        print('pickled bundle: {0} bytes'.format(len(pickle.dumps(fresh()))))
+        print('{0:>16} {1:>12} {2:>16}'.format(
+            'worker', 'import (ms)', 'first json (ms)',
+        ))
+        for name, measure in (
+                ('spawned default', lambda: spawned(bundle.Bundle())),
+                ('spawned', lambda: spawned(fresh())),
+                ('forked', lambda: forked(fresh())),
+                ('forked warm', lambda: forked(fresh().warm())),
+        ):
+
+            timings = [measure() for _ in range(RUNS)]
+            print('{0:>16} {1:>12.2f} {2:>16.2f}'.format(
+                name,
+                sorted(timing[0] for timing in timings)[RUNS // 2] * 1000,
+                sorted(timing[1] for timing in timings)[RUNS // 2] * 1000,
+            ))
+
+    finally:
+
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+
+    main()
@@ -0,0 +1,89 @@
+"""Benchmark the emoticon catalog matcher against catalog size.
+
+Run from the repository root, with the root on the import path:
+
+    PYTHONPATH=. python benchmarks/bench_catalog.py
+"""
+
+from __future__ import division
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import random
+import re
+import timeit
+
+from chattools import catalog
+
+
+SIZES = (10, 1000, 50000)
+MESSAGES = 1000
+REPEAT = 3
+
+
+def shortcuts(size):
+    """Generate a catalog of distinct shortcuts."""
+    return tuple(
+        (':emoji{0}:'.format(index), 'emoji{0}'.format(index))
+        for index in range(size)
+    )
+
+
+def messages(entries, count):
+    """Generate chat messages that use some of the catalog shortcuts."""
+    rng = random.Random(0)
+    words = ('hey', 'ship', 'it', '(beer)', 'today', ':)', 'team')
+    return tuple(
+        ' '.join(
+            rng.choice(entries)[0] if rng.random() < 0.2 else rng.choice(words)
+            for _ in range(20)
+        )
+        for _ in range(count)
+    )
+
+
+def main():
+    """Print compile time and matching throughput for each catalog size."""
+    print('{0:>8} {1:>12} {2:>14} {3:>14}'.format(
+        'entries', 'compile (s)', 'msgs/s (aho)', 'msgs/s (regex)',
+    ))
+    for size in SIZES:
+
+        entries = shortcuts(size)
+        corpus = messages(entries, MESSAGES)
+        start = timeit.default_timer()
+        automaton = catalog.Automaton(entries)
+        compiled = timeit.default_timer() - start
+
+        def aho():
+            """Match every message with the automaton."""
+            for text in corpus:
+
+                tuple(automaton.matches(text))
+
+        elapsed = min(timeit.repeat(aho, number=1, repeat=REPEAT))
+        regex_rate = 'n/a'
+        if size <= 1000:
+
+            patterns = tuple(re.compile(re.escape(key)) for key, _ in entries)
+
+            def regex():
+                """Match every message with one regex per shortcut."""
+                for text in corpus:
+
+                    for pattern in patterns:
+
+                        tuple(pattern.finditer(text))
+
+            regex_elapsed = min(timeit.repeat(regex, number=1, repeat=REPEAT))
+            regex_rate = '{0:.0f}'.format(MESSAGES / regex_elapsed)
+
+        print('{0:>8} {1:>12.3f} {2:>14.0f} {3:>14}'.format(
+            size, compiled, MESSAGES / elapsed, regex_rate,
+        ))
+
+
+if __name__ == '__main__':
+
+    main()
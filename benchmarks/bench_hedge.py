@@ -0,0 +1,90 @@
+"""Compare the tail latency of plain and hedged title fetches.
+
+Run from the repository root, with the root on the import path:
+
+    PYTHONPATH=. python benchmarks/bench_hedge.py
+
+A local origin answers most requests quickly but stalls on a small share of
+them. The same sequence of fetches is timed with the streaming body provider
+alone and through a HedgingFetcher, which races a second request against
+any that outlasts the host's p95.
+"""
+
+from __future__ import division
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import timeit
+
+from chattools import hedge
+from chattools import href
+from chattools import loadtest
+
+
+REQUESTS = 400
+FAST = 0.005
+SLOW = 0.3
+SLOW_RATE = 0.03
+
+
+def latency(rng):
+    """Stall on a small share of requests."""
+    return SLOW if rng.random() < SLOW_RATE else FAST
+
+
+def percentile(values, percent):
+    """Get a nearest rank percentile of some values."""
+    ordered = sorted(values)
+    rank = int(-(-percent * len(ordered) // 100))
+    return ordered[min(max(rank, 1), len(ordered)) - 1]
+
+
+def measure(body_provider, seed):
+    """Time each fetch of a fresh origin.
+
+    Args:
+        body_provider: A callable that accepts an href and produces the
+            content body or None.
+        seed: The seed of the origin's stalls.
+
+    Returns:
+        list of float: The seconds each fetch took.
+    """
+    latencies = []
+    with loadtest.StubOrigin(latency=latency, seed=seed) as origin:
+
+        for index in range(REQUESTS):
+
+            url = '{0}/{1}'.format(origin.url, index)
+            start = timeit.default_timer()
+            body_provider(url)
+            latencies.append(timeit.default_timer() - start)
+
+    return latencies
+
+
+def main():
+    """Print the latency percentiles of plain and hedged fetches."""
+    fetcher = hedge.HedgingFetcher()
+    print('{0:>7} {1:>9} {2:>9} {3:>9} {4:>7}'.format(
+        'fetch', 'p50 (ms)', 'p95 (ms)', 'p99 (ms)', 'hedges',
+    ))
+    for name, body_provider in (
+            ('plain', href.streaming_body_provider),
+            ('hedged', fetcher),
+    ):
+
+        latencies = measure(body_provider, 1)
+        print('{0:>7} {1:>9.1f} {2:>9.1f} {3:>9.1f} {4:>7}'.format(
+            name,
+            percentile(latencies, 50) * 1000,
+            percentile(latencies, 95) * 1000,
+            percentile(latencies, 99) * 1000,
+            fetcher.hedges if body_provider is fetcher else 0,
+        ))
+
+
+if __name__ == '__main__':
+
+    main()
@@ -0,0 +1,148 @@
+"""Simulate one noisy workspace sharing title fetches with quiet ones.
+
+Run from the repository root, with the root on the import path:
+
+    PYTHONPATH=. python benchmarks/bench_scheduler.py
+
+Fetches are simulated with a fixed sleep. The noisy workspace pastes many
+links at once while quiet workspaces post one link at a steady rate. The
+latency of the quiet messages is compared between a single FIFO queue, fair
+queuing with every href at NORMAL priority, and fair queuing with the first
+href of each message at FIRST priority.
+"""
+
+from __future__ import division
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import threading
+import time
+import timeit
+
+from chattools import scheduler
+
+
+FETCH_TIME = 0.005
+WORKERS = 4
+NOISY_MESSAGES = 20
+NOISY_LINKS = 20
+QUIET_TENANTS = 5
+QUIET_MESSAGES = 20
+QUIET_INTERVAL = 0.025
+
+
+def fetch(url):
+    """Pretend to fetch a title."""
+    time.sleep(FETCH_TIME)
+    return url
+
+
+def percentile(values, percent):
+    """Get a nearest rank percentile of some values."""
+    ordered = sorted(values)
+    rank = int(-(-percent * len(ordered) // 100))
+    return ordered[min(max(rank, 1), len(ordered)) - 1]
+
+
+def simulate(fair, priority=None):
+    """Run the workload and get the quiet latencies and noisy duration.
+
+    Args:
+        fair (bool): Give each workspace its own share. Otherwise every
+            href goes through one FIFO queue.
+        priority (int): The priority of every href of a fair run. The
+            default gives the first href of each message FIRST.
+
+    Returns:
+        (list of float, float): The seconds each quiet message waited for
+            its title and the seconds the noisy workspace took.
+    """
+    pool = scheduler.FairScheduler(fetch, workers=WORKERS)
+    latencies = []
+    lock = threading.Lock()
+    start = timeit.default_timer()
+
+    def titles(tenant, urls):
+        """Fetch titles as one workspace, or as one FIFO queue."""
+        if fair:
+
+            return tuple(pool.titles(urls, tenant, priority))
+
+        return tuple(pool.titles(urls, 'shared', scheduler.NORMAL))
+
+    def quiet(tenant):
+        """Post one link at a steady rate."""
+        for index in range(QUIET_MESSAGES):
+
+            delay = start + index * QUIET_INTERVAL - timeit.default_timer()
+            if delay > 0:
+
+                time.sleep(delay)
+
+            began = timeit.default_timer()
+            titles(tenant, ('http://{0}.com/{1}'.format(tenant, index),))
+            with lock:
+
+                latencies.append(timeit.default_timer() - began)
+
+    noisy_time = []
+
+    def noisy():
+        """Paste many links at once."""
+        threads = [
+            threading.Thread(target=titles, args=('noisy', tuple(
+                'http://noisy.com/{0}/{1}'.format(message, link)
+                for link in range(NOISY_LINKS)
+            )))
+            for message in range(NOISY_MESSAGES)
+        ]
+        for thread in threads:
+
+            thread.start()
+
+        for thread in threads:
+
+            thread.join()
+
+        noisy_time.append(timeit.default_timer() - start)
+
+    threads = [threading.Thread(target=noisy)] + [
+        threading.Thread(target=quiet, args=('quiet{0}'.format(index),))
+        for index in range(QUIET_TENANTS)
+    ]
+    for thread in threads:
+
+        thread.start()
+
+    for thread in threads:
+
+        thread.join()
+
+    pool.close()
+    return latencies, noisy_time[0]
+
+
+def main():
+    """Print the quiet latency percentiles of FIFO and fair scheduling."""
+    print('{0:>10} {1:>14} {2:>14} {3:>16}'.format(
+        'queue', 'quiet p50 (ms)', 'quiet p99 (ms)', 'noisy total (s)',
+    ))
+    for name, fair, priority in (
+            ('fifo', False, None),
+            ('fair', True, scheduler.NORMAL),
+            ('fair+first', True, None),
+    ):
+
+        latencies, noisy_time = simulate(fair, priority)
+        print('{0:>10} {1:>14.1f} {2:>14.1f} {3:>16.2f}'.format(
+            name,
+            percentile(latencies, 50) * 1000,
+            percentile(latencies, 99) * 1000,
+            noisy_time,
+        ))
+
+
+if __name__ == '__main__':
+
+    main()
@@ -0,0 +1,273 @@
+"""Tools for counting the most used content across many messages."""
+
+from __future__ import division
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import heapq
+from urllib.parse import urlsplit
+
+from . import canonical
+
+
+CAPACITY = 1000
+
+
+class SpaceSaving(object):
+
+    """Approximate counts of the most frequent items in fixed memory.
+
+    This is the space-saving algorithm of Metwally et al. At most capacity
+    items are counted. When a new item arrives and the summary is full, the
+    item with the smallest count is replaced and the new item inherits that
+    count as its possible overestimate. Any item that occurs more than
+    total / capacity times is guaranteed to be present.
+    """
+
+    def __init__(self, capacity=CAPACITY):
+        """Initialize an empty summary.
+
+        Args:
+            capacity (int): The maximum number of items to count.
+        """
+        self._capacity = capacity
+        self._counts = {}
+        self._errors = {}
+        self._heap = []
+
+    def __len__(self):
+        """Get the number of items currently counted."""
+        return len(self._counts)
+
+    def _minimum(self):
+        """Get the smallest current count and its item."""
+        heap = self._heap
+        while heap[0][0] != self._counts.get(heap[0][1]):
+
+            heapq.heappop(heap)
+
+        return heap[0]
+
+    def _push(self, item):
+        """Record the current count of an item, compacting if needed."""
+        heapq.heappush(self._heap, (self._counts[item], item))
+        if len(self._heap) > 4 * self._capacity + 16:
+
+            self._heap = [(count, key) for key, count in self._counts.items()]
+            heapq.heapify(self._heap)
+
+    def add(self, item, count=1):
+        """Count an occurrence of an item.
+
+        Args:
+            item (str): The item to count.
+            count (int): The number of occurrences.
+        """
+        if item in self._counts:
+
+            self._counts[item] += count
+
+        elif len(self._counts) < self._capacity:
+
+            self._counts[item] = count
+            self._errors[item] = 0
+
+        else:
+
+            floor, evicted = self._minimum()
+            del self._counts[evicted]
+            del self._errors[evicted]
+            self._counts[item] = floor + count
+            self._errors[item] = floor
+
+        self._push(item)
+
+    def update(self, items):
+        """Count an occurrence of every item in an iterable.
+
+        Args:
+            items (iter of str): The items to count.
+        """
+        for item in items:
+
+            self.add(item)
+
+    def top(self, limit=None):
+        """Get the most frequent items.
+
+        Args:
+            limit (int): The number of items to get. The default is all of the
+                counted items.
+
+        Returns:
+            list of (str, int, int): Three-tuples in the form of
+                (item, count, error) ordered from the most frequent. The true
+                count of an item is between count - error and count.
+        """
+        ranked = sorted(
+            self._counts.items(),
+            key=lambda pair: (-pair[1], pair[0]),
+        )
+        return [
+            (item, count, self._errors[item])
+            for item, count in ranked[:limit]
+        ]
+
+    def snapshot(self):
+        """Get an independent copy of the summary.
+
+        Returns:
+            SpaceSaving: A summary with the same counts.
+        """
+        copy = SpaceSaving(self._capacity)
+        copy._counts = dict(self._counts)
+        copy._errors = dict(self._errors)
+        copy._heap = list(self._heap)
+        return copy
+
+    def merge(self, other):
+        """Combine this summary with one built from other occurrences.
+
+        An item missing from a full summary may have occurred as often as the
+        smallest count of that summary, so that count is added to its count
+        and its error.
+
+        Args:
+            other (SpaceSaving): A summary of other occurrences.
+
+        Returns:
+            SpaceSaving: A new summary of all of the occurrences with the
+                capacity of this one.
+        """
+        floors = []
+        for summary in (self, other):
+
+            full = len(summary) >= summary._capacity
+            floors.append(summary._minimum()[0] if full else 0)
+
+        merged = SpaceSaving(self._capacity)
+        combined = []
+        for item in set(self._counts) | set(other._counts):
+
+            count = error = 0
+            for summary, floor in zip((self, other), floors):
+
+                count += summary._counts.get(item, floor)
+                error += summary._errors.get(item, floor)
+
+            combined.append((count, error, item))
+
+        combined.sort(key=lambda entry: (-entry[0], entry[2]))
+        for count, error, item in combined[:self._capacity]:
+
+            merged._counts[item] = count
+            merged._errors[item] = error
+
+        merged._heap = [
+            (count, item) for item, count in merged._counts.items()
+        ]
+        heapq.heapify(merged._heap)
+        return merged
+
+
+def domain(url):
+    """Get the host name of an href.
+
+    Args:
+        url (str): An href as produced by href.hrefs.
+
+    Returns:
+        str: The lower cased host name, or an empty string if there is none.
+    """
+    try:
+
+        return urlsplit(canonical.canonicalize(url)).hostname or ''
+
+    except ValueError:
+
+        return ''
+
+
+class Trends(object):
+
+    """Approximate top emoticons, mentioned users, and linked domains."""
+
+    def __init__(self, capacity=CAPACITY):
+        """Initialize empty summaries.
+
+        Args:
+            capacity (int): The maximum number of items to count per summary.
+        """
+        self.emoticons = SpaceSaving(capacity)
+        self.mentions = SpaceSaving(capacity)
+        self.domains = SpaceSaving(capacity)
+
+    def add(self, emoticons=(), mentions=(), hrefs=()):
+        """Count the content of a message.
+
+        Args:
+            emoticons (iter of str): The emoticons used in the message.
+            mentions (iter of str): The @mentions used in the message.
+            hrefs (iter of str): The hrefs contained in the message.
+        """
+        self.emoticons.update(emoticons)
+        self.mentions.update(mentions)
+        self.domains.update(domain(url) for url in hrefs)
+
+    def add_metadata(self, meta):
+        """Count the content of a Metadata container without fetching titles.
+
+        Args:
+            meta (Metadata): The metadata of a message.
+        """
+        self.add(meta.emoticons, meta.mentions, meta.hrefs)
+
+    def snapshot(self):
+        """Get an independent copy of the summaries.
+
+        Returns:
+            Trends: Summaries with the same counts.
+        """
+        copy = Trends.__new__(Trends)
+        copy.emoticons = self.emoticons.snapshot()
+        copy.mentions = self.mentions.snapshot()
+        copy.domains = self.domains.snapshot()
+        return copy
+
+    def merge(self, other):
+        """Combine these summaries with those of another worker.
+
+        Args:
+            other (Trends): Summaries of other messages.
+
+        Returns:
+            Trends: New summaries of all of the messages.
+        """
+        merged = Trends.__new__(Trends)
+        merged.emoticons = self.emoticons.merge(other.emoticons)
+        merged.mentions = self.mentions.merge(other.mentions)
+        merged.domains = self.domains.merge(other.domains)
+        return merged
+
+    def top(self, limit=10):
+        """Get the most used content as a JSON compatible dictionary.
+
+        Args:
+            limit (int): The number of items to get for each summary.
+
+        Returns:
+            dict: The top emoticons, mentions, and domains, each as a list of
+                {"value": ..., "count": ..., "error": ...} objects.
+        """
+        return dict(
+            (name, [
+                {'value': item, 'count': count, 'error': error}
+                for item, count, error in summary.top(limit)
+            ])
+            for name, summary in (
+                ('emoticons', self.emoticons),
+                ('mentions', self.mentions),
+                ('domains', self.domains),
+            )
+        )
@@ -0,0 +1,206 @@
+"""Tools for sharing extraction settings with worker processes."""
+
+from __future__ import division
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import re
+import threading
+
+from . import canonical
+from . import catalog
+from . import emoticon
+from . import href
+from . import mention
+from . import metadata
+
+
+TLD_REGEX = re.compile(r'\(\?:(com\|net\|[^)]*)\)')
+TLDS = frozenset(
+    tld.strip().lower()
+    for tld in TLD_REGEX.search(href.REGEX).group(1).split('|')
+)
+
+
+def href_pattern(tlds):
+    """Get the href regex with its top level domains replaced.
+
+    Args:
+        tlds (iter of str): The top level domains of naked domain hrefs,
+            such as 'com'.
+
+    Returns:
+        str: The source of a verbose regex in the form of href.REGEX.
+    """
+    group = '(?:{0})'.format('|'.join(
+        re.escape(tld)
+        for tld in sorted(set(tlds), key=lambda tld: (-len(tld), tld))
+    ))
+    return TLD_REGEX.sub(lambda _: group, href.REGEX)
+
+
+class Bundle(object):
+
+    """Extraction settings whose matchers are compiled on first use.
+
+    A bundle pickles as its settings alone, so sending it, or any of its
+    methods, to a worker process costs about a hundred bytes. Each worker
+    compiles the href regex and loads the emoticon catalog only when they are
+    first used. Calling warm before forking compiles them once so the forked
+    workers start ready.
+    """
+
+    def __init__(
+            self,
+            tlds=None,
+            max_emoticon_length=emoticon.MAX_EMOTICON_LENGTH,
+            catalog_path=None,
+            title_provider=canonical.titles,
+            json_provider=metadata.JSON_PROVIDER,
+    ):
+        """Initialize the bundle without compiling anything.
+
+        Args:
+            tlds (iter of str): The top level domains of naked domain hrefs.
+                The default shares href.HREF_REGEX, which is also only
+                compiled when first used.
+            max_emoticon_length (int): The maximum string length of a valid
+                (emoticon).
+            catalog_path (str): The location of a catalog file of emoticon
+                shortcuts. The default matches only (emoticons).
+            title_provider: A callable that generates an iterable of titles
+                from an iterable of hrefs. It must be defined at module level
+                for the bundle to be sent to other processes.
+            json_provider: A callable that converts a Python dictionary into
+                JSON text, with the same restriction.
+        """
+        self._tlds = None if tlds is None else tuple(sorted(set(tlds)))
+        self._max_emoticon_length = max_emoticon_length
+        self._catalog_path = catalog_path
+        self._title_provider = title_provider
+        self._json_provider = json_provider
+        self._lock = threading.Lock()
+        self._href_regex = None
+        self._catalog = None
+
+    def __reduce__(self):
+        """Pickle the settings and none of the compiled matchers."""
+        return (self.__class__, (
+            self._tlds,
+            self._max_emoticon_length,
+            self._catalog_path,
+            self._title_provider,
+            self._json_provider,
+        ))
+
+    @property
+    def href_regex(self):
+        """Get the compiled href regex, compiling it if needed."""
+        if self._href_regex is None:
+
+            with self._lock:
+
+                if self._href_regex is None:
+
+                    self._href_regex = (
+                        href.HREF_REGEX.compiled() if self._tlds is None
+                        else re.compile(href_pattern(self._tlds), href.FLAGS)
+                    )
+
+        return self._href_regex
+
+    @property
+    def catalog(self):
+        """Get the emoticon catalog, loading it if needed.
+
+        Returns:
+            catalog.Catalog: The catalog or None if the bundle has no catalog
+                file.
+        """
+        if self._catalog is None and self._catalog_path is not None:
+
+            with self._lock:
+
+                if self._catalog is None:
+
+                    self._catalog = catalog.Catalog(
+                        self._catalog_path,
+                        self._max_emoticon_length,
+                        href_spans=self.href_spans,
+                    )
+
+        return self._catalog
+
+    def warm(self):
+        """Compile every matcher now rather than on first use.
+
+        Returns:
+            Bundle: The bundle itself.
+        """
+        self.href_regex  # pylint: disable=pointless-statement
+        self.catalog  # pylint: disable=pointless-statement
+        return self
+
+    def hrefs(self, text):
+        """Generate an iterable of hrefs like href.hrefs."""
+        for match in self.href_regex.findall(text):
+
+            yield match
+
+    def href_spans(self, text):
+        """Generate an iterable of (start, end, href) like href.href_spans."""
+        for match in self.href_regex.finditer(text):
+
+            yield match.start(1), match.end(1), match.group(1)
+
+    def emoticons(self, text):
+        """Generate an iterable of emoticons, or of catalog names if any."""
+        shortcuts = self.catalog
+        if shortcuts is not None:
+
+            return shortcuts.emoticons(text)
+
+        return emoticon.emoticons(text, self._max_emoticon_length)
+
+    def emoticon_spans(self, text):
+        """Generate an iterable of (start, end, emoticon) spans.
+
+        The spans include catalog hits, by name, if the bundle has a catalog.
+        """
+        shortcuts = self.catalog
+        if shortcuts is not None:
+
+            return shortcuts.matches(text)
+
+        return emoticon.emoticon_spans(text, self._max_emoticon_length)
+
+    def mentions(self, text):
+        """Generate an iterable of mentions like mention.mentions."""
+        return mention.mentions(text)
+
+    def mention_spans(self, text):
+        """Generate an iterable of spans like mention.mention_spans."""
+        return mention.mention_spans(text)
+
+    def metadata(self, message):
+        """Get a Metadata container that extracts with the bundle.
+
+        Args:
+            message (str): The message text.
+
+        Returns:
+            Metadata: A container using the matchers of the bundle.
+        """
+        return metadata.Metadata(
+            message,
+            emoticon_provider=self.emoticons,
+            href_provider=self.hrefs,
+            title_provider=self._title_provider,
+            mention_provider=self.mentions,
+            json_provider=self._json_provider,
+        )
+
+    def __call__(self, message):
+        """Get a Metadata container so the bundle can replace Metadata."""
+        return self.metadata(message)
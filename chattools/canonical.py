@@ -0,0 +1,261 @@
+"""Tools for canonicalizing hrefs before their titles are fetched."""
+
+from __future__ import division
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import collections
+import fnmatch
+import re
+import threading
+import time
+from urllib.parse import urlsplit, urlunsplit
+
+from . import href
+
+
+DEFAULT_SCHEME = 'http'
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+TRACKING_PARAMETERS = (
+    'utm_*',
+    'fbclid',
+    'gclid',
+    'dclid',
+    'msclkid',
+    'yclid',
+    'mc_cid',
+    'mc_eid',
+    '_ga',
+    'igshid',
+)
+MAX_CACHE_SIZE = 4096
+MAX_AGE = 3600
+NEGATIVE_MAX_AGE = 30
+SCHEME_REGEX = re.compile(r'^(https?):/*', re.IGNORECASE)
+
+
+def _tracking(name, tracking_parameters):
+    """Determine if a query parameter name matches any tracking rule."""
+    name = name.lower()
+    for pattern in tracking_parameters:
+
+        if fnmatch.fnmatchcase(name, pattern):
+
+            return True
+
+    return False
+
+
+def canonicalize(
+        url,
+        tracking_parameters=TRACKING_PARAMETERS,
+        default_scheme=DEFAULT_SCHEME,
+):
+    """Convert an href into a canonical form suitable for use as a key.
+
+    The scheme and host are lower cased, default ports are removed, an empty
+    path becomes '/', the fragment is dropped, and any query parameters that
+    match a tracking rule are removed. Naked domains, such as example.com, are
+    given the default scheme.
+
+    Args:
+        url (str): An href as produced by href.hrefs.
+        tracking_parameters (iter of str): Shell style patterns, such as
+            'utm_*', matched against lower cased query parameter names. Any
+            matching parameter is removed from the query.
+        default_scheme (str): The scheme to add to hrefs that have none.
+
+    Returns:
+        str: The canonical href. If the href cannot be parsed it is returned
+            with only the scheme added.
+    """
+    match = SCHEME_REGEX.match(url)
+    if match:
+
+        scheme = match.group(1).lower()
+        rest = url[match.end():]
+
+    else:
+
+        scheme = default_scheme
+        rest = url
+
+    url = '{0}://{1}'.format(scheme, rest)
+    try:
+
+        parts = urlsplit(url)
+        port = parts.port
+
+    except ValueError:
+
+        return url
+
+    host = (parts.hostname or '').rstrip('.')
+    if ':' in host:
+
+        host = '[{0}]'.format(host)
+
+    netloc = host
+    if port is not None and port != DEFAULT_PORTS.get(scheme):
+
+        netloc = '{0}:{1}'.format(netloc, port)
+
+    if '@' in parts.netloc:
+
+        netloc = '{0}@{1}'.format(parts.netloc.rpartition('@')[0], netloc)
+
+    query = '&'.join(
+        parameter for parameter in parts.query.split('&')
+        if parameter and not _tracking(
+            parameter.partition('=')[0],
+            tracking_parameters,
+        )
+    )
+    return urlunsplit((scheme, netloc, parts.path or '/', query, ''))
+
+
+class TitleCache(object):
+
+    """A bounded, least recently used cache of titles by canonical href.
+
+    A None title, stored when a fetch fails, only stays fresh for a short
+    time so that a transient failure is retried.
+    """
+
+    def __init__(
+            self,
+            max_size=MAX_CACHE_SIZE,
+            max_age=None,
+            clock=time.time,
+            negative_max_age=NEGATIVE_MAX_AGE,
+    ):
+        """Initialize the cache with its limits.
+
+        Args:
+            max_size (int): The maximum number of titles to hold. The least
+                recently used title is evicted when the limit is reached.
+            max_age (float): The number of seconds a title remains fresh. A
+                value of None keeps titles until they are evicted.
+            clock: A callable that returns the current time in seconds.
+            negative_max_age (float): The number of seconds a None title
+                remains fresh. A value of None uses max_age.
+        """
+        self._max_size = max_size
+        self._max_age = max_age
+        self._negative_max_age = negative_max_age
+        self._clock = clock
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        """Get the number of titles currently held."""
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        """Get a fresh title for a canonical href.
+
+        Args:
+            key (str): A canonical href.
+            default: The value to return if no fresh title is held.
+
+        Returns:
+            str: The cached title, which may be None if the fetch failed, or
+                the default value.
+        """
+        with self._lock:
+
+            try:
+
+                stored, title = self._entries.pop(key)
+
+            except KeyError:
+
+                return default
+
+            max_age = self._max_age
+            if title is None and self._negative_max_age is not None:
+
+                max_age = self._negative_max_age
+
+            if max_age is not None and self._clock() - stored > max_age:
+
+                return default
+
+            self._entries[key] = (stored, title)
+            return title
+
+    def set(self, key, title):
+        """Store the title of a canonical href.
+
+        Args:
+            key (str): A canonical href.
+            title (str): The title of the page or None if it was not found.
+        """
+        with self._lock:
+
+            self._entries.pop(key, None)
+            self._entries[key] = (self._clock(), title)
+            while len(self._entries) > self._max_size:
+
+                self._entries.popitem(last=False)
+
+
+_MISSING = object()
+
+
+def titles(
+        urls,
+        cache=None,
+        canonicalizer=canonicalize,
+        title_provider=href.streaming_titles,
+):
+    """Generate an iterable of page titles with one fetch per canonical href.
+
+    Each href is canonicalized and only the distinct canonical hrefs that are
+    not already cached are given to the title provider. This function can be
+    used anywhere href.titles is accepted. Bind a shared TitleCache with
+    functools.partial to reuse titles across messages.
+
+    Args:
+        urls (iter of str): An iterable of strings that represent the location
+            of sites that should have title extracted.
+        cache (TitleCache): A cache of titles by canonical href. If None, only
+            duplicates within the given hrefs are collapsed.
+        canonicalizer: A callable that converts an href into a canonical href.
+        title_provider: A callable that generates an iterable of titles from
+            an iterable of hrefs. It is given canonical hrefs.
+
+    Returns:
+        iter of str: An iterable of titles, one for each given href and in the
+            same order. Values may be None if the title could not be
+            determined for any reason.
+    """
+    keys = tuple(canonicalizer(url) for url in urls)
+    found = {}
+    missing = []
+    for key in keys:
+
+        if key in found:
+
+            continue
+
+        title = _MISSING if cache is None else cache.get(key, _MISSING)
+        found[key] = title
+        if title is _MISSING:
+
+            missing.append(key)
+
+    if missing:
+
+        for key, title in zip(missing, title_provider(missing)):
+
+            found[key] = title
+            if cache is not None:
+
+                cache.set(key, title)
+
+    for key in keys:
+
+        title = found[key]
+        yield None if title is _MISSING else title
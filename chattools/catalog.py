@@ -0,0 +1,257 @@
+"""Tools for matching a catalog of emoticon shortcuts."""
+
+from __future__ import division
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import collections
+import io
+import threading
+
+from . import emoticon
+from . import href
+
+
+ENCODING = 'utf-8'
+
+
+def load_catalog(path):
+    """Read a catalog file of emoticon shortcuts.
+
+    Each line of the file holds a shortcut, such as :party_parrot:, optionally
+    followed by a tab and the name to report for it. Blank lines are ignored.
+
+    Args:
+        path (str): The location of the catalog file.
+
+    Returns:
+        tuple of (str, str): The (shortcut, name) pairs of the catalog. The
+            name is the shortcut itself if the line did not give one.
+    """
+    entries = []
+    with io.open(path, 'r', encoding=ENCODING) as catalog_file:
+
+        for line in catalog_file:
+
+            shortcut, _, name = line.rstrip('\r\n').partition('\t')
+            shortcut = shortcut.strip()
+            if shortcut:
+
+                entries.append((shortcut, name.strip() or shortcut))
+
+    return tuple(entries)
+
+
+class Automaton(object):
+
+    """An Aho-Corasick automaton over a fixed set of shortcuts."""
+
+    def __init__(self, entries):
+        """Compile the automaton from catalog entries.
+
+        Args:
+            entries (iter of (str, str)): The (shortcut, name) pairs to match.
+                If a shortcut is repeated the last name given is used.
+        """
+        transitions = [{}]
+        names = [None]
+        for shortcut, name in entries:
+
+            state = 0
+            for char in shortcut:
+
+                following = transitions[state].get(char)
+                if following is None:
+
+                    following = len(transitions)
+                    transitions[state][char] = following
+                    transitions.append({})
+                    names.append(None)
+
+                state = following
+
+            names[state] = (len(shortcut), name)
+
+        failures = [0] * len(transitions)
+        outputs = [()] * len(transitions)
+        queue = collections.deque(transitions[0].values())
+        for state in queue:
+
+            outputs[state] = (names[state],) if names[state] else ()
+
+        while queue:
+
+            state = queue.popleft()
+            for char, following in transitions[state].items():
+
+                failure = failures[state]
+                while failure and char not in transitions[failure]:
+
+                    failure = failures[failure]
+
+                failure = transitions[failure].get(char, 0)
+                failures[following] = failure
+                outputs[following] = (
+                    ((names[following],) if names[following] else ()) +
+                    outputs[failure]
+                )
+                queue.append(following)
+
+        self._transitions = transitions
+        self._failures = failures
+        self._outputs = outputs
+
+    def __len__(self):
+        """Get the number of states in the automaton."""
+        return len(self._transitions)
+
+    def matches(self, text):
+        """Generate every catalog hit within a text in one pass.
+
+        Args:
+            text (str): The body text of a chat message.
+
+        Returns:
+            iter of (int, int, str): An iterable of three-tuples in the form of
+                (start, end, name) for every occurrence of every shortcut,
+                including overlapping ones, ordered by their end offset.
+        """
+        transitions = self._transitions
+        failures = self._failures
+        outputs = self._outputs
+        state = 0
+        for position, char in enumerate(text):
+
+            following = transitions[state].get(char)
+            while following is None and state:
+
+                state = failures[state]
+                following = transitions[state].get(char)
+
+            state = following or 0
+            for length, name in outputs[state]:
+
+                yield position + 1 - length, position + 1, name
+
+
+class Catalog(object):
+
+    """A reloadable catalog of emoticon shortcuts.
+
+    Unlike Automaton.matches, which finds every occurrence, the catalog only
+    reports the hits a reader would see: hits inside an href are ignored and
+    overlapping hits are resolved to the leftmost, then longest, one.
+    """
+
+    def __init__(
+            self,
+            path,
+            max_length=emoticon.MAX_EMOTICON_LENGTH,
+            loader=load_catalog,
+            href_spans=href.href_spans,
+    ):
+        """Initialize the catalog by compiling the catalog file.
+
+        Args:
+            path (str): The location of the catalog file.
+            max_length (int): The maximum string length of a valid (emoticon).
+            loader: A callable that accepts a path and produces an iterable of
+                (shortcut, name) pairs.
+            href_spans: A callable that generates (start, end, href) spans
+                from a message text. Shortcuts within them are not reported.
+        """
+        self._path = path
+        self._max_length = max_length
+        self._loader = loader
+        self._href_spans = href_spans
+        self._reload_lock = threading.Lock()
+        self._automaton = Automaton(loader(path))
+
+    def reload(self, wait=False):
+        """Compile the catalog file again and swap in the result.
+
+        Matching continues with the current automaton while the new one is
+        compiled. Each call to matches uses a single automaton throughout.
+
+        Args:
+            wait (bool): Compile in the calling thread rather than in a
+                background thread.
+
+        Returns:
+            threading.Thread: The thread compiling the catalog or None if the
+                catalog was compiled in the calling thread.
+        """
+        if wait:
+
+            self._reload()
+            return None
+
+        thread = threading.Thread(target=self._reload)
+        thread.daemon = True
+        thread.start()
+        return thread
+
+    def _reload(self):
+        """Compile the catalog file and replace the automaton."""
+        with self._reload_lock:
+
+            self._automaton = Automaton(self._loader(self._path))
+
+    def matches(self, text):
+        """Generate the catalog hits and (emoticons) within a text.
+
+        Args:
+            text (str): The body text of a chat message.
+
+        Returns:
+            iter of (int, int, str): An iterable of three-tuples in the form of
+                (start, end, name) ordered by offset. Hits never overlap each
+                other or an href. An (emoticon) that is also a catalog
+                shortcut is reported once.
+        """
+        found = dict(
+            ((start, end), name)
+            for start, end, name in emoticon.emoticon_spans(
+                text,
+                self._max_length,
+            )
+        )
+        found.update(
+            ((start, end), name)
+            for start, end, name in self._automaton.matches(text)
+        )
+        # The href spans still ahead of the current hit, nearest last.
+        hrefs = sorted(
+            ((start, end) for start, end, _ in self._href_spans(text)),
+            reverse=True,
+        )
+        last = 0
+        for start, end in sorted(found, key=lambda span: (span[0], -span[1])):
+
+            while hrefs and hrefs[-1][1] <= start:
+
+                hrefs.pop()
+
+            if start < last or (hrefs and hrefs[-1][0] < end):
+
+                continue
+
+            last = end
+            yield start, end, found[(start, end)]
+
+    def emoticons(self, text):
+        """Generate an iterable of emoticon names from a given text body.
+
+        This can be used as the emoticon provider of a Metadata container.
+
+        Args:
+            text (str): The body text of a chat message.
+
+        Returns:
+            iter of str: The names of the catalog shortcuts and (emoticons)
+                used within the body text.
+        """
+        for _, _, name in self.matches(text):
+
+            yield name
@@ -0,0 +1,346 @@
+"""Tools for writing extracted content as columns for analytics."""
+
+from __future__ import division
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import array
+import io
+import mmap
+import struct
+import sys
+
+try:
+
+    import numpy
+
+except ImportError:  # pragma: no cover
+
+    numpy = None
+
+from . import emoticon
+from . import href
+from . import mention
+
+
+EMOTICON = 0
+HREF = 1
+MENTION = 2
+KINDS = ('emoticon', 'href', 'mention')
+
+MAGIC = b'CHATCOL1'
+HEADER = struct.Struct('<8sQQQ')
+UINT32 = 'I' if array.array('I').itemsize == 4 else 'L'
+UINT32_COLUMNS = ('message', 'start', 'end', 'value')
+
+
+def _pad(size):
+    """Get the number of bytes that aligns a size to eight bytes."""
+    return -size % 8
+
+
+def _little_endian(column):
+    """Get the bytes of an array in little endian order."""
+    if sys.byteorder == 'big':  # pragma: no cover
+
+        column = array.array(column.typecode, column)
+        column.byteswap()
+
+    return column.tobytes()
+
+
+class Columns(object):
+
+    """Extracted content stored as parallel columns, one row per entity.
+
+    The message column holds the position of the message in its batch, kind
+    holds one of EMOTICON, HREF, or MENTION, start and end hold the offsets
+    of the entity in its message, and value holds the position of the entity
+    text in the strings table. Each distinct text is stored once.
+    """
+
+    def __init__(self):
+        """Initialize empty columns."""
+        self.message = array.array(UINT32)
+        self.kind = array.array('B')
+        self.start = array.array(UINT32)
+        self.end = array.array(UINT32)
+        self.value = array.array(UINT32)
+        self.strings = []
+        self._ids = {}
+
+    def __len__(self):
+        """Get the number of rows."""
+        return len(self.kind)
+
+    def add(self, message, kind, start, end, value):
+        """Append a row.
+
+        Args:
+            message (int): The position of the message in its batch.
+            kind (int): One of EMOTICON, HREF, or MENTION.
+            start (int): The offset at which the entity starts.
+            end (int): The offset at which the entity ends.
+            value (str): The text of the entity.
+        """
+        identifier = self._ids.get(value)
+        if identifier is None:
+
+            identifier = self._ids[value] = len(self.strings)
+            self.strings.append(value)
+
+        self.message.append(message)
+        self.kind.append(kind)
+        self.start.append(start)
+        self.end.append(end)
+        self.value.append(identifier)
+
+    def extend(
+            self,
+            message,
+            text,
+            emoticon_spans=emoticon.emoticon_spans,
+            href_spans=href.href_spans,
+            mention_spans=mention.mention_spans,
+    ):
+        """Append a row for every entity of a message.
+
+        Args:
+            message (int): The position of the message in its batch.
+            text (str): The message text.
+            emoticon_spans: A callable that generates (start, end, emoticon)
+                spans from a message text.
+            href_spans: A callable that generates (start, end, href) spans
+                from a message text.
+            mention_spans: A callable that generates (start, end, mention)
+                spans from a message text. Use the span functions of the
+                utf8 module to store byte offsets of UTF-8 messages.
+        """
+        for kind, spans in (
+                (EMOTICON, emoticon_spans),
+                (HREF, href_spans),
+                (MENTION, mention_spans),
+        ):
+
+            for start, end, value in spans(text):
+
+                self.add(message, kind, start, end, value)
+
+    def rows(self):
+        """Generate the rows as (message, kind, start, end, value) tuples.
+
+        The kind is given by name and the value as text.
+        """
+        for index in range(len(self)):
+
+            yield (
+                self.message[index],
+                KINDS[self.kind[index]],
+                self.start[index],
+                self.end[index],
+                self.strings[self.value[index]],
+            )
+
+    def write(self, path):
+        """Write the columns to a binary file that can be loaded with load.
+
+        The file starts with a 32 byte header of the magic bytes and three
+        little endian unsigned 64 bit integers: the rows, the strings, and
+        the size of the string data. The message, start, end, and value
+        columns follow as unsigned 32 bit integers, then the kind column as
+        unsigned bytes, then the offsets of each string as unsigned 32 bit
+        integers, and finally the UTF-8 string data. Every section starts on
+        an eight byte boundary.
+
+        Args:
+            path (str): The location of the file to write.
+        """
+        encoded = [value.encode('utf-8') for value in self.strings]
+        offsets = array.array(UINT32, [0])
+        for value in encoded:
+
+            offsets.append(offsets[-1] + len(value))
+
+        sections = [getattr(self, name) for name in UINT32_COLUMNS]
+        sections.extend((self.kind, offsets))
+        with io.open(path, 'wb') as output:
+
+            output.write(HEADER.pack(
+                MAGIC, len(self), len(encoded), offsets[-1],
+            ))
+            for section in sections:
+
+                data = _little_endian(section)
+                output.write(data)
+                output.write(b'\0' * _pad(len(data)))
+
+            for value in encoded:
+
+                output.write(value)
+
+
+def extract(messages, **providers):
+    """Extract the content of a batch of messages into columns.
+
+    Args:
+        messages (iter of str): The message texts. Each is identified by its
+            position in the batch.
+        **providers: Any of the span providers accepted by Columns.extend.
+
+    Returns:
+        Columns: A row for every emoticon, href, and mention.
+    """
+    columns = Columns()
+    for index, text in enumerate(messages):
+
+        columns.extend(index, text, **providers)
+
+    return columns
+
+
+class ColumnFile(object):
+
+    """Columns read from a binary file through a memory map.
+
+    The message, kind, start, end, and value attributes are NumPy arrays if
+    NumPy is installed and memoryviews otherwise. Neither copies the file.
+    Strings are decoded only when they are asked for.
+    """
+
+    def __init__(self, path):
+        """Map a file written by Columns.write.
+
+        Args:
+            path (str): The location of the file.
+
+        Raises:
+            ValueError: If the file was not written by Columns.write.
+        """
+        with io.open(path, 'rb') as source:
+
+            self._map = mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if (
+                len(self._map) < HEADER.size or
+                HEADER.unpack_from(self._map, 0)[0] != MAGIC
+        ):
+
+            self._map.close()
+            raise ValueError('{0} is not a columnar file.'.format(path))
+
+        _, rows, count, _ = HEADER.unpack_from(self._map, 0)
+        self._view = memoryview(self._map)
+        self._rows = rows
+        self._count = count
+        columns = []
+        position = HEADER.size
+        for _ in UINT32_COLUMNS:
+
+            columns.append(self._column(position, rows, UINT32))
+            position += rows * 4 + _pad(rows * 4)
+
+        self.message, self.start, self.end, self.value = columns
+        self.kind = self._column(position, rows, 'B')
+        position += rows + _pad(rows)
+        self._offsets = self._column(position, count + 1, UINT32)
+        self._data = position + (count + 1) * 4 + _pad((count + 1) * 4)
+
+    def _column(self, position, length, typecode):
+        """Get a column that views the mapped file."""
+        itemsize = 1 if typecode == 'B' else 4
+        if numpy is not None:
+
+            return numpy.frombuffer(
+                self._map,
+                dtype='u1' if typecode == 'B' else '<u4',
+                count=length,
+                offset=position,
+            )
+
+        section = self._view[position:position + length * itemsize]
+        if itemsize > 1 and sys.byteorder == 'big':  # pragma: no cover
+
+            column = array.array(typecode, section.tobytes())
+            column.byteswap()
+            return column
+
+        return section.cast(typecode)
+
+    def __len__(self):
+        """Get the number of rows."""
+        return self._rows
+
+    def __enter__(self):
+        """Use the file as a context manager."""
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """Release the memory map."""
+        self.close()
+
+    def string(self, identifier):
+        """Get the text of an entry of the strings table.
+
+        Args:
+            identifier (int): A value from the value column.
+
+        Returns:
+            str: The entity text.
+        """
+        start = self._data + int(self._offsets[identifier])
+        end = self._data + int(self._offsets[identifier + 1])
+        return self._map[start:end].decode('utf-8')
+
+    @property
+    def strings(self):
+        """Get the full strings table as a list of text."""
+        return [self.string(index) for index in range(self._count)]
+
+    def rows(self):
+        """Generate the rows as (message, kind, start, end, value) tuples.
+
+        The kind is given by name and the value as text.
+        """
+        strings = self.strings
+        for index in range(self._rows):
+
+            yield (
+                int(self.message[index]),
+                KINDS[self.kind[index]],
+                int(self.start[index]),
+                int(self.end[index]),
+                strings[self.value[index]],
+            )
+
+    def close(self):
+        """Release the memory map.
+
+        The columns must not be used once the file is closed.
+        """
+        for name in UINT32_COLUMNS + ('kind', '_offsets'):
+
+            setattr(self, name, None)
+
+        self._view.release()
+        try:
+
+            self._map.close()
+
+        except BufferError:
+
+            # A NumPy column is still referenced by the caller. The mapping
+            # is released when it is.
+            pass
+
+
+def load(path):
+    """Map a columnar file written by Columns.write.
+
+    Args:
+        path (str): The location of the file.
+
+    Returns:
+        ColumnFile: The columns of the file.
+    """
+    return ColumnFile(path)
@@ -0,0 +1,318 @@
+"""Tools for reading large chat archives in bulk."""
+
+from __future__ import division
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import contextlib
+import io
+import mmap
+import multiprocessing
+import os
+
+
+CHECKPOINT_INTERVAL = 10000
+
+
+@contextlib.contextmanager
+def _mapped(path):
+    """Map a file read-only, producing an empty buffer for empty files."""
+    with io.open(path, 'rb') as archive:
+
+        try:
+
+            buffer = mmap.mmap(archive.fileno(), 0, access=mmap.ACCESS_READ)
+
+        except ValueError:
+
+            yield b''
+            return
+
+        try:
+
+            yield buffer
+
+        finally:
+
+            try:
+
+                buffer.close()
+
+            except BufferError:
+
+                # Lines are still referenced by the caller. The mapping is
+                # released when they are.
+                pass
+
+
+def shards(path, count):
+    """Split an archive into line aligned byte ranges.
+
+    Args:
+        path (str): The location of a newline delimited archive.
+        count (int): The number of ranges to produce. Fewer are produced if
+            the archive has too few lines.
+
+    Returns:
+        tuple of (int, int): The (start, end) byte offsets of each range. The
+            ranges are contiguous and each one begins at the start of a line.
+    """
+    with _mapped(path) as buffer:
+
+        size = len(buffer)
+        offsets = [0]
+        for index in range(1, count):
+
+            newline = buffer.find(b'\n', max(size * index // count - 1, 0))
+            offset = size if newline < 0 else newline + 1
+            if offset > offsets[-1]:
+
+                offsets.append(offset)
+
+    if offsets[-1] < size:
+
+        offsets.append(size)
+
+    return tuple(zip(offsets, offsets[1:]))
+
+
+def lines(path, start=0, end=None):
+    """Generate the lines of an archive as slices of a memory map.
+
+    No line is copied. Each is a memoryview into the mapped file that can be
+    given directly to the extractors in the utf8 module.
+
+    Args:
+        path (str): The location of a newline delimited archive.
+        start (int): The byte offset of the line to begin with.
+        end (int): The byte offset at which to stop. The default is the end
+            of the archive.
+
+    Returns:
+        iter of (int, memoryview): An iterable of two-tuples in the form of
+            (offset, line) where offset is the byte offset of the next line.
+            Reading can be resumed from any such offset. The line excludes its
+            line ending.
+    """
+    with _mapped(path) as buffer:
+
+        view = memoryview(buffer)
+        end = len(buffer) if end is None else min(end, len(buffer))
+        position = start
+        try:
+
+            while position < end:
+
+                newline = buffer.find(b'\n', position, end)
+                following = end if newline < 0 else newline + 1
+                stop = end if newline < 0 else newline
+                if stop > position and buffer[stop - 1:stop] == b'\r':
+
+                    stop -= 1
+
+                yield following, view[position:stop]
+                position = following
+
+        finally:
+
+            view.release()
+
+
+class Checkpoint(object):
+
+    """A byte offset that is persisted to a file."""
+
+    def __init__(self, path):
+        """Initialize the checkpoint with the file that holds it.
+
+        Args:
+            path (str): The location of the checkpoint file.
+        """
+        self._path = path
+
+    def load(self, default=0):
+        """Get the saved offset.
+
+        Args:
+            default (int): The offset to use if none has been saved.
+
+        Returns:
+            int: The saved byte offset.
+        """
+        try:
+
+            with io.open(self._path, 'r') as checkpoint_file:
+
+                return int(checkpoint_file.read().strip())
+
+        except (IOError, OSError, ValueError):
+
+            return default
+
+    def save(self, offset):
+        """Save an offset, replacing the file atomically.
+
+        Args:
+            offset (int): The byte offset to save.
+        """
+        temporary = '{0}.tmp'.format(self._path)
+        with io.open(temporary, 'w') as checkpoint_file:
+
+            checkpoint_file.write('{0}'.format(offset))
+
+        os.rename(temporary, self._path)
+
+
+def backfill(
+        path,
+        handler,
+        start=0,
+        end=None,
+        checkpoint=None,
+        interval=CHECKPOINT_INTERVAL,
+):
+    """Give each line of an archive, or a range of it, to a handler.
+
+    Args:
+        path (str): The location of a newline delimited archive.
+        handler: A callable that accepts a line as a memoryview.
+        start (int): The byte offset of the line to begin with.
+        end (int): The byte offset at which to stop.
+        checkpoint (Checkpoint): Where progress is saved. If given, reading
+            resumes from the saved offset rather than the start.
+        interval (int): The number of lines to handle between saves.
+
+    Returns:
+        int: The number of lines handled.
+    """
+    if checkpoint is not None:
+
+        start = checkpoint.load(start)
+
+    handled = 0
+    offset = start
+    for offset, line in lines(path, start, end):
+
+        handler(line)
+        handled += 1
+        if checkpoint is not None and not handled % interval:
+
+            checkpoint.save(offset)
+
+    if checkpoint is not None:
+
+        checkpoint.save(offset)
+
+    return handled
+
+
+def _backfill_shard(arguments):
+    """Backfill one shard in a worker process."""
+    path, handler, start, end, checkpoint_prefix, interval = arguments
+    checkpoint = None
+    if checkpoint_prefix is not None:
+
+        checkpoint = Checkpoint(
+            '{0}.{1}-{2}'.format(checkpoint_prefix, start, end),
+        )
+
+    return backfill(path, handler, start, end, checkpoint, interval)
+
+
+def _layout(path, count, checkpoint_prefix):
+    """Get the shards of an archive, reusing the ones of an earlier run.
+
+    The byte ranges name the checkpoints, so they are saved to a file named
+    after the prefix the first time and read back on every later run. A
+    resumed run keeps the shards it started with even if the number of
+    processes changes.
+
+    Raises:
+        ValueError: If the saved shards do not cover the archive, such as
+            when the archive has changed since they were saved.
+    """
+    if checkpoint_prefix is None:
+
+        return shards(path, count)
+
+    layout_path = '{0}.shards'.format(checkpoint_prefix)
+    try:
+
+        with io.open(layout_path, 'r') as layout_file:
+
+            ranges = tuple(
+                tuple(int(offset) for offset in line.split())
+                for line in layout_file
+                if line.strip()
+            )
+
+    except (IOError, OSError):
+
+        ranges = shards(path, count)
+        temporary = '{0}.tmp'.format(layout_path)
+        with io.open(temporary, 'w') as layout_file:
+
+            for start, end in ranges:
+
+                layout_file.write('{0} {1}\n'.format(start, end))
+
+        os.rename(temporary, layout_path)
+        return ranges
+
+    size = os.path.getsize(path)
+    if (ranges[-1][1] if ranges else 0) != size:
+
+        raise ValueError(
+            'The shards in {0} do not cover the {1} bytes of {2}.'.format(
+                layout_path,
+                size,
+                path,
+            ),
+        )
+
+    return ranges
+
+
+def process(
+        path,
+        handler,
+        processes=None,
+        checkpoint_prefix=None,
+        interval=CHECKPOINT_INTERVAL,
+):
+    """Backfill an archive with one shard per worker process.
+
+    Args:
+        path (str): The location of a newline delimited archive.
+        handler: A callable that accepts a line as a memoryview. It must be
+            defined at module level so that it can be sent to the workers.
+        processes (int): The number of workers. The default is the number of
+            CPUs.
+        checkpoint_prefix (str): If given, each shard saves its progress to a
+            file named after this prefix and its byte range, and the ranges
+            are saved to the prefix followed by '.shards'. Running again with
+            the same prefix resumes every shard, with any number of workers.
+        interval (int): The number of lines to handle between saves.
+
+    Returns:
+        int: The number of lines handled.
+
+    Raises:
+        ValueError: If the shards saved with the prefix do not cover the
+            archive.
+    """
+    processes = processes or multiprocessing.cpu_count()
+    arguments = tuple(
+        (path, handler, start, end, checkpoint_prefix, interval)
+        for start, end in _layout(path, processes, checkpoint_prefix)
+    )
+    pool = multiprocessing.Pool(processes)
+    try:
+
+        return sum(pool.map(_backfill_shard, arguments))
+
+    finally:
+
+        pool.close()
+        pool.join()
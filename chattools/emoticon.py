@@ -13,6 +13,7 @@ EMOTICON_REGEX = re.compile(
     r'\((\w{{1,{0}}})\)'.format(MAX_EMOTICON_LENGTH),
     re.UNICODE | re.IGNORECASE | re.MULTILINE,
 )
+PAREN_REGEX = re.compile(r'[()]')
 
 
 def emoticons_regex(text):
@@ -81,3 +82,45 @@ def emoticons(text, max_length=MAX_EMOTICON_LENGTH):
                 continue
 
             yield result
+
+
+def emoticon_spans(text, max_length=MAX_EMOTICON_LENGTH):
+    """Generate an iterable of emoticons and their location in a text body.
+
+    This implementation finds the same emoticons as the emoticons function but
+    only visits the parenthesis characters of the text. An emoticon is the
+    content between a parenthesis that opens the top level and the one that
+    closes it, provided there are no other parenthesis characters between.
+
+    Args:
+        text (str): The body text of a chat message.
+        max_length (int): The maximum string length of a valid emoticon.
+
+    Returns:
+        iter of (int, int, str): An iterable of three-tuples in the form of
+            (start, end, emoticon) where start and end are the offsets of the
+            (emoticon), including the parenthesis, within the body text.
+    """
+    level = 0
+    start = previous = None
+    for match in PAREN_REGEX.finditer(text):
+
+        position = match.start()
+        if match.group() == '(':
+
+            level += 1
+            if level == 1:
+
+                start = position
+
+        else:
+
+            level -= 1
+            if level == 0 and previous == start:
+
+                result = text[start + 1:position]
+                if result and len(result) <= max_length:
+
+                    yield start, position + 1, result
+
+        previous = position
@@ -0,0 +1,369 @@
+"""Tools for cutting the tail latency of title fetches."""
+
+from __future__ import division
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import collections
+import math
+import queue
+import threading
+import timeit
+from urllib.parse import urlsplit
+
+from . import href
+
+
+SMALLEST = 0.001
+GROWTH = 1.2
+BUCKETS = 80
+MAX_SAMPLES = 1000
+HEDGE_PERCENTILE = 95
+TIMEOUT_PERCENTILE = 99
+TIMEOUT_MULTIPLIER = 3
+MIN_SAMPLES = 20
+DEFAULT_TIMEOUT = 10.0
+MIN_TIMEOUT = 0.5
+MAX_TIMEOUT = 30.0
+HEDGE_RATIO = 0.05
+HEDGE_BURST = 10
+MAX_HOSTS = 4096
+
+
+class LatencyHistogram(object):
+
+    """Counts of latencies in logarithmic buckets that favour recent ones.
+
+    Bucket bounds grow by a constant factor from one millisecond, so each
+    percentile is accurate to within that factor. Once max_samples have been
+    recorded every count is halved, so old samples fade as new ones arrive.
+    """
+
+    def __init__(self, max_samples=MAX_SAMPLES):
+        """Initialize an empty histogram.
+
+        Args:
+            max_samples (int): The weight of samples at which counts are
+                halved.
+        """
+        self._counts = [0.0] * BUCKETS
+        self._max_samples = max_samples
+        self._lock = threading.Lock()
+        self.total = 0.0
+
+    def record(self, seconds):
+        """Count a latency.
+
+        Args:
+            seconds (float): The latency.
+        """
+        index = int(
+            math.log(max(seconds, SMALLEST) / SMALLEST) / math.log(GROWTH)
+        )
+        with self._lock:
+
+            self._counts[min(index, BUCKETS - 1)] += 1
+            self.total += 1
+            if self.total >= self._max_samples:
+
+                self._counts = [count / 2 for count in self._counts]
+                self.total /= 2
+
+    def percentile(self, percent):
+        """Get the upper bound of the bucket that holds a percentile.
+
+        Args:
+            percent (float): The percentile, from 0 to 100.
+
+        Returns:
+            float: The latency in seconds or None if nothing was recorded.
+        """
+        with self._lock:
+
+            if not self.total:
+
+                return None
+
+            rank = self.total * percent / 100
+            seen = 0.0
+            for index, count in enumerate(self._counts):
+
+                seen += count
+                if count and seen >= rank:
+
+                    break
+
+        return SMALLEST * GROWTH ** (index + 1)
+
+
+class HedgeBudget(object):
+
+    """A token bucket that limits hedges to a fraction of requests."""
+
+    def __init__(self, ratio=HEDGE_RATIO, burst=HEDGE_BURST):
+        """Initialize a full budget.
+
+        Args:
+            ratio (float): The tokens earned per request. A hedge costs one,
+                so at most this fraction of requests are hedged over time.
+            burst (float): The most tokens that may be saved.
+        """
+        self._ratio = ratio
+        self._burst = burst
+        self._tokens = burst
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        """Earn the tokens of one request."""
+        with self._lock:
+
+            self._tokens = min(self._tokens + self._ratio, self._burst)
+
+    def withdraw(self):
+        """Spend a token if one is available.
+
+        Returns:
+            bool: True if a hedge may be sent.
+        """
+        with self._lock:
+
+            if self._tokens < 1:
+
+                return False
+
+            self._tokens -= 1
+            return True
+
+
+class HedgingFetcher(object):
+
+    """A body provider with adaptive timeouts and hedged requests.
+
+    The latency of every fetch is recorded by host. Once a host has enough
+    samples, its timeout is a multiple of its p99, and a request that has
+    not finished by its p95 is sent again. Whichever response arrives first
+    is used. Hedges are drawn from a shared budget so they cannot multiply
+    the load on a struggling origin.
+    """
+
+    def __init__(
+            self,
+            body_provider=href.streaming_body_provider,
+            hedge_percentile=HEDGE_PERCENTILE,
+            timeout_percentile=TIMEOUT_PERCENTILE,
+            timeout_multiplier=TIMEOUT_MULTIPLIER,
+            min_samples=MIN_SAMPLES,
+            default_timeout=DEFAULT_TIMEOUT,
+            min_timeout=MIN_TIMEOUT,
+            max_timeout=MAX_TIMEOUT,
+            budget=None,
+            timer=timeit.default_timer,
+            max_hosts=MAX_HOSTS,
+    ):
+        """Initialize the fetcher.
+
+        Args:
+            body_provider: A callable that accepts an href and a timeout
+                keyword and produces the content body or None.
+            hedge_percentile (float): The percentile of a host's latency
+                after which a request is hedged.
+            timeout_percentile (float): The percentile of a host's latency
+                the timeout is derived from.
+            timeout_multiplier (float): The multiple of that percentile to
+                wait before giving up.
+            min_samples (int): The samples a host needs before its latency
+                is used. Until then default_timeout applies and nothing is
+                hedged.
+            default_timeout (float): The timeout of hosts with few samples.
+            min_timeout (float): The shortest timeout to use.
+            max_timeout (float): The longest timeout to use.
+            budget (HedgeBudget): The budget of hedges. The default is a new
+                HedgeBudget.
+            timer: A callable that returns the current time in seconds.
+            max_hosts (int): The most hosts to keep latency histograms for.
+                The least recently used host is forgotten first.
+        """
+        self._body_provider = body_provider
+        self._hedge_percentile = hedge_percentile
+        self._timeout_percentile = timeout_percentile
+        self._timeout_multiplier = timeout_multiplier
+        self._min_samples = min_samples
+        self._default_timeout = default_timeout
+        self._min_timeout = min_timeout
+        self._max_timeout = max_timeout
+        self._budget = HedgeBudget() if budget is None else budget
+        self._timer = timer
+        self._max_hosts = max_hosts
+        self._histograms = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.timeouts = 0
+
+    def histogram(self, host):
+        """Get the latency histogram of a host, creating it if needed."""
+        with self._lock:
+
+            histogram = self._histograms.pop(host, None)
+            if histogram is None:
+
+                histogram = LatencyHistogram()
+
+            self._histograms[host] = histogram
+            while len(self._histograms) > self._max_hosts:
+
+                self._histograms.popitem(last=False)
+
+            return histogram
+
+    def delays(self, host):
+        """Get when to hedge and when to give up on a request to a host.
+
+        Args:
+            host (str): The host name.
+
+        Returns:
+            (float, float): The seconds after which to hedge, or None to not
+                hedge, and the timeout in seconds.
+        """
+        histogram = self.histogram(host)
+        if histogram.total < self._min_samples:
+
+            return None, self._default_timeout
+
+        timeout = self._timeout_multiplier * histogram.percentile(
+            self._timeout_percentile,
+        )
+        timeout = min(max(timeout, self._min_timeout), self._max_timeout)
+        return histogram.percentile(self._hedge_percentile), timeout
+
+    def _attempt(self, url, histogram, timeout, results, hedge):
+        """Fetch in the background and report the outcome."""
+        def run():
+            """Fetch the body and record its latency, even if it fails."""
+            start = self._timer()
+            body = None
+            completed = False
+            try:
+
+                body = self._body_provider(url, timeout=timeout)
+                completed = True
+
+            except Exception:  # pylint: disable=broad-except
+
+                # Any failure counts as a missing body, like a None return.
+                pass
+
+            finally:
+
+                histogram.record(self._timer() - start)
+                results.put((completed, body, hedge))
+
+        thread = threading.Thread(target=run)
+        thread.daemon = True
+        thread.start()
+
+    def __call__(self, url):
+        """Get the content body of a page, hedging if it is slow.
+
+        Args:
+            url (str): The location of a web page.
+
+        Returns:
+            str: The content body as text or None if the body could not be
+                fetched in time.
+        """
+        host = urlsplit(url).hostname or ''
+        histogram = self.histogram(host)
+        hedge_after, timeout = self.delays(host)
+        deadline = self._timer() + timeout
+        results = queue.Queue()
+        self._attempt(url, histogram, timeout, results, False)
+        self._budget.deposit()
+        with self._lock:
+
+            self.requests += 1
+
+        pending = 1
+        if hedge_after is not None:
+
+            try:
+
+                outcome = results.get(timeout=min(hedge_after, timeout))
+
+            except queue.Empty:
+
+                outcome = None
+                if self._budget.withdraw():
+
+                    self._attempt(url, histogram, timeout, results, True)
+                    pending += 1
+                    with self._lock:
+
+                        self.hedges += 1
+
+            if outcome is not None:
+
+                pending -= 1
+                if outcome[0]:
+
+                    return outcome[1]
+
+        while pending:
+
+            try:
+
+                completed, body, hedge = results.get(
+                    timeout=max(deadline - self._timer(), 0),
+                )
+
+            except queue.Empty:
+
+                break
+
+            pending -= 1
+            if completed:
+
+                if hedge:
+
+                    with self._lock:
+
+                        self.hedge_wins += 1
+
+                return body
+
+        if pending:
+
+            # The attempts still running record their latency when they end.
+            with self._lock:
+
+                self.timeouts += 1
+
+        return None
+
+    def metrics(self):
+        """Get the hedge counts and the latency of each host.
+
+        Returns:
+            dict: The requests, hedges, hedges that answered first, and
+                timeouts, with the p50, p95, and p99 latency by host.
+        """
+        with self._lock:
+
+            hosts = dict(self._histograms)
+
+        return {
+            'requests': self.requests,
+            'hedges': self.hedges,
+            'hedge_wins': self.hedge_wins,
+            'timeouts': self.timeouts,
+            'hosts': dict(
+                (host, dict(
+                    ('p{0}'.format(percent), histogram.percentile(percent))
+                    for percent in (50, 95, 99)
+                ))
+                for host, histogram in hosts.items()
+            ),
+        }
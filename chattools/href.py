@@ -7,9 +7,20 @@ from __future__ import print_function
 from __future__ import unicode_literals
 
 import re
+import socket
+import zlib
 
 from defusedxml import ElementTree
 import requests
+from requests.packages.urllib3 import exceptions as urllib3_exceptions
+
+try:
+
+    import brotli
+
+except ImportError:  # pragma: no cover
+
+    brotli = None
 
 
 # HREF regex implementation by JOHN GRUBER, available via his blog at
@@ -87,10 +98,55 @@ REGEX = r"""
   )
 )"""
 
-HREF_REGEX = re.compile(
-    REGEX,
-    re.UNICODE | re.IGNORECASE | re.MULTILINE | re.VERBOSE,
-)
+FLAGS = re.UNICODE | re.IGNORECASE | re.MULTILINE | re.VERBOSE
+
+
+class LazyPattern(object):
+
+    """A regular expression that is compiled the first time it is used.
+
+    Every public attribute is looked up on the compiled pattern, so the
+    object can stand in for the result of re.compile, though it is not an
+    instance of the compiled pattern type. Use compiled for that. Large
+    patterns take milliseconds to compile, which processes that never use
+    them should not pay for.
+    """
+
+    def __init__(self, pattern, flags=0):
+        """Initialize the pattern without compiling it.
+
+        Args:
+            pattern (str): The source of the regular expression.
+            flags (int): The re module flags to compile with.
+        """
+        self._pattern = pattern
+        self._flags = flags
+        self._compiled = None
+
+    def compiled(self):
+        """Get the compiled pattern, compiling it if needed."""
+        if self._compiled is None:
+
+            self._compiled = re.compile(self._pattern, self._flags)
+
+        return self._compiled
+
+    def __getattr__(self, name):
+        """Look up an attribute of the compiled pattern."""
+        if name.startswith('_'):
+
+            # Private names are never those of the pattern, and looking them
+            # up before __init__ has run, as pickle and copy do, would recurse.
+            raise AttributeError(name)
+
+        return getattr(self.compiled(), name)
+
+    def __reduce__(self):
+        """Pickle the source and flags rather than the compiled pattern."""
+        return (self.__class__, (self._pattern, self._flags))
+
+
+HREF_REGEX = LazyPattern(REGEX, FLAGS)
 
 
 def hrefs(text):
@@ -108,7 +164,23 @@ def hrefs(text):
         yield match
 
 
-def requests_body_provider(href):
+def href_spans(text):
+    """Generate an iterable of hrefs and their location in a text body.
+
+    Args:
+        text (str): The body text of a chat message.
+
+    Returns:
+        iter of (int, int, str): An iterable of three-tuples in the form of
+            (start, end, href) where start and end are the offsets of the href
+            within the body text.
+    """
+    for match in HREF_REGEX.finditer(text):
+
+        yield match.start(1), match.end(1), match.group(1)
+
+
+def requests_body_provider(href, session=None, timeout=None):
     """Get the content body of a page identified by an href.
 
     This implementation uses the requests library to fetch content. If the
@@ -117,11 +189,15 @@ def requests_body_provider(href):
     Args:
         href (str): The location of a web page for which to fetch the content
             body.
+        session (requests.Session): The session to fetch with, such as one
+            from resolver.session. The default is the requests module.
+        timeout (float): The most seconds to wait to connect or for data. The
+            default waits forever.
 
     Returns:
         str: The content body as text or None if the body could not be fetched.
     """
-    response = requests.get(href)
+    response = (session or requests).get(href, timeout=timeout)
     if response.status_code < 200 or response.status_code >= 300:
 
         return None
@@ -129,6 +205,174 @@ def requests_body_provider(href):
     return response.text
 
 
+ACCEPT_ENCODING = 'gzip, deflate, br' if brotli else 'gzip, deflate'
+CHUNK_SIZE = 4096
+TITLE_END = b'</title>'
+DECODE_ERRORS = (zlib.error,) + ((brotli.error,) if brotli else ())
+
+
+class _Inflater(object):
+
+    """Incrementally decompress a gzip or deflate encoded body.
+
+    Some servers send deflate bodies without the zlib header, so the raw
+    format is tried if the first chunk cannot be read as zlib or gzip.
+    """
+
+    def __init__(self):
+        """Initialize a decompressor that detects the zlib or gzip header."""
+        self._decompressor = zlib.decompressobj(32 + zlib.MAX_WBITS)
+        self._started = False
+
+    def __call__(self, data):
+        """Decompress the next chunk of the body."""
+        if self._started:
+
+            return self._decompressor.decompress(data)
+
+        self._started = True
+        try:
+
+            return self._decompressor.decompress(data)
+
+        except zlib.error:
+
+            self._decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+            return self._decompressor.decompress(data)
+
+
+def _decoder(encoding):
+    """Get a callable that decodes the chunks of a content encoding.
+
+    Args:
+        encoding (str): The value of the Content-Encoding header.
+
+    Returns:
+        A callable that accepts compressed bytes and produces the bytes they
+            decompress to, or None if the encoding is not supported.
+    """
+    encoding = (encoding or 'identity').strip().lower()
+    if encoding == 'identity':
+
+        return lambda data: data
+
+    if encoding in ('gzip', 'x-gzip', 'deflate'):
+
+        return _Inflater()
+
+    if encoding == 'br' and brotli is not None:
+
+        return brotli.Decompressor().process
+
+    return None
+
+
+def _chunks(raw, chunk_size):
+    """Generate the raw chunks of a response body.
+
+    Reading the raw response skips the error handling of requests, so the
+    errors urllib3 raises mid-body are raised as the requests errors that
+    reading response.content would raise.
+    """
+    while True:
+
+        try:
+
+            chunk = raw.read(chunk_size, decode_content=False)
+
+        except urllib3_exceptions.ProtocolError as error:
+
+            raise requests.exceptions.ChunkedEncodingError(error)
+
+        except (urllib3_exceptions.HTTPError, socket.error) as error:
+
+            raise requests.ConnectionError(error)
+
+        if not chunk:
+
+            return
+
+        yield chunk
+
+
+def streaming_body_provider(
+        href,
+        chunk_size=CHUNK_SIZE,
+        marker=TITLE_END,
+        session=None,
+        timeout=None,
+):
+    """Get the start of the content body of a page identified by an href.
+
+    This implementation asks for a gzip, deflate, or, if the brotli package
+    is installed, brotli encoded response. The body is decompressed as it
+    arrives and the download stops once the end of the title has been seen.
+    Only the first few kilobytes of most pages are transferred and inflated.
+    If the response is not a 2XX then None will be returned instead.
+
+    Args:
+        href (str): The location of a web page for which to fetch the content
+            body.
+        chunk_size (int): The number of compressed bytes to read at a time.
+        marker (bytes): The text after which the rest of the page is not
+            needed. If it never appears then the whole body is read.
+        session (requests.Session): The session to fetch with, such as one
+            from resolver.session. The default is the requests module.
+        timeout (float): The most seconds to wait to connect or for data. The
+            default waits forever.
+
+    Returns:
+        str: The content body, up to the end of the chunk that contains the
+            marker, as text or None if the body could not be fetched or
+            decoded.
+
+    Raises:
+        requests.RequestException: If the connection fails or times out,
+            including while the body is being read.
+    """
+    response = (session or requests).get(
+        href,
+        headers={'Accept-Encoding': ACCEPT_ENCODING},
+        stream=True,
+        timeout=timeout,
+    )
+    try:
+
+        if response.status_code < 200 or response.status_code >= 300:
+
+            return None
+
+        decode = _decoder(response.headers.get('Content-Encoding'))
+        if decode is None:
+
+            return None
+
+        body = bytearray()
+        for chunk in _chunks(response.raw, chunk_size):
+
+            searched = max(len(body) - len(marker) + 1, 0)
+            body.extend(decode(chunk))
+            if body.find(marker, searched) >= 0:
+
+                break
+
+        try:
+
+            return bytes(body).decode(response.encoding or 'utf-8', 'replace')
+
+        except LookupError:
+
+            return bytes(body).decode('utf-8', 'replace')
+
+    except DECODE_ERRORS:
+
+        return None
+
+    finally:
+
+        response.close()
+
+
 def etree_title_provider(body):
     """Get the title of a page from its content body.
 
@@ -202,7 +446,9 @@ def titles(
             of sites that should have title extracted.
         body_provider: A callable that accepts an href and produces the content
             body of the page. The callable must return None if the content
-            body cannot be fetched.
+            body cannot be fetched. It may return only the start of the body,
+            as streaming_body_provider does, in which case the title_provider
+            must accept a truncated body.
         title_provider: A callable that accepts an xhtml content body and
             produces the title of the page if found. The callable must return
             None if the content body is not valid or if a title cannot be
@@ -219,10 +465,30 @@ def titles(
         if not body:
 
             yield None
+            continue
 
-        title = title_provider(body)
-        if not title:
+        yield title_provider(body) or None
 
-            yield None
 
-        yield title
+def streaming_titles(urls, title_provider=scanning_title_provider):
+    """Generate page titles while downloading only the start of each page.
+
+    This is titles with streaming_body_provider. The bodies end soon after
+    the title, so etree_title_provider, which needs a complete document,
+    cannot be used here.
+
+    Args:
+        urls (iter of str): An iterable of strings that represent the location
+            of sites that should have title extracted.
+        title_provider: A callable that accepts the start of an xhtml content
+            body and produces the title of the page if found.
+
+    Returns:
+        iter of str: An iterable of titles. Values may be None if the title
+            could not be determined for any reason.
+    """
+    return titles(
+        urls,
+        body_provider=streaming_body_provider,
+        title_provider=title_provider,
+    )
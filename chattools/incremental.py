@@ -0,0 +1,258 @@
+"""Tools for re-extracting metadata from edited messages."""
+
+from __future__ import division
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import unicode_literals
+
+from . import canonical
+from . import emoticon
+from . import href
+from . import mention
+from . import metadata
+
+
+MARGIN = 32
+WHITESPACE = ' \t\n\r\x0b\x0c'
+
+
+class Extraction(object):
+
+    """The located content of one revision of a chat message."""
+
+    def __init__(self, message, emoticons, hrefs, mentions, titles=None):
+        """Initialize the extraction with the content found in a message.
+
+        Args:
+            message (str): The message text the content was extracted from.
+            emoticons (iter of (int, int, str)): The emoticon spans.
+            hrefs (iter of (int, int, str)): The href spans.
+            mentions (iter of (int, int, str)): The @mention spans.
+            titles (dict): Known page titles by href.
+        """
+        self.message = message
+        self.emoticons = tuple(emoticons)
+        self.hrefs = tuple(hrefs)
+        self.mentions = tuple(mentions)
+        self.titles = dict(titles or {})
+
+    def _title_provider(self, title_provider):
+        """Wrap a title provider so that known titles are not fetched."""
+        def provider(urls):
+            """Fetch only the titles that are not already known."""
+            urls = tuple(urls)
+            missing = tuple(set(url for url in urls if url not in self.titles))
+            self.titles.update(zip(missing, title_provider(missing)))
+            return (self.titles.get(url) for url in urls)
+
+        return provider
+
+    def metadata(
+            self,
+            title_provider=canonical.titles,
+            json_provider=metadata.JSON_PROVIDER,
+    ):
+        """Get a Metadata container for the extracted content.
+
+        Titles fetched through the container are remembered so that later
+        revisions of the message do not fetch them again.
+
+        Args:
+            title_provider: A callable that generates an iterable of titles
+                from an iterable of hrefs.
+            json_provider: A callable that converts a Python dictionary into
+                JSON text.
+
+        Returns:
+            Metadata: A container that does not run the extractors again.
+        """
+        return metadata.Metadata(
+            self.message,
+            emoticon_provider=metadata.constant_provider(
+                value for _, _, value in self.emoticons
+            ),
+            href_provider=metadata.constant_provider(
+                value for _, _, value in self.hrefs
+            ),
+            title_provider=self._title_provider(title_provider),
+            mention_provider=metadata.constant_provider(
+                value for _, _, value in self.mentions
+            ),
+            json_provider=json_provider,
+        )
+
+
+def extract(
+        message,
+        emoticon_provider=emoticon.emoticon_spans,
+        href_provider=href.href_spans,
+        mention_provider=mention.mention_spans,
+):
+    """Extract the located content of a complete message.
+
+    Args:
+        message (str): The message text for which to extract content.
+        emoticon_provider: A callable that generates an iterable of emoticon
+            spans from a message text.
+        href_provider: A callable that generates an iterable of href spans
+            from a message text.
+        mention_provider: A callable that generates an iterable of mention
+            spans from a message text.
+
+    Returns:
+        Extraction: The content found in the message.
+    """
+    return Extraction(
+        message,
+        emoticon_provider(message),
+        href_provider(message),
+        mention_provider(message),
+    )
+
+
+def _common_prefix(first, second, limit):
+    """Get the length of the common prefix using C level comparisons."""
+    low, high = 0, limit
+    while low < high:
+
+        middle = (low + high + 1) // 2
+        if first[:middle] == second[:middle]:
+
+            low = middle
+
+        else:
+
+            high = middle - 1
+
+    return low
+
+
+def _common_suffix(first, second, limit):
+    """Get the length of the common suffix using C level comparisons."""
+    low, high = 0, limit
+    while low < high:
+
+        middle = (low + high + 1) // 2
+        if first[len(first) - middle:] == second[len(second) - middle:]:
+
+            low = middle
+
+        else:
+
+            high = middle - 1
+
+    return low
+
+
+def _boundary_before(text, position):
+    """Get the offset of the last whitespace at or before a position."""
+    if position <= 0:
+
+        return 0
+
+    return max(
+        0,
+        max(text.rfind(char, 0, position + 1) for char in WHITESPACE),
+    )
+
+
+def _boundary_after(text, position):
+    """Get the offset of the first whitespace at or after a position."""
+    found = tuple(
+        index for index in (text.find(char, position) for char in WHITESPACE)
+        if index >= 0
+    )
+    return min(found) if found else len(text)
+
+
+def _level(text, end):
+    """Get the parenthesis nesting level of a text up to an offset."""
+    return text.count('(', 0, end) - text.count(')', 0, end)
+
+
+def _splice(spans, start, old_end, window, delta):
+    """Replace the spans of the edited window with newly extracted ones."""
+    head = tuple(span for span in spans if span[1] <= start)
+    tail = tuple(
+        (span_start + delta, span_end + delta, value)
+        for span_start, span_end, value in spans if span_start >= old_end
+    )
+    window = tuple(
+        (span_start + start, span_end + start, value)
+        for span_start, span_end, value in window
+    )
+    return head + window + tail
+
+
+def revise(
+        previous,
+        message,
+        margin=MARGIN,
+        emoticon_provider=emoticon.emoticon_spans,
+        href_provider=href.href_spans,
+        mention_provider=mention.mention_spans,
+):
+    """Extract the located content of an edited message.
+
+    Only the region that changed between the revisions is scanned again. The
+    region is widened by the margin and then out to the nearest whitespace on
+    each side so that no href or @mention can straddle its edges. Emoticons
+    may contain whitespace, so they are only reused when the parenthesis
+    nesting is balanced at both edges in both revisions. Otherwise all of the
+    emoticons are extracted again. Titles are kept for every href that is
+    still present.
+
+    Args:
+        previous (Extraction): The content of the previous revision.
+        message (str): The text of the new revision.
+        margin (int): The number of characters of context to scan on each
+            side of the changed region.
+        emoticon_provider: A callable that generates an iterable of emoticon
+            spans from a message text.
+        href_provider: A callable that generates an iterable of href spans
+            from a message text.
+        mention_provider: A callable that generates an iterable of mention
+            spans from a message text.
+
+    Returns:
+        Extraction: The content found in the new revision.
+    """
+    old = previous.message
+    limit = min(len(old), len(message))
+    prefix = _common_prefix(old, message, limit)
+    suffix = _common_suffix(old, message, limit - prefix)
+    start = _boundary_before(message, prefix - margin - 1)
+    end = _boundary_after(message, len(message) - suffix + margin)
+    delta = len(message) - len(old)
+    old_end = end - delta
+    window = message[start:end]
+
+    hrefs = _splice(
+        previous.hrefs, start, old_end, href_provider(window), delta,
+    )
+    mentions = _splice(
+        previous.mentions, start, old_end, mention_provider(window), delta,
+    )
+    if not (
+            _level(message, start) or
+            _level(message, end) or
+            _level(old, old_end)
+    ):
+
+        emoticons = _splice(
+            previous.emoticons,
+            start,
+            old_end,
+            emoticon_provider(window),
+            delta,
+        )
+
+    else:
+
+        emoticons = emoticon_provider(message)
+
+    titles = dict(
+        (url, previous.titles[url])
+        for _, _, url in hrefs if url in previous.titles
+    )
+    return Extraction(message, emoticons, hrefs, mentions, titles)
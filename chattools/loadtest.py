@@ -0,0 +1,480 @@
+"""Tools for load testing metadata generation against a local origin."""
+
+from __future__ import division
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import argparse
+import queue
+import random
+import socket
+import sys
+import threading
+import time
+import timeit
+import zlib
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+
+from . import metadata
+
+
+PAGE_SIZE = 2048
+PERCENTILES = (50, 90, 99, 99.9)
+DISCONNECTS = (BrokenPipeError, ConnectionResetError)
+
+
+def constant(seconds):
+    """Create a latency distribution that always takes the same time."""
+    return lambda rng: seconds
+
+
+def exponential(mean):
+    """Create an exponential latency distribution with a given mean."""
+    return lambda rng: rng.expovariate(1 / mean) if mean else 0
+
+
+def lognormal(median, sigma):
+    """Create a heavy tailed latency distribution with a given median."""
+    return lambda rng: median * rng.lognormvariate(0, sigma)
+
+
+class _Server(ThreadingMixIn, HTTPServer):
+
+    """An HTTP server that handles each request in a thread."""
+
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        """Ignore clients that disconnect early and report other errors."""
+        if isinstance(sys.exc_info()[1], DISCONNECTS):
+
+            return
+
+        HTTPServer.handle_error(self, request, client_address)
+
+
+class StubOrigin(object):
+
+    """A local HTTP origin that serves titled pages with configurable faults.
+
+    Every path is served as a page whose title is derived from the path, so
+    any href under the origin url can be fetched.
+    """
+
+    def __init__(
+            self,
+            latency=constant(0),
+            size=PAGE_SIZE,
+            error_rate=0.0,
+            drip=1,
+            drip_delay=0.0,
+            seed=None,
+            encoding=None,
+    ):
+        """Initialize the origin with its response behaviour.
+
+        Args:
+            latency: A callable that accepts a random.Random and produces the
+                seconds to wait before responding.
+            size (int): The approximate size of each page in bytes.
+            error_rate (float): The fraction of requests answered with a 500.
+            drip (int): The number of pieces to send each page in.
+            drip_delay (float): The seconds to wait between pieces.
+            seed: The seed of the random number generator.
+            encoding (str): Either 'gzip' or 'deflate' to compress pages for
+                clients that accept the encoding.
+        """
+        self._latency = latency
+        self._size = size
+        self._error_rate = error_rate
+        self._drip = max(drip, 1)
+        self._drip_delay = drip_delay
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = None
+        self._encoding = encoding
+        self._thread = None
+        self.requests = 0
+        self.sent = 0
+
+    def __enter__(self):
+        """Start the origin when used as a context manager."""
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """Stop the origin when the context exits."""
+        self.stop()
+
+    @property
+    def url(self):
+        """Get the base url of the running origin."""
+        host, port = self._server.server_address[:2]
+        return 'http://{0}:{1}'.format(host, port)
+
+    def plan(self):
+        """Choose the latency and whether a request fails."""
+        with self._lock:
+
+            self.requests += 1
+            return (
+                self._latency(self._rng),
+                self._rng.random() < self._error_rate,
+            )
+
+    def page(self, path):
+        """Get the body served for a path.
+
+        Args:
+            path (str): The path of the request.
+
+        Returns:
+            bytes: The page content.
+        """
+        head = '<html><head><title>Page {0}</title></head><body>'.format(path)
+        tail = '</body></html>'
+        padding = 'x' * max(self._size - len(head) - len(tail), 0)
+        return (head + padding + tail).encode('utf-8')
+
+    def encode(self, body, accepted):
+        """Compress a body if the client accepts the encoding of the origin.
+
+        Args:
+            body (bytes): The page content.
+            accepted (str): The value of the Accept-Encoding header.
+
+        Returns:
+            (str, bytes): The content encoding, or None, and the body to send.
+        """
+        if self._encoding is None or self._encoding not in (accepted or ''):
+
+            return None, body
+
+        wbits = 16 + zlib.MAX_WBITS if self._encoding == 'gzip' else 15
+        compressor = zlib.compressobj(6, zlib.DEFLATED, wbits)
+        return self._encoding, compressor.compress(body) + compressor.flush()
+
+    def start(self):
+        """Start serving on an unused local port in a background thread."""
+        origin = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            """Serve the pages of the origin."""
+
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):  # pylint: disable=invalid-name
+                """Respond to a request after the planned latency."""
+                delay, fail = origin.plan()
+                time.sleep(delay)
+                if fail:
+
+                    self.send_response(500)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+
+                encoding, body = origin.encode(
+                    origin.page(self.path),
+                    self.headers.get('Accept-Encoding'),
+                )
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                if encoding is not None:
+
+                    self.send_header('Content-Encoding', encoding)
+
+                self.send_header('Content-Length', '{0}'.format(len(body)))
+                self.end_headers()
+                self.wfile.flush()
+                origin.drip(self.wfile, body)
+
+            def log_message(self, *args):
+                """Keep the origin quiet."""
+
+        self._server = _Server(('127.0.0.1', 0), Handler)
+        self._thread = threading.Thread(target=self._server.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def drip(self, stream, body):
+        """Write a body in pieces separated by the drip delay.
+
+        Writing stops without error if the client disconnects.
+
+        Args:
+            stream: The file-like object of the connection.
+            body (bytes): The content to write.
+        """
+        piece = -(-len(body) // self._drip)
+        for start in range(0, len(body), piece or 1):
+
+            if start and self._drip_delay:
+
+                time.sleep(self._drip_delay)
+
+            chunk = body[start:start + piece]
+            try:
+
+                stream.write(chunk)
+                stream.flush()
+
+            except (IOError, socket.error):
+
+                return
+
+            with self._lock:
+
+                self.sent += len(chunk)
+
+    def stop(self):
+        """Stop serving and release the port."""
+        if self._server is not None:
+
+            self._server.shutdown()
+            self._server.server_close()
+            self._thread.join()
+            self._server = None
+
+
+def messages(base_url, count, links=3, pages=100, seed=None):
+    """Generate synthetic chat messages that link to an origin.
+
+    Args:
+        base_url (str): The url of the origin, such as StubOrigin.url.
+        count (int): The number of messages.
+        links (int): The most links to include in a message.
+        pages (int): The number of distinct pages to link to.
+        seed: The seed of the random number generator.
+
+    Returns:
+        iter of str: The messages.
+    """
+    rng = random.Random(seed)
+    words = ('ship', 'it', 'today', 'anyone', 'seen', 'this', 'bug', 'lol')
+    for _ in range(count):
+
+        parts = [rng.choice(words) for _ in range(rng.randint(3, 12))]
+        parts.append('@user{0}'.format(rng.randint(0, 50)))
+        parts.append('(emoticon{0})'.format(rng.randint(0, 10)))
+        for _ in range(rng.randint(0, links)):
+
+            parts.append(
+                '{0}/page/{1}'.format(base_url, rng.randint(0, pages)),
+            )
+
+        rng.shuffle(parts)
+        yield ' '.join(parts)
+
+
+class Report(object):
+
+    """Throughput and latency of a load test."""
+
+    def __init__(self, latencies, errors, elapsed):
+        """Initialize the report with the measurements of a run.
+
+        Args:
+            latencies (iter of float): The seconds from when each message was
+                scheduled until its JSON was produced.
+            errors (int): The number of messages that raised an exception.
+            elapsed (float): The seconds the run took.
+        """
+        self.latencies = sorted(latencies)
+        self.errors = errors
+        self.elapsed = elapsed
+
+    @property
+    def throughput(self):
+        """Get the completed messages per second."""
+        return len(self.latencies) / self.elapsed if self.elapsed else 0.0
+
+    def percentile(self, percent):
+        """Get a latency percentile using the nearest rank.
+
+        Args:
+            percent (float): The percentile, from 0 to 100.
+
+        Returns:
+            float: The latency in seconds or None if nothing completed.
+        """
+        if not self.latencies:
+
+            return None
+
+        rank = int(-(-percent * len(self.latencies) // 100))
+        return self.latencies[min(max(rank, 1), len(self.latencies)) - 1]
+
+    def summary(self):
+        """Get the report as a JSON compatible dictionary."""
+        return {
+            'completed': len(self.latencies),
+            'errors': self.errors,
+            'elapsed': self.elapsed,
+            'throughput': self.throughput,
+            'latency': dict(
+                ('p{0}'.format(percent), self.percentile(percent))
+                for percent in PERCENTILES
+            ),
+        }
+
+    def __str__(self):
+        """Get the report as human readable text."""
+        lines = [
+            'completed {0} errors {1} in {2:.2f}s ({3:.1f} msg/s)'.format(
+                len(self.latencies),
+                self.errors,
+                self.elapsed,
+                self.throughput,
+            ),
+        ]
+        for percent in PERCENTILES:
+
+            value = self.percentile(percent)
+            lines.append('p{0:<5} {1}'.format(
+                percent,
+                'n/a' if value is None else '{0:.1f}ms'.format(value * 1000),
+            ))
+
+        return '\n'.join(lines)
+
+
+def drive(
+        texts,
+        rate,
+        concurrency=8,
+        factory=metadata.Metadata,
+        timer=timeit.default_timer,
+):
+    """Push messages through Metadata.json at a target rate.
+
+    Messages are scheduled at fixed intervals regardless of how long earlier
+    ones take, and latency is measured from the scheduled time. A system that
+    falls behind therefore shows the queueing delay it causes.
+
+    Args:
+        texts (iter of str): The messages to process.
+        rate (float): The messages to start per second.
+        concurrency (int): The number of worker threads.
+        factory: A callable that accepts a message and produces an object
+            with a json attribute, such as Metadata.
+        timer: A callable that returns the current time in seconds.
+
+    Returns:
+        Report: The measurements of the run.
+    """
+    pending = queue.Queue()
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+
+    def work():
+        """Process scheduled messages until told to stop."""
+        while True:
+
+            item = pending.get()
+            if item is None:
+
+                return
+
+            scheduled, text = item
+            try:
+
+                factory(text).json
+
+            except Exception:  # pylint: disable=broad-except
+
+                with lock:
+
+                    errors[0] += 1
+
+                continue
+
+            finished = timer()
+            with lock:
+
+                latencies.append(finished - scheduled)
+
+    workers = [threading.Thread(target=work) for _ in range(concurrency)]
+    for worker in workers:
+
+        worker.daemon = True
+        worker.start()
+
+    start = timer()
+    for index, text in enumerate(texts):
+
+        scheduled = start + index / rate
+        delay = scheduled - timer()
+        if delay > 0:
+
+            time.sleep(delay)
+
+        pending.put((scheduled, text))
+
+    for _ in workers:
+
+        pending.put(None)
+
+    for worker in workers:
+
+        worker.join()
+
+    return Report(latencies, errors[0], timer() - start)
+
+
+def _distribution(value):
+    """Parse a latency distribution given on the command line."""
+    name, _, arguments = value.partition(':')
+    arguments = [float(number) for number in arguments.split(',') if number]
+    return {
+        'constant': constant,
+        'exponential': exponential,
+        'lognormal': lognormal,
+    }[name](*arguments)
+
+
+def main(argv=None):
+    """Run a load test from the command line."""
+    parser = argparse.ArgumentParser(
+        description='Load test Metadata.json against a local stub origin.',
+    )
+    parser.add_argument('--rate', type=float, default=50)
+    parser.add_argument('--count', type=int, default=500)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument(
+        '--latency',
+        type=_distribution,
+        default='exponential:0.05',
+        help='constant:S, exponential:MEAN, or lognormal:MEDIAN,SIGMA',
+    )
+    parser.add_argument('--size', type=int, default=PAGE_SIZE)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--drip', type=int, default=1)
+    parser.add_argument('--drip-delay', type=float, default=0.0)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+    with StubOrigin(
+            latency=args.latency,
+            size=args.size,
+            error_rate=args.error_rate,
+            drip=args.drip,
+            drip_delay=args.drip_delay,
+            seed=args.seed,
+    ) as origin:
+
+        report = drive(
+            messages(origin.url, args.count, seed=args.seed),
+            args.rate,
+            args.concurrency,
+        )
+
+    print(report)
+
+
+if __name__ == '__main__':
+
+    main()
@@ -0,0 +1,270 @@
+"""Tools for reusing the extracted content of repeated messages."""
+
+from __future__ import division
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import collections
+import functools
+import hashlib
+import threading
+
+from . import canonical
+from . import emoticon
+from . import href
+from . import mention
+from . import metadata
+
+
+MAX_ENTRIES = 10000
+MAX_BYTES = 16 * 1024 * 1024
+ENTRY_OVERHEAD = 64
+
+try:
+
+    _HASH = functools.partial(hashlib.blake2b, digest_size=16)
+
+except AttributeError:  # pragma: no cover
+
+    _HASH = hashlib.sha1
+
+
+def digest(message, namespace=b''):
+    """Get a short hash of a message text.
+
+    Args:
+        message: The message as text or as UTF-8 bytes.
+        namespace (bytes): A prefix that separates the hashes of different
+            provider configurations.
+
+    Returns:
+        bytes: The digest of the namespace and the message.
+    """
+    if isinstance(message, type('')):
+
+        message = message.encode('utf-8', 'surrogatepass')
+
+    hasher = _HASH(namespace)
+    hasher.update(b'\0')
+    hasher.update(message)
+    return hasher.digest()
+
+
+class MemoCache(object):
+
+    """A least recently used cache bounded by both entries and bytes."""
+
+    def __init__(self, max_entries=MAX_ENTRIES, max_bytes=MAX_BYTES):
+        """Initialize an empty cache.
+
+        Args:
+            max_entries (int): The maximum number of entries to hold.
+            max_bytes (int): The maximum approximate size of the entries. The
+                size of an entry is the length of its stored values plus a
+                fixed overhead.
+        """
+        self._max_entries = max_entries
+        self._max_bytes = max_bytes
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        """Get the number of entries currently held."""
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        """Get an entry and mark it as recently used.
+
+        Args:
+            key (bytes): The digest of a message.
+            default: The value to return if there is no entry.
+
+        Returns:
+            The stored value or the default value.
+        """
+        with self._lock:
+
+            try:
+
+                value, weight = self._entries.pop(key)
+
+            except KeyError:
+
+                self.misses += 1
+                return default
+
+            self._entries[key] = (value, weight)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, weight):
+        """Store an entry, evicting the least recently used as needed.
+
+        Args:
+            key (bytes): The digest of a message.
+            value: The value to store.
+            weight (int): The approximate size of the value in bytes. Values
+                larger than the byte limit are not stored.
+        """
+        weight += len(key) + ENTRY_OVERHEAD
+        if weight > self._max_bytes:
+
+            return
+
+        with self._lock:
+
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+
+                self.size -= previous[1]
+
+            self._entries[key] = (value, weight)
+            self.size += weight
+            while (
+                    len(self._entries) > self._max_entries or
+                    self.size > self._max_bytes
+            ):
+
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.size -= evicted
+                self.evictions += 1
+
+    def stats(self):
+        """Get the hit rate and usage of the cache as a dictionary."""
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'bytes': self.size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
+
+
+def _name(provider):
+    """Get a description of a provider that distinguishes it from others."""
+    return '{0}:{1!r}'.format(getattr(provider, '__module__', ''), provider)
+
+
+class Memo(object):
+
+    """A Metadata factory that extracts each distinct message only once.
+
+    Emoticons, hrefs, and mentions are cached by a hash of the message text
+    and of the extraction providers. Titles are not part of the cached
+    result. They are looked up on every use through a canonical.TitleCache,
+    so its max_age alone decides how fresh they are.
+    """
+
+    def __init__(
+            self,
+            emoticon_provider=emoticon.emoticons,
+            href_provider=href.hrefs,
+            title_provider=href.streaming_titles,
+            mention_provider=mention.mentions,
+            json_provider=metadata.JSON_PROVIDER,
+            cache=None,
+            title_cache=None,
+    ):
+        """Initialize the factory with content providers.
+
+        Args:
+            emoticon_provider: A callable that generates an iterable of
+                emoticons from a message text.
+            href_provider: A callable that generates an iterable of hrefs
+                from a message text.
+            title_provider: A callable that generates an iterable of titles
+                from an iterable of hrefs. It is given distinct canonical
+                hrefs that are not in the title cache.
+            mention_provider: A callable that generates an iterable of mentions
+                from a message text.
+            json_provider: A callable that converts a Python dictionary into
+                JSON text.
+            cache (MemoCache): The cache of extracted content. It may be
+                shared by factories with different providers. The default is
+                a new MemoCache.
+            title_cache (TitleCache): The cache of titles. The default is a
+                new canonical.TitleCache that keeps titles for
+                canonical.MAX_AGE seconds.
+        """
+        self._emoticon_provider = emoticon_provider
+        self._href_provider = href_provider
+        self._mention_provider = mention_provider
+        self._json_provider = json_provider
+        self.cache = MemoCache() if cache is None else cache
+        self.title_cache = (
+            canonical.TitleCache(max_age=canonical.MAX_AGE)
+            if title_cache is None else title_cache
+        )
+        self._title_provider = functools.partial(
+            canonical.titles,
+            cache=self.title_cache,
+            title_provider=title_provider,
+        )
+        self._namespace = '\0'.join((
+            _name(emoticon_provider),
+            _name(href_provider),
+            _name(mention_provider),
+        )).encode('utf-8', 'surrogatepass')
+
+    def extract(self, message):
+        """Get the content of a message, extracting it only if not cached.
+
+        Args:
+            message (str): The message text.
+
+        Returns:
+            (tuple, tuple, tuple): The emoticons, hrefs, and mentions.
+        """
+        key = digest(message, self._namespace)
+        content = self.cache.get(key)
+        if content is None:
+
+            content = (
+                tuple(self._emoticon_provider(message)),
+                tuple(self._href_provider(message)),
+                tuple(self._mention_provider(message)),
+            )
+            self.cache.set(
+                key,
+                content,
+                sum(len(value) for values in content for value in values),
+            )
+
+        return content
+
+    def metadata(self, message):
+        """Get a Metadata container that reuses cached content.
+
+        Args:
+            message (str): The message text.
+
+        Returns:
+            Metadata: A container whose titles are still fetched, or found in
+                the title cache, when they are used.
+        """
+        emoticons, hrefs, mentions = self.extract(message)
+        return metadata.Metadata(
+            message,
+            emoticon_provider=metadata.constant_provider(emoticons),
+            href_provider=metadata.constant_provider(hrefs),
+            title_provider=self._title_provider,
+            mention_provider=metadata.constant_provider(mentions),
+            json_provider=self._json_provider,
+        )
+
+    def __call__(self, message):
+        """Get a Metadata container so the factory can replace Metadata."""
+        return self.metadata(message)
+
+    def stats(self):
+        """Get the hit rate of the extraction and title caches."""
+        stats = self.cache.stats()
+        stats['titles'] = len(self.title_cache)
+        return stats
@@ -27,3 +27,19 @@ def mentions(text):
     for _, match in MENTION_REGEX.findall(text):
 
         yield match
+
+
+def mention_spans(text):
+    """Generate an iterable of @mentions and their location in a text body.
+
+    Args:
+        text (str): The body text of a chat message.
+
+    Returns:
+        iter of (int, int, str): An iterable of three-tuples in the form of
+            (start, end, mention) where start and end are the offsets of the
+            @mention, including the @, within the body text.
+    """
+    for match in MENTION_REGEX.finditer(text):
+
+        yield match.start(2) - 1, match.end(2), match.group(2)
@@ -7,6 +7,7 @@ from __future__ import unicode_literals
 
 import json
 
+from . import canonical
 from . import emoticon
 from . import href
 from . import mention
@@ -15,6 +16,28 @@ from . import mention
 JSON_PROVIDER = json.dumps
 
 
+def constant_provider(values):
+    """Create a provider that produces values which are already known.
+
+    This is used to build a Metadata container from previously extracted
+    content without running the extractors again.
+
+    Args:
+        values (iter): The values the provider should produce.
+
+    Returns:
+        A callable that accepts, and ignores, a single argument and produces
+            an iterable of the given values.
+    """
+    values = tuple(values)
+
+    def provider(_):
+        """Produce the known values."""
+        return iter(values)
+
+    return provider
+
+
 class Metadata(object):
 
     """Metadata container for a chat message."""
@@ -24,7 +47,7 @@ class Metadata(object):
             message,
             emoticon_provider=emoticon.emoticons,
             href_provider=href.hrefs,
-            title_provider=href.titles,
+            title_provider=canonical.titles,
             mention_provider=mention.mentions,
             json_provider=JSON_PROVIDER,
     ):
@@ -37,7 +60,8 @@ class Metadata(object):
             href_provider: A callable that generates an iterable of hrefs
                 from a message text.
             title_provider: A callable that generates an iterable of titles
-                from an iterable of hrefs.
+                from an iterable of hrefs. The default fetches each distinct
+                canonical href only once.
             mention_provider: A callable that generates an iterable of mentions
                 from a message text.
             json_provider: A callable that converts a Python dictionary into
@@ -55,13 +79,18 @@ class Metadata(object):
         """Get an iterable of emoticons used in the message."""
         return self._emoticon_provider(self._message)
 
+    @property
+    def hrefs(self):
+        """Get an iterable of hrefs used in the message without titles."""
+        return self._href_provider(self._message)
+
     @property
     def links(self):
         """Get an iterable of links used in the message.
 
         Each element is a two-tuple in the form of (url, title).
         """
-        hrefs = tuple(self._href_provider(self._message))
+        hrefs = tuple(self.hrefs)
         return zip(hrefs, self._title_provider(hrefs))
 
     @property
@@ -0,0 +1,340 @@
+"""A staged pipeline that produces metadata for a stream of messages."""
+
+from __future__ import division
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import queue
+import threading
+import timeit
+
+from . import canonical
+from . import emoticon
+from . import href
+from . import mention
+from . import metadata
+
+
+QUEUE_SIZE = 64
+MAX_IN_FLIGHT = 1024
+EXTRACT_WORKERS = 1
+FETCH_WORKERS = 16
+SERIALIZE_WORKERS = 1
+
+_STOP = object()
+
+
+class Job(object):
+
+    """A message and the content produced for it by each stage."""
+
+    def __init__(self, conversation, sequence, message):
+        """Initialize the job with a message.
+
+        Args:
+            conversation: The key of the conversation the message belongs to.
+            sequence (int): The position of the message in its conversation.
+            message (str): The message text.
+        """
+        self.conversation = conversation
+        self.sequence = sequence
+        self.message = message
+        self.emoticons = ()
+        self.hrefs = ()
+        self.mentions = ()
+        self.titles = ()
+        self.payload = None
+        self.error = None
+
+
+class Stage(object):
+
+    """Worker threads that take jobs from a bounded queue."""
+
+    def __init__(self, name, function, workers, queue_size, timer):
+        """Initialize the stage without starting it.
+
+        Args:
+            name (str): The name used in metrics.
+            function: A callable that accepts a job and fills in its content.
+            workers (int): The number of threads.
+            queue_size (int): The most jobs that may wait for the stage.
+            timer: A callable that returns the current time in seconds.
+        """
+        self.name = name
+        self.queue = queue.Queue(queue_size)
+        self._function = function
+        self._timer = timer
+        self._lock = threading.Lock()
+        self._threads = [
+            threading.Thread(target=self._work) for _ in range(workers)
+        ]
+        self.forward = None
+        self.processed = 0
+        self.busy = 0.0
+        self.blocked = 0.0
+
+    def start(self, forward):
+        """Start the workers.
+
+        Args:
+            forward: A callable that accepts a finished job and passes it on.
+                It may block until the next stage has room.
+        """
+        self.forward = forward
+        for thread in self._threads:
+
+            thread.daemon = True
+            thread.start()
+
+    def _work(self):
+        """Run jobs until told to stop."""
+        while True:
+
+            job = self.queue.get()
+            if job is _STOP:
+
+                return
+
+            start = self._timer()
+            if job.error is None:
+
+                try:
+
+                    self._function(job)
+
+                except Exception as error:  # pylint: disable=broad-except
+
+                    job.error = error
+
+            finished = self._timer()
+            self.forward(job)
+            with self._lock:
+
+                self.processed += 1
+                self.busy += finished - start
+                self.blocked += self._timer() - finished
+
+    def stop(self):
+        """Stop the workers once the jobs already queued are done."""
+        for _ in self._threads:
+
+            self.queue.put(_STOP)
+
+        for thread in self._threads:
+
+            thread.join()
+
+    def metrics(self, elapsed):
+        """Get the load of the stage as a dictionary.
+
+        Args:
+            elapsed (float): The seconds the stage has been running.
+
+        Returns:
+            dict: The workers, queue depth and capacity, jobs processed, and
+                the fractions of worker time spent busy and blocked on the
+                next stage.
+        """
+        capacity = len(self._threads) * elapsed
+        return {
+            'workers': len(self._threads),
+            'depth': self.queue.qsize(),
+            'capacity': self.queue.maxsize,
+            'processed': self.processed,
+            'utilization': self.busy / capacity if capacity else 0.0,
+            'blocked': self.blocked / capacity if capacity else 0.0,
+        }
+
+
+class Pipeline(object):
+
+    """Produce Metadata JSON in separate extract, fetch, and serialize stages.
+
+    Each stage has its own threads and a bounded queue in front of it. A
+    producer that outpaces a stage is made to wait in put. Messages without
+    hrefs skip the fetch stage, so a burst of slow links does not hold up the
+    messages behind it. Results are still given to the sink in the order the
+    messages of each conversation were put.
+    """
+
+    def __init__(
+            self,
+            sink,
+            emoticon_provider=emoticon.emoticons,
+            href_provider=href.hrefs,
+            title_provider=canonical.titles,
+            mention_provider=mention.mentions,
+            json_provider=metadata.JSON_PROVIDER,
+            extract_workers=EXTRACT_WORKERS,
+            fetch_workers=FETCH_WORKERS,
+            serialize_workers=SERIALIZE_WORKERS,
+            queue_size=QUEUE_SIZE,
+            max_in_flight=MAX_IN_FLIGHT,
+            timer=timeit.default_timer,
+    ):
+        """Initialize the pipeline and start its stages.
+
+        Args:
+            sink: A callable that accepts each finished Job. The payload
+                attribute holds the JSON text and the error attribute holds
+                any exception raised while producing it. The sink is called
+                from the serialize workers, one job at a time, and must not
+                raise.
+            emoticon_provider: A callable that generates an iterable of
+                emoticons from a message text.
+            href_provider: A callable that generates an iterable of hrefs
+                from a message text.
+            title_provider: A callable that generates an iterable of titles
+                from an iterable of hrefs.
+            mention_provider: A callable that generates an iterable of mentions
+                from a message text.
+            json_provider: A callable that converts a Python dictionary into
+                JSON text.
+            extract_workers (int): The threads that extract content.
+            fetch_workers (int): The threads that fetch titles.
+            serialize_workers (int): The threads that produce JSON.
+            queue_size (int): The most jobs that may wait for each stage.
+            max_in_flight (int): The most messages that may be put but not
+                yet given to the sink. This also bounds the results held back
+                to preserve order.
+            timer: A callable that returns the current time in seconds.
+        """
+        self._sink = sink
+        self._emoticon_provider = emoticon_provider
+        self._href_provider = href_provider
+        self._title_provider = title_provider
+        self._mention_provider = mention_provider
+        self._json_provider = json_provider
+        self._max_in_flight = max_in_flight
+        self._timer = timer
+        self._condition = threading.Condition()
+        self._conversations = {}
+        self._in_flight = 0
+        self._closed = False
+        self.extract = Stage(
+            'extract', self._extract, extract_workers, queue_size, timer,
+        )
+        self.fetch = Stage(
+            'fetch', self._fetch, fetch_workers, queue_size, timer,
+        )
+        self.serialize = Stage(
+            'serialize', self._serialize, serialize_workers, queue_size, timer,
+        )
+        self._started = timer()
+        self.serialize.start(self._emit)
+        self.fetch.start(self.serialize.queue.put)
+        self.extract.start(self._route)
+
+    def __enter__(self):
+        """Use the pipeline as a context manager."""
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """Finish every message and stop the stages."""
+        self.close()
+
+    def put(self, message, conversation=None):
+        """Add a message, waiting while the pipeline is full.
+
+        Args:
+            message (str): The message text.
+            conversation: A hashable key for the conversation. Results of a
+                conversation are given to the sink in the order they were put.
+        """
+        with self._condition:
+
+            if self._closed:
+
+                raise RuntimeError('The pipeline is closed.')
+
+            while self._in_flight >= self._max_in_flight:
+
+                self._condition.wait()
+
+            self._in_flight += 1
+            state = self._conversations.setdefault(conversation, [0, 0, {}])
+            job = Job(conversation, state[0], message)
+            state[0] += 1
+
+        self.extract.queue.put(job)
+
+    def _extract(self, job):
+        """Find the emoticons, hrefs, and mentions of a message."""
+        job.emoticons = tuple(self._emoticon_provider(job.message))
+        job.hrefs = tuple(self._href_provider(job.message))
+        job.mentions = tuple(self._mention_provider(job.message))
+
+    def _route(self, job):
+        """Send jobs with hrefs to be fetched and the rest to serialize."""
+        if job.hrefs and job.error is None:
+
+            self.fetch.queue.put(job)
+            return
+
+        self.serialize.queue.put(job)
+
+    def _fetch(self, job):
+        """Fetch the titles of the hrefs of a message."""
+        job.titles = tuple(self._title_provider(job.hrefs))
+
+    def _serialize(self, job):
+        """Produce the JSON payload of a message."""
+        job.payload = metadata.Metadata(
+            job.message,
+            emoticon_provider=metadata.constant_provider(job.emoticons),
+            href_provider=metadata.constant_provider(job.hrefs),
+            title_provider=metadata.constant_provider(job.titles),
+            mention_provider=metadata.constant_provider(job.mentions),
+            json_provider=self._json_provider,
+        ).json
+
+    def _emit(self, job):
+        """Give jobs to the sink in the order of their conversation."""
+        with self._condition:
+
+            state = self._conversations[job.conversation]
+            state[2][job.sequence] = job
+            while state[1] in state[2]:
+
+                self._sink(state[2].pop(state[1]))
+                state[1] += 1
+                self._in_flight -= 1
+
+            if state[0] == state[1]:
+
+                del self._conversations[job.conversation]
+
+            self._condition.notify_all()
+
+    def metrics(self):
+        """Get the load of each stage as a dictionary.
+
+        Returns:
+            dict: The number of messages in flight and, by stage name, the
+                metrics of each stage. A stage whose utilization is near one
+                needs more workers. A stage that is often blocked is waiting
+                on the stage after it.
+        """
+        elapsed = self._timer() - self._started
+        return {
+            'in_flight': self._in_flight,
+            'stages': dict(
+                (stage.name, stage.metrics(elapsed))
+                for stage in (self.extract, self.fetch, self.serialize)
+            ),
+        }
+
+    def close(self):
+        """Wait for every message to reach the sink and stop the stages."""
+        with self._condition:
+
+            self._closed = True
+            while self._in_flight:
+
+                self._condition.wait()
+
+        for stage in (self.extract, self.fetch, self.serialize):
+
+            stage.stop()
@@ -0,0 +1,260 @@
+"""Tools for capturing and replaying slow messages."""
+
+from __future__ import division
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import argparse
+import collections
+import cProfile
+import io
+import json
+import pstats
+import sys
+import threading
+import time
+import timeit
+
+from . import metadata
+
+
+THRESHOLD = 0.1
+CAPACITY = 100
+STAGES = ('emoticon', 'href', 'title', 'mention', 'json')
+
+
+def _text(message):
+    """Get a message as text so that it can be written as JSON."""
+    if isinstance(message, type('')):
+
+        return message
+
+    return bytes(message).decode('utf-8', 'replace')
+
+
+class Recorder(object):
+
+    """A bounded record of the messages that were slow to process."""
+
+    def __init__(
+            self,
+            threshold=THRESHOLD,
+            capacity=CAPACITY,
+            path=None,
+            timer=timeit.default_timer,
+    ):
+        """Initialize an empty record.
+
+        Args:
+            threshold (float): The number of seconds a message may take before
+                it is recorded.
+            capacity (int): The number of recent cases to keep in memory.
+            path (str): If given, each case is also appended to this file as
+                a line of JSON.
+            timer: A callable that returns the current time in seconds.
+        """
+        self.threshold = threshold
+        self.cases = collections.deque(maxlen=capacity)
+        self._path = path
+        self.timer = timer
+        self._lock = threading.Lock()
+
+    def observe(self, message, timings, total):
+        """Record a message if it took longer than the threshold.
+
+        Args:
+            message (str): The message text that was processed.
+            timings (dict): The seconds spent in each stage by stage name.
+            total (float): The seconds spent processing the message.
+
+        Returns:
+            dict: The recorded case or None if the message was fast enough.
+        """
+        if total < self.threshold:
+
+            return None
+
+        case = {
+            'message': _text(message),
+            'total': total,
+            'timings': dict(timings),
+            'time': time.time(),
+        }
+        with self._lock:
+
+            self.cases.append(case)
+            if self._path is not None:
+
+                with io.open(self._path, 'a', encoding='utf-8') as log:
+
+                    log.write(json.dumps(case, ensure_ascii=False) + '\n')
+
+        return case
+
+    def metadata(self, message, **providers):
+        """Get a Metadata container that records the message if it is slow.
+
+        Args:
+            message (str): The message text for which to generate metadata.
+            **providers: Any of the providers accepted by Metadata.
+
+        Returns:
+            RecordedMetadata: A container that is timed by stage.
+        """
+        return RecordedMetadata(message, self, **providers)
+
+    def extractor(self, stage, provider):
+        """Wrap an extractor so that slow calls are recorded.
+
+        Args:
+            stage (str): The name to record the timing under.
+            provider: A callable that generates an iterable from a text.
+
+        Returns:
+            A callable that accepts a text and produces a tuple of the
+                extracted values.
+        """
+        def extract(text, *args, **kwargs):
+            """Run the extractor to completion and time it."""
+            start = self.timer()
+            results = tuple(provider(text, *args, **kwargs))
+            elapsed = self.timer() - start
+            self.observe(text, {stage: elapsed}, elapsed)
+            return results
+
+        return extract
+
+
+class RecordedMetadata(metadata.Metadata):
+
+    """Metadata container that times each stage of generating its JSON."""
+
+    def __init__(self, message, recorder, **providers):
+        """Initialize the container with a message and a recorder.
+
+        Args:
+            message (str): The message text for which to generate metadata.
+            recorder (Recorder): The record of slow messages.
+            **providers: Any of the providers accepted by Metadata.
+        """
+        super(RecordedMetadata, self).__init__(message, **providers)
+        self._recorder = recorder
+        self.timings = dict((stage, 0.0) for stage in STAGES)
+        for stage in STAGES:
+
+            name = '_{0}_provider'.format(stage)
+            setattr(self, name, self._timed(stage, getattr(self, name)))
+
+    def _timed(self, stage, provider):
+        """Wrap a provider so its time, including iteration, is recorded."""
+        timer = self._recorder.timer
+
+        def timed(argument):
+            """Run the provider to completion and time it."""
+            start = timer()
+            results = provider(argument)
+            if stage != 'json':
+
+                results = tuple(results)
+
+            self.timings[stage] += timer() - start
+            return results
+
+        return timed
+
+    @property
+    def json(self):
+        """Get the JSON payload, recording the message if it was slow.
+
+        The timings only cover the latest payload, so each stage adds up to
+        no more than the total.
+        """
+        timer = self._recorder.timer
+        self.timings = dict((stage, 0.0) for stage in STAGES)
+        start = timer()
+        payload = super(RecordedMetadata, self).json
+        self._recorder.observe(self._message, self.timings, timer() - start)
+        return payload
+
+
+def load(path):
+    """Read the cases recorded to a file.
+
+    Args:
+        path (str): The location of a file written by a Recorder.
+
+    Returns:
+        list of dict: The recorded cases.
+    """
+    with io.open(path, 'r', encoding='utf-8') as log:
+
+        return [json.loads(line) for line in log if line.strip()]
+
+
+def replay(
+        cases,
+        stream=None,
+        sort='cumulative',
+        limit=30,
+        **providers
+):
+    """Process recorded cases again under the profiler.
+
+    Args:
+        cases (iter of dict): The recorded cases.
+        stream: A file-like object to print the profile to. The default is
+            standard output.
+        sort (str): The pstats key used to order the profile.
+        limit (int): The number of functions to print.
+        **providers: Any of the providers accepted by Metadata.
+
+    Returns:
+        pstats.Stats: The profile of processing every case.
+    """
+    profiler = cProfile.Profile()
+    for case in cases:
+
+        meta = metadata.Metadata(case['message'], **providers)
+        profiler.runcall(lambda container=meta: container.json)
+
+    stats = pstats.Stats(profiler, stream=stream or sys.stdout)
+    stats.sort_stats(sort).print_stats(limit)
+    return stats
+
+
+def main(argv=None):
+    """Replay the cases of a recording from the command line."""
+    parser = argparse.ArgumentParser(
+        description='Profile the slow messages captured by a Recorder.',
+    )
+    parser.add_argument('path', help='A file written by a Recorder.')
+    parser.add_argument('--sort', default='cumulative')
+    parser.add_argument('--limit', default=30, type=int)
+    parser.add_argument(
+        '--offline',
+        action='store_true',
+        help='Do not fetch titles.',
+    )
+    args = parser.parse_args(argv)
+    providers = {}
+    if args.offline:
+
+        providers['title_provider'] = lambda urls: (None for _ in urls)
+
+    cases = load(args.path)
+    print('Replaying {0} cases.'.format(len(cases)))
+    for case in sorted(cases, key=lambda case: -case['total'])[:args.limit]:
+
+        print('{0:8.3f}s {1} {2!r}'.format(
+            case['total'],
+            json.dumps(case['timings'], sort_keys=True),
+            case['message'][:60],
+        ))
+
+    replay(cases, sort=args.sort, limit=args.limit, **providers)
+
+
+if __name__ == '__main__':
+
+    main()
@@ -0,0 +1,434 @@
+"""Tools for resolving the host names of hrefs with an in-process cache."""
+
+from __future__ import division
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import collections
+import socket
+import threading
+import time
+import timeit
+
+import requests
+from requests import adapters
+from requests.packages.urllib3 import connection
+from requests.packages.urllib3 import connectionpool
+from requests.packages.urllib3 import exceptions
+
+
+TTL = 300
+NEGATIVE_TTL = 30
+PREFETCH = 0.8
+MAX_CACHE_SIZE = 4096
+
+
+def _is_address(host):
+    """Check if a host is already an IPv4 or IPv6 address."""
+    for family in (socket.AF_INET, socket.AF_INET6):
+
+        try:
+
+            socket.inet_pton(family, host.strip('[]'))
+            return True
+
+        except (socket.error, ValueError):
+
+            continue
+
+    return False
+
+
+class SystemResolver(object):
+
+    """Resolve host names with the resolver of the operating system."""
+
+    def __init__(self, family=socket.AF_UNSPEC):
+        """Initialize the resolver.
+
+        Args:
+            family (int): The socket address family to resolve for. The
+                default includes both IPv4 and IPv6 addresses.
+        """
+        self._family = family
+
+    def lookup(self, host):
+        """Get the addresses of a host name.
+
+        Args:
+            host (str): The host name.
+
+        Returns:
+            (tuple of str, float): The addresses in the order they should be
+                tried and the number of seconds they may be cached for. The
+                system resolver does not report a TTL, so it is None.
+
+        Raises:
+            socket.gaierror: If the host name cannot be resolved.
+        """
+        addresses = []
+        for info in socket.getaddrinfo(
+                host, None, self._family, socket.SOCK_STREAM,
+        ):
+
+            if info[4][0] not in addresses:
+
+                addresses.append(info[4][0])
+
+        return tuple(addresses), None
+
+
+class StubResolver(object):
+
+    """Resolve host names from a fixed table, without using the network."""
+
+    def __init__(self, records, ttl=None):
+        """Initialize the resolver with its records.
+
+        Args:
+            records (dict): Addresses by host name. A value may be a single
+                address or a sequence of them.
+            ttl (float): The TTL to report for every record.
+        """
+        self.records = dict(records)
+        self._ttl = ttl
+        self.lookups = collections.Counter()
+
+    def lookup(self, host):
+        """Get the addresses of a host name from the table.
+
+        Args:
+            host (str): The host name.
+
+        Returns:
+            (tuple of str, float): The addresses and the TTL of the record.
+
+        Raises:
+            socket.gaierror: If the host name is not in the table.
+        """
+        self.lookups[host] += 1
+        addresses = self.records.get(host)
+        if not addresses:
+
+            raise socket.gaierror(socket.EAI_NONAME, 'Name not known')
+
+        if isinstance(addresses, type('')):
+
+            addresses = (addresses,)
+
+        return tuple(addresses), self._ttl
+
+
+class CachingResolver(object):
+
+    """A bounded cache of host name lookups that respects their TTL.
+
+    Failed lookups are cached for negative_ttl seconds so that links to dead
+    domains do not reach the resolver again for every message. A name that is
+    used after prefetch of its TTL has passed is looked up again in the
+    background, so hot names do not expire on the fetch path. Concurrent
+    lookups of one name wait for a single resolver call.
+    """
+
+    def __init__(
+            self,
+            resolver=None,
+            ttl=TTL,
+            negative_ttl=NEGATIVE_TTL,
+            prefetch=PREFETCH,
+            max_size=MAX_CACHE_SIZE,
+            clock=time.time,
+            timer=timeit.default_timer,
+    ):
+        """Initialize an empty cache.
+
+        Args:
+            resolver: An object with a lookup method like that of
+                SystemResolver. The default is a new SystemResolver.
+            ttl (float): The seconds to cache addresses for when the resolver
+                does not report a TTL. This is also the longest a reported TTL
+                is honoured.
+            negative_ttl (float): The seconds to cache failed lookups for.
+            prefetch (float): The fraction of the TTL after which a name that
+                is used is refreshed in the background. A value of None
+                disables prefetching.
+            max_size (int): The maximum number of names to hold. The least
+                recently used name is evicted when the limit is reached.
+            clock: A callable that returns the current time in seconds.
+            timer: A callable used to time lookups.
+        """
+        self._resolver = SystemResolver() if resolver is None else resolver
+        self._ttl = ttl
+        self._negative_ttl = negative_ttl
+        self._prefetch = prefetch
+        self._max_size = max_size
+        self._clock = clock
+        self._timer = timer
+        self._entries = collections.OrderedDict()
+        self._pending = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.prefetches = 0
+        self.lookups = 0
+        self.lookup_time = 0.0
+        self.slowest = 0.0
+
+    def __len__(self):
+        """Get the number of names currently held."""
+        return len(self._entries)
+
+    def _lookup(self, host, refresh=False):
+        """Ask the resolver for a name and store the outcome.
+
+        A failed refresh keeps the addresses that are already cached.
+        """
+        start = self._timer()
+        try:
+
+            addresses, ttl = self._resolver.lookup(host)
+            error = None
+            ttl = self._ttl if ttl is None else min(ttl, self._ttl)
+
+        except socket.gaierror as failure:
+
+            addresses, error, ttl = (), failure, self._negative_ttl
+
+        except Exception:
+
+            with self._lock:
+
+                self._pending.pop(host).set()
+
+            raise
+
+        elapsed = self._timer() - start
+        stored = self._clock()
+        with self._lock:
+
+            self.lookups += 1
+            self.lookup_time += elapsed
+            self.slowest = max(self.slowest, elapsed)
+            if error is None or not refresh:
+
+                self._entries.pop(host, None)
+                self._entries[host] = (stored, ttl, addresses, error)
+                while len(self._entries) > self._max_size:
+
+                    self._entries.popitem(last=False)
+
+            self._pending.pop(host).set()
+
+        return addresses, error
+
+    def _refresh(self, host):
+        """Look up a name in the background while its entry is still used."""
+        thread = threading.Thread(target=self._lookup, args=(host, True))
+        thread.daemon = True
+        thread.start()
+
+    def resolve(self, host):
+        """Get the addresses of a host name, using the cache if possible.
+
+        Args:
+            host (str): The host name.
+
+        Returns:
+            tuple of str: The addresses in the order they should be tried.
+
+        Raises:
+            socket.gaierror: If the host name cannot be resolved.
+        """
+        if _is_address(host):
+
+            return (host,)
+
+        while True:
+
+            with self._lock:
+
+                entry = self._entries.get(host)
+                now = self._clock()
+                if entry is not None and now - entry[0] < entry[1]:
+
+                    self._entries.pop(host)
+                    self._entries[host] = entry
+                    stored, ttl, addresses, error = entry
+                    if error is not None:
+
+                        self.negative_hits += 1
+                        raise socket.gaierror(*error.args)
+
+                    self.hits += 1
+                    if (
+                            self._prefetch is not None and
+                            now - stored >= ttl * self._prefetch and
+                            host not in self._pending
+                    ):
+
+                        self.prefetches += 1
+                        self._pending[host] = threading.Event()
+                        self._refresh(host)
+
+                    return addresses
+
+                waiting = self._pending.get(host)
+                if waiting is None:
+
+                    self.misses += 1
+                    self._pending[host] = threading.Event()
+
+            if waiting is not None:
+
+                waiting.wait()
+                continue
+
+            addresses, error = self._lookup(host)
+            if error is not None:
+
+                raise error
+
+            return addresses
+
+    def warm(self, hosts):
+        """Resolve names ahead of their first use.
+
+        Args:
+            hosts (iter of str): The host names, such as the top domains
+                counted by analytics.Trends.
+        """
+        for host in hosts:
+
+            try:
+
+                self.resolve(host)
+
+            except socket.gaierror:
+
+                continue
+
+    def metrics(self):
+        """Get the cache counts and lookup timing as a dictionary."""
+        return {
+            'size': len(self._entries),
+            'hits': self.hits,
+            'negative_hits': self.negative_hits,
+            'misses': self.misses,
+            'prefetches': self.prefetches,
+            'lookups': self.lookups,
+            'lookup_time': self.lookup_time,
+            'mean_lookup': (
+                self.lookup_time / self.lookups if self.lookups else 0.0
+            ),
+            'slowest_lookup': self.slowest,
+        }
+
+
+class _ResolvingConnection(object):
+
+    """A connection mixin that resolves its host with a bound resolver."""
+
+    resolver = None
+
+    def _new_conn(self):
+        """Connect to each resolved address in turn until one succeeds."""
+        host = self._dns_host
+        try:
+
+            addresses = self.resolver.resolve(host)
+
+        except socket.gaierror as error:
+
+            raise exceptions.NewConnectionError(
+                self,
+                'Failed to resolve {0}: {1}'.format(host, error),
+            )
+
+        failure = None
+        for address in addresses:
+
+            self._dns_host = address
+            try:
+
+                return super(_ResolvingConnection, self)._new_conn()
+
+            except exceptions.NewConnectionError as error:
+
+                failure = error
+
+            finally:
+
+                self._dns_host = host
+
+        raise failure
+
+
+class ResolvingAdapter(adapters.HTTPAdapter):
+
+    """A requests transport adapter that resolves hosts with a resolver.
+
+    The connection pools of the adapter replace the host urllib3 connects
+    to, which needs urllib3 1.23 or later. Requests sent through a proxy use
+    the proxy's own pools and bypass the resolver, since the proxy resolves
+    the host itself.
+    """
+
+    def __init__(self, resolver, **kwargs):
+        """Initialize the adapter.
+
+        Args:
+            resolver: An object with a resolve method like that of
+                CachingResolver.
+            **kwargs: Any of the arguments accepted by HTTPAdapter.
+        """
+        self.resolver = resolver
+        super(ResolvingAdapter, self).__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        """Create the pool manager with resolving connection pools."""
+        super(ResolvingAdapter, self).init_poolmanager(*args, **kwargs)
+        pools = {}
+        for scheme, pool, base in (
+                ('http', connectionpool.HTTPConnectionPool,
+                 connection.HTTPConnection),
+                ('https', connectionpool.HTTPSConnectionPool,
+                 connection.HTTPSConnection),
+        ):
+
+            connection_class = type(
+                'Resolving{0}'.format(base.__name__),
+                (_ResolvingConnection, base),
+                {'resolver': self.resolver},
+            )
+            pools[scheme] = type(
+                'Resolving{0}'.format(pool.__name__),
+                (pool,),
+                {'ConnectionCls': connection_class},
+            )
+
+        self.poolmanager.pool_classes_by_scheme = pools
+
+
+def session(resolver):
+    """Create a requests session that resolves hosts with a resolver.
+
+    TLS certificates are still checked against the host name of the href.
+    Bind the session to a body provider with functools.partial to use it for
+    title fetches. Hrefs fetched through a proxy, including one configured by
+    the HTTP_PROXY or HTTPS_PROXY environment variables, are not resolved
+    with the resolver.
+
+    Args:
+        resolver: An object with a resolve method like that of
+            CachingResolver.
+
+    Returns:
+        requests.Session: A session for both http and https hrefs.
+    """
+    new_session = requests.Session()
+    adapter = ResolvingAdapter(resolver)
+    new_session.mount('http://', adapter)
+    new_session.mount('https://', adapter)
+    return new_session
@@ -0,0 +1,193 @@
+"""Tools for resolving @mentions against a roster of known names."""
+
+from __future__ import division
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import io
+import mmap
+
+
+ALIASES = ('here', 'channel', 'everyone')
+ENCODING = 'utf-8'
+
+
+def fold(name):
+    """Get the case folded form of a name used for roster lookups.
+
+    Args:
+        name (str): A user name, group alias, or @mention.
+
+    Returns:
+        str: The name with case folded, or lower cased where case folding is
+            not available.
+    """
+    try:
+
+        return name.casefold()
+
+    except AttributeError:  # pragma: no cover
+
+        return name.lower()
+
+
+def write_roster(names, path):
+    """Write a roster file that can be loaded by Roster.
+
+    The file holds one case folded name per line, encoded as UTF-8 and sorted
+    by byte value, so that it can be searched in place without an index.
+
+    Args:
+        names (iter of str): The names to include. Duplicates, including
+            those that differ only by case, are written once.
+        path (str): The location of the roster file to write.
+
+    Raises:
+        ValueError: If a name contains a line break.
+    """
+    keys = set()
+    for name in names:
+
+        if not name:
+
+            continue
+
+        if '\n' in name or '\r' in name:
+
+            raise ValueError('Names cannot contain line breaks.')
+
+        keys.add(fold(name).encode(ENCODING))
+
+    with io.open(path, 'wb') as roster_file:
+
+        roster_file.write(b'\n'.join(sorted(keys)))
+
+
+class Roster(object):
+
+    """A memory mapped, sorted roster of names."""
+
+    def __init__(self, path, aliases=ALIASES):
+        """Initialize the roster by mapping a file written by write_roster.
+
+        The roster file is mapped read-only so that every process which opens
+        it shares the same pages and no per-process dictionary is built.
+
+        Args:
+            path (str): The location of the roster file.
+            aliases (iter of str): Group aliases, such as 'here', which resolve
+                without being present in the file.
+        """
+        self._aliases = frozenset(fold(alias) for alias in aliases)
+        with io.open(path, 'rb') as roster_file:
+
+            try:
+
+                self._buffer = mmap.mmap(
+                    roster_file.fileno(),
+                    0,
+                    access=mmap.ACCESS_READ,
+                )
+
+            except ValueError:
+
+                # Empty files cannot be mapped.
+                self._buffer = b''
+
+    def __enter__(self):
+        """Use the roster as a context manager that closes the mapping."""
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """Close the mapping when the context exits."""
+        self.close()
+
+    def __contains__(self, name):
+        """Determine if a name is an alias or is in the roster file."""
+        key = fold(name)
+        if key in self._aliases:
+
+            return True
+
+        return self._search(key.encode(ENCODING), 0)[0]
+
+    def close(self):
+        """Release the mapping of the roster file."""
+        if isinstance(self._buffer, mmap.mmap):
+
+            self._buffer.close()
+
+    def _search(self, key, low):
+        """Binary search the lines of the roster for a key.
+
+        Args:
+            key (bytes): The encoded, case folded name to find.
+            low (int): The offset of a line start that no greater key precedes.
+
+        Returns:
+            (bool, int): Whether the key was found and the offset of the first
+                line that is not less than the key.
+        """
+        buffer = self._buffer
+        high = len(buffer)
+        while low < high:
+
+            middle = (low + high) // 2
+            start = buffer.rfind(b'\n', low, middle) + 1 or low
+            end = buffer.find(b'\n', start, high)
+            if end < 0:
+
+                end = high
+
+            line = buffer[start:end]
+            if line == key:
+
+                return True, start
+
+            if line < key:
+
+                low = end + 1
+
+            else:
+
+                high = start
+
+        return False, low
+
+    def resolve(self, mentions):
+        """Resolve a batch of @mentions.
+
+        The distinct names are looked up in sorted order so that each search
+        begins where the previous one ended.
+
+        Args:
+            mentions (iter of str): The @mentions to resolve, such as the
+                output of mention.mentions.
+
+        Returns:
+            (tuple of str, tuple of str): The mentions that resolved and the
+                mentions that did not, each in the order given.
+        """
+        mentions = tuple(mentions)
+        found = set()
+        low = 0
+        for key in sorted(set(fold(name) for name in mentions)):
+
+            if key in self._aliases:
+
+                found.add(key)
+                continue
+
+            exists, low = self._search(key.encode(ENCODING), low)
+            if exists:
+
+                found.add(key)
+
+        resolved = []
+        unresolved = []
+        for name in mentions:
+
+            (resolved if fold(name) in found else unresolved).append(name)
+
+        return tuple(resolved), tuple(unresolved)
@@ -0,0 +1,360 @@
+"""A fair scheduler that shares title fetches between tenants."""
+
+from __future__ import division
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import collections
+import itertools
+import threading
+import timeit
+
+from . import href
+
+
+FIRST = 0
+NORMAL = 1
+BULK = 2
+WORKERS = 8
+MAX_FIRST = 2
+
+
+def fetch_title(url):
+    """Get the title of a single href with href.streaming_titles."""
+    return next(iter(href.streaming_titles((url,))), None)
+
+
+class Ticket(object):
+
+    """The eventual title of a scheduled href."""
+
+    def __init__(self, tenant, url, priority, tag, sequence, submitted):
+        """Initialize the ticket of a scheduled href."""
+        self.tenant = tenant
+        self.url = url
+        self.priority = priority
+        self.tag = tag
+        self.sequence = sequence
+        self.submitted = submitted
+        self.title = None
+        self._done = threading.Event()
+
+    def resolve(self, title):
+        """Set the title and wake any waiting thread."""
+        self.title = title
+        self._done.set()
+
+    def result(self, timeout=None):
+        """Wait for the title.
+
+        Args:
+            timeout (float): The most seconds to wait. The default waits
+                forever.
+
+        Returns:
+            str: The title or None if it could not be fetched, was shed, or
+                did not arrive in time.
+        """
+        self._done.wait(timeout)
+        return self.title
+
+
+class _Tenant(object):
+
+    """The queues and counters of one tenant."""
+
+    def __init__(self, weight):
+        """Initialize an idle tenant."""
+        self.weight = weight
+        self.queues = collections.defaultdict(collections.deque)
+        self.finish = 0.0
+        self.active = 0
+        self.queued = 0
+        self.submitted = 0
+        self.completed = 0
+        self.shed = 0
+        self.demoted = 0
+        self.first = 0
+        self.waited = 0.0
+        self.longest = 0.0
+
+
+class FairScheduler(object):
+
+    """Weighted fair queuing of title fetches across tenants.
+
+    Each href is tagged with a virtual finish time that advances by one over
+    the weight of its tenant, so a tenant with many queued hrefs only gets
+    its share of the workers. Lower priority values are always served first,
+    so the FIRST href of a live message is not stuck behind BULK backfill.
+    Each tenant may only have max_first FIRST hrefs queued. Beyond that they
+    are queued as NORMAL, so a tenant posting many one-link messages cannot
+    hold back the NORMAL hrefs of the others. A tenant may also be limited
+    in how many hrefs it has queued, beyond which hrefs are shed with a None
+    title, and in how many it has fetching at once.
+    """
+
+    def __init__(
+            self,
+            fetch=fetch_title,
+            workers=WORKERS,
+            weights=None,
+            max_queued=None,
+            max_active=None,
+            max_first=MAX_FIRST,
+            timer=timeit.default_timer,
+    ):
+        """Initialize the scheduler and start its workers.
+
+        Args:
+            fetch: A callable that accepts an href and produces its title or
+                None.
+            workers (int): The number of threads that fetch titles.
+            weights (dict): The share of each tenant by tenant key. Tenants
+                that are not listed have a weight of one.
+            max_queued (int): The most hrefs a tenant may have waiting. The
+                default is unlimited.
+            max_active (int): The most hrefs of a tenant that may be fetched
+                at once. The default is unlimited.
+            max_first (int): The most FIRST hrefs a tenant may have queued.
+                Further FIRST hrefs are queued as NORMAL.
+            timer: A callable that returns the current time in seconds.
+        """
+        self._fetch = fetch
+        self._weights = dict(weights or {})
+        self._max_queued = max_queued
+        self._max_active = max_active
+        self._max_first = max_first
+        self._timer = timer
+        self._tenants = {}
+        self._virtual = 0.0
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._closed = False
+        self._threads = [
+            threading.Thread(target=self._work) for _ in range(workers)
+        ]
+        for thread in self._threads:
+
+            thread.daemon = True
+            thread.start()
+
+    def _tenant(self, key):
+        """Get the state of a tenant, creating it if needed."""
+        tenant = self._tenants.get(key)
+        if tenant is None:
+
+            tenant = self._tenants[key] = _Tenant(self._weights.get(key, 1))
+
+        return tenant
+
+    def submit(self, tenant, url, priority=NORMAL):
+        """Schedule the title fetch of an href.
+
+        Args:
+            tenant: A hashable key for the workspace the href belongs to.
+            url (str): The href.
+            priority (int): FIRST, NORMAL, BULK, or any other number. Lower
+                values are fetched first.
+
+        Returns:
+            Ticket: An object whose result method waits for the title.
+        """
+        with self._condition:
+
+            if self._closed:
+
+                raise RuntimeError('The scheduler is closed.')
+
+            state = self._tenant(tenant)
+            state.submitted += 1
+            if priority == FIRST and state.first >= self._max_first:
+
+                priority = NORMAL
+                state.demoted += 1
+
+            ticket = Ticket(
+                tenant,
+                url,
+                priority,
+                max(self._virtual, state.finish) + 1 / state.weight,
+                next(self._sequence),
+                self._timer(),
+            )
+            if self._max_queued is not None and (
+                    state.queued >= self._max_queued
+            ):
+
+                state.shed += 1
+                ticket.resolve(None)
+                return ticket
+
+            state.finish = ticket.tag
+            state.queues[priority].append(ticket)
+            state.queued += 1
+            if priority == FIRST:
+
+                state.first += 1
+
+            self._condition.notify()
+
+        return ticket
+
+    def _next(self):
+        """Remove the next ticket to serve, or None if none may be served."""
+        best = None
+        for state in self._tenants.values():
+
+            if not state.queued or (
+                    self._max_active is not None and
+                    state.active >= self._max_active
+            ):
+
+                continue
+
+            priority = min(
+                key for key, queue in state.queues.items() if queue
+            )
+            head = state.queues[priority][0]
+            rank = (priority, head.tag, head.sequence)
+            if best is None or rank < best[0]:
+
+                best = (rank, state, priority)
+
+        if best is None:
+
+            return None
+
+        _, state, priority = best
+        ticket = state.queues[priority].popleft()
+        state.queued -= 1
+        state.active += 1
+        if priority == FIRST:
+
+            state.first -= 1
+
+        self._virtual = max(self._virtual, ticket.tag - 1 / state.weight)
+        return ticket
+
+    def _work(self):
+        """Fetch titles until the scheduler is closed."""
+        while True:
+
+            with self._condition:
+
+                ticket = self._next()
+                while ticket is None:
+
+                    if self._closed:
+
+                        return
+
+                    self._condition.wait()
+                    ticket = self._next()
+
+                state = self._tenants[ticket.tenant]
+                waited = self._timer() - ticket.submitted
+                state.waited += waited
+                state.longest = max(state.longest, waited)
+
+            try:
+
+                title = self._fetch(ticket.url)
+
+            except Exception:  # pylint: disable=broad-except
+
+                title = None
+
+            with self._condition:
+
+                state.active -= 1
+                state.completed += 1
+                self._condition.notify_all()
+
+            ticket.resolve(title)
+
+    def titles(self, urls, tenant, priority=None):
+        """Schedule the titles of hrefs under the share of a tenant.
+
+        Every href is queued before this returns.
+
+        Args:
+            urls (iter of str): The hrefs.
+            tenant: A hashable key for the workspace the hrefs belong to.
+            priority (int): The priority of every href. The default gives the
+                first href FIRST and the rest NORMAL.
+
+        Returns:
+            iter of str: The titles in the order of the hrefs. Values may be
+                None if the title could not be determined for any reason.
+        """
+        tickets = [
+            self.submit(
+                tenant,
+                url,
+                priority if priority is not None else (
+                    FIRST if index == 0 else NORMAL
+                ),
+            )
+            for index, url in enumerate(urls)
+        ]
+        return (ticket.result() for ticket in tickets)
+
+    def title_provider(self, tenant, priority=None):
+        """Create a title provider bound to a tenant for use with Metadata.
+
+        Args:
+            tenant: A hashable key for the workspace of the messages.
+            priority (int): The priority of every href, such as BULK for
+                backfills. The default gives the first href of each message
+                FIRST and the rest NORMAL.
+
+        Returns:
+            A callable that generates an iterable of titles from an iterable
+                of hrefs.
+        """
+        def provider(urls):
+            """Fetch titles through the scheduler."""
+            return self.titles(urls, tenant, priority)
+
+        return provider
+
+    def stats(self):
+        """Get the counts and waiting time of each tenant.
+
+        Returns:
+            dict: By tenant key, the hrefs submitted, completed, shed, queued,
+                active, and demoted from FIRST, with the mean and longest
+                seconds spent queued.
+        """
+        with self._condition:
+
+            return dict(
+                (key, {
+                    'weight': state.weight,
+                    'submitted': state.submitted,
+                    'completed': state.completed,
+                    'shed': state.shed,
+                    'demoted': state.demoted,
+                    'queued': state.queued,
+                    'active': state.active,
+                    'mean_wait': (
+                        state.waited / (state.completed + state.active)
+                        if state.completed + state.active else 0.0
+                    ),
+                    'longest_wait': state.longest,
+                })
+                for key, state in self._tenants.items()
+            )
+
+    def close(self):
+        """Fetch the queued hrefs and stop the workers."""
+        with self._condition:
+
+            self._closed = True
+            self._condition.notify_all()
+
+        for thread in self._threads:
+
+            thread.join()
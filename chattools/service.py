@@ -0,0 +1,677 @@
+"""A resident service that produces metadata for messages in batches."""
+
+from __future__ import division
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import argparse
+import collections
+import functools
+import json
+import sys
+import threading
+import timeit
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from multiprocessing.pool import ThreadPool
+from socketserver import ThreadingMixIn
+
+from . import canonical
+from . import emoticon
+from . import href
+from . import mention
+from . import metadata
+from . import resolver as resolvers
+
+
+WINDOW = 0.005
+MAX_BATCH = 256
+CONCURRENCY = 4
+FETCH_WORKERS = 8
+FETCH_TIMEOUT = 10.0
+PORT = 8080
+DISCONNECTS = (BrokenPipeError, ConnectionResetError)
+
+
+class _Pending(object):
+
+    """The eventual result of a submitted item."""
+
+    def __init__(self, item):
+        """Initialize the result with the item that produces it."""
+        self.item = item
+        self.value = None
+        self.error = None
+        self._done = threading.Event()
+
+    def resolve(self, value=None, error=None):
+        """Set the outcome and wake any waiting thread."""
+        self.value = value
+        self.error = error
+        self._done.set()
+
+    def result(self, timeout=None):
+        """Wait for the outcome.
+
+        Args:
+            timeout (float): The most seconds to wait. The default waits
+                forever.
+
+        Returns:
+            The value produced for the item.
+
+        Raises:
+            Exception: The error raised while processing the batch.
+        """
+        if not self._done.wait(timeout):
+
+            raise RuntimeError('The batch did not complete in time.')
+
+        if self.error is not None:
+
+            raise self.error
+
+        return self.value
+
+
+class MicroBatcher(object):
+
+    """Collect items submitted by many threads and handle them in batches.
+
+    A batch starts with the first waiting item and is closed after window
+    seconds or when it holds max_size items, whichever comes first. Up to
+    concurrency batches are handled at once on background threads, so a slow
+    batch does not hold up the ones after it. If a batch fails, each of its
+    items is handled again on its own so that only the failing items see an
+    error.
+    """
+
+    def __init__(
+            self,
+            handler,
+            window=WINDOW,
+            max_size=MAX_BATCH,
+            concurrency=CONCURRENCY,
+            timer=timeit.default_timer,
+    ):
+        """Initialize the batcher and start its background thread.
+
+        Args:
+            handler: A callable that accepts a list of items and produces a
+                list of results in the same order.
+            window (float): The seconds to wait for more items after the
+                first item of a batch arrives.
+            max_size (int): The most items to put in one batch.
+            concurrency (int): The most batches to handle at once. Items
+                wait for the next batch while every handler is busy.
+            timer: A callable that returns the current time in seconds.
+        """
+        self._handler = handler
+        self._window = window
+        self._max_size = max_size
+        self._timer = timer
+        self._queue = collections.deque()
+        self._condition = threading.Condition()
+        self._closed = False
+        self.batches = 0
+        self.items = 0
+        self.largest = 0
+        self.sizes = collections.Counter()
+        self._slots = threading.BoundedSemaphore(concurrency)
+        self._pool = ThreadPool(concurrency)
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    @property
+    def depth(self):
+        """Get the number of items waiting for a batch."""
+        return len(self._queue)
+
+    def submit(self, item):
+        """Queue an item for the next batch.
+
+        Args:
+            item: The item to handle.
+
+        Returns:
+            An object whose result method waits for, and produces, the result
+                of the item.
+        """
+        pending = _Pending(item)
+        with self._condition:
+
+            if self._closed:
+
+                raise RuntimeError('The batcher is closed.')
+
+            self._queue.append(pending)
+            self._condition.notify()
+
+        return pending
+
+    def __call__(self, item, timeout=None):
+        """Handle an item in a batch and wait for its result."""
+        return self.submit(item).result(timeout)
+
+    def _collect(self):
+        """Wait for a batch of pending items or None when closed."""
+        with self._condition:
+
+            while not self._queue and not self._closed:
+
+                self._condition.wait()
+
+            if not self._queue:
+
+                return None
+
+            deadline = self._timer() + self._window
+            while len(self._queue) < self._max_size and not self._closed:
+
+                remaining = deadline - self._timer()
+                if remaining <= 0:
+
+                    break
+
+                self._condition.wait(remaining)
+
+            count = min(len(self._queue), self._max_size)
+            return [self._queue.popleft() for _ in range(count)]
+
+    def _run(self):
+        """Dispatch batches until the batcher is closed and drained."""
+        while True:
+
+            self._slots.acquire()
+            batch = self._collect()
+            if batch is None:
+
+                self._slots.release()
+                return
+
+            self.batches += 1
+            self.items += len(batch)
+            self.largest = max(self.largest, len(batch))
+            self.sizes[1 << (len(batch) - 1).bit_length()] += 1
+            self._pool.apply_async(self._dispatch, (batch,))
+
+    def _dispatch(self, batch):
+        """Handle a batch on a pool thread and free its slot."""
+        try:
+
+            self._handle(batch)
+
+        finally:
+
+            self._slots.release()
+
+    def _handle(self, batch):
+        """Resolve a batch, handling items alone if the batch fails."""
+        try:
+
+            results = self._handler([pending.item for pending in batch])
+
+        except Exception as error:  # pylint: disable=broad-except
+
+            if len(batch) == 1:
+
+                batch[0].resolve(error=error)
+                return
+
+            for pending in batch:
+
+                self._handle([pending])
+
+            return
+
+        for pending, result in zip(batch, results):
+
+            pending.resolve(result)
+
+    def metrics(self):
+        """Get the queue depth and batch sizes as a dictionary.
+
+        The sizes are counted in buckets keyed by the smallest power of two
+        that is at least the batch size.
+        """
+        return {
+            'depth': self.depth,
+            'batches': self.batches,
+            'items': self.items,
+            'largest': self.largest,
+            'mean': self.items / self.batches if self.batches else 0.0,
+            'sizes': dict(
+                ('{0}'.format(bucket), count)
+                for bucket, count in sorted(self.sizes.items())
+            ),
+        }
+
+    def close(self):
+        """Handle the waiting items and stop the background threads."""
+        with self._condition:
+
+            self._closed = True
+            self._condition.notify()
+
+        self._thread.join()
+        self._pool.close()
+        self._pool.join()
+
+
+class Extractor(object):
+
+    """Produce Metadata JSON for batches of messages.
+
+    Every href in a batch is given to the title provider together, so an
+    href used by several concurrent messages is fetched once. Titles are
+    kept in a cache that lives as long as the extractor. An href that is
+    already being fetched for another batch is waited for rather than
+    fetched again. An href whose fetch fails gets a None title rather than
+    failing the batch.
+    """
+
+    def __init__(
+            self,
+            emoticon_provider=emoticon.emoticons,
+            href_provider=href.hrefs,
+            title_provider=None,
+            mention_provider=mention.mentions,
+            json_provider=metadata.JSON_PROVIDER,
+            cache=None,
+            fetch_workers=FETCH_WORKERS,
+            resolver=None,
+    ):
+        """Initialize the extractor with content providers.
+
+        Args:
+            emoticon_provider: A callable that generates an iterable of
+                emoticons from a message text.
+            href_provider: A callable that generates an iterable of hrefs
+                from a message text.
+            title_provider: A callable that generates an iterable of titles
+                from an iterable of hrefs. It is given distinct canonical
+                hrefs that are not cached, one at a time. The default is
+                href.titles with a timeout of FETCH_TIMEOUT seconds.
+            mention_provider: A callable that generates an iterable of mentions
+                from a message text.
+            json_provider: A callable that converts a Python dictionary into
+                JSON text.
+            cache (TitleCache): The cache of titles. The default is a new
+                canonical.TitleCache that keeps titles for canonical.MAX_AGE
+                seconds.
+            fetch_workers (int): The number of titles to fetch at once.
+            resolver (CachingResolver): The DNS cache used by the title
+                provider, if any, so that its lookup timing is reported with
+                the fetch metrics.
+        """
+        self._emoticon_provider = emoticon_provider
+        self._href_provider = href_provider
+        self._title_provider = title_provider or functools.partial(
+            href.titles,
+            body_provider=functools.partial(
+                href.streaming_body_provider,
+                timeout=FETCH_TIMEOUT,
+            ),
+        )
+        self._mention_provider = mention_provider
+        self._json_provider = json_provider
+        self.cache = (
+            canonical.TitleCache(max_age=canonical.MAX_AGE) if cache is None
+            else cache
+        )
+        self._pool = ThreadPool(fetch_workers) if fetch_workers > 1 else None
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self.resolver = resolver
+        self.hrefs = 0
+        self.fetches = 0
+        self.errors = 0
+
+    def _title(self, key):
+        """Fetch the title of one canonical href or None if it fails."""
+        try:
+
+            return next(iter(self._title_provider((key,))), None)
+
+        except Exception:  # pylint: disable=broad-except
+
+            with self._lock:
+
+                self.errors += 1
+
+            return None
+
+    def _fetch(self, keys):
+        """Fetch the titles of canonical hrefs, in parallel if possible.
+
+        Hrefs that another batch is fetching are waited for instead.
+        """
+        pending = []
+        owned = []
+        with self._lock:
+
+            for key in keys:
+
+                flight = self._inflight.get(key)
+                if flight is None:
+
+                    flight = self._inflight[key] = _Pending(key)
+                    owned.append(flight)
+
+                pending.append(flight)
+
+            self.fetches += len(owned)
+
+        titles = [None] * len(owned)
+        try:
+
+            if self._pool is None or len(owned) < 2:
+
+                titles = [self._title(flight.item) for flight in owned]
+
+            else:
+
+                titles = self._pool.map(
+                    self._title,
+                    [flight.item for flight in owned],
+                )
+
+            for flight, title in zip(owned, titles):
+
+                # Cached before the flight ends so that no batch misses both.
+                self.cache.set(flight.item, title)
+
+        finally:
+
+            with self._lock:
+
+                for flight in owned:
+
+                    del self._inflight[flight.item]
+
+            for flight, title in zip(owned, titles):
+
+                flight.resolve(title)
+
+        return [flight.result() for flight in pending]
+
+    def __call__(self, messages):
+        """Produce the JSON payload of each message in a batch.
+
+        Args:
+            messages (list of str): The message texts.
+
+        Returns:
+            list of str: The Metadata.json payload of each message.
+        """
+        extracted = []
+        urls = []
+        for message in messages:
+
+            hrefs = tuple(self._href_provider(message))
+            extracted.append((
+                tuple(self._emoticon_provider(message)),
+                hrefs,
+                tuple(self._mention_provider(message)),
+            ))
+            urls.extend(hrefs)
+
+        with self._lock:
+
+            self.hrefs += len(urls)
+
+        titles = iter(tuple(
+            canonical.titles(urls, self.cache, title_provider=self._fetch),
+        ))
+        payloads = []
+        for message, (emoticons, hrefs, mentions) in zip(messages, extracted):
+
+            payloads.append(metadata.Metadata(
+                message,
+                emoticon_provider=metadata.constant_provider(emoticons),
+                href_provider=metadata.constant_provider(hrefs),
+                title_provider=metadata.constant_provider(
+                    next(titles) for _ in hrefs
+                ),
+                mention_provider=metadata.constant_provider(mentions),
+                json_provider=self._json_provider,
+            ).json)
+
+        return payloads
+
+    def close(self):
+        """Stop the threads that fetch titles."""
+        if self._pool is not None:
+
+            self._pool.close()
+            self._pool.join()
+
+
+class _Server(ThreadingMixIn, HTTPServer):
+
+    """An HTTP server that handles each request in a thread."""
+
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        """Ignore clients that disconnect early and report other errors."""
+        if isinstance(sys.exc_info()[1], DISCONNECTS):
+
+            return
+
+        HTTPServer.handle_error(self, request, client_address)
+
+
+class Service(object):
+
+    """An HTTP service that answers with Metadata JSON.
+
+    POST /metadata with a UTF-8 message as the body to get its JSON payload.
+    GET /metrics to get the queue depth, batch sizes, and fetch counts.
+    """
+
+    def __init__(
+            self,
+            host='127.0.0.1',
+            port=PORT,
+            window=WINDOW,
+            max_batch=MAX_BATCH,
+            extractor=None,
+    ):
+        """Initialize the service.
+
+        Args:
+            host (str): The address to listen on.
+            port (int): The port to listen on. Use 0 for any unused port.
+            window (float): The seconds to collect messages into a batch.
+            max_batch (int): The most messages to handle in one batch.
+            extractor (Extractor): The batch handler. The default is a new
+                Extractor.
+        """
+        self.extractor = Extractor() if extractor is None else extractor
+        self.batcher = MicroBatcher(self.extractor, window, max_batch)
+        self._address = (host, port)
+        self._server = None
+        self._thread = None
+
+    def __enter__(self):
+        """Start the service when used as a context manager."""
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """Stop the service when the context exits."""
+        self.stop()
+
+    @property
+    def url(self):
+        """Get the base url of the running service."""
+        host, port = self._server.server_address[:2]
+        return 'http://{0}:{1}'.format(host, port)
+
+    def metrics(self):
+        """Get the metrics of the batcher and extractor as a dictionary."""
+        metrics = self.batcher.metrics()
+        metrics['hrefs'] = self.extractor.hrefs
+        metrics['fetches'] = self.extractor.fetches
+        metrics['fetch_errors'] = self.extractor.errors
+        metrics['cached'] = len(self.extractor.cache)
+        if self.extractor.resolver is not None:
+
+            metrics['dns'] = self.extractor.resolver.metrics()
+
+        return metrics
+
+    def _handler(self):
+        """Create the request handler class bound to this service."""
+        service = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            """Answer metadata and metrics requests."""
+
+            protocol_version = 'HTTP/1.1'
+
+            def _send(self, status, body):
+                """Write a JSON response."""
+                body = body.encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', '{0}'.format(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):  # pylint: disable=invalid-name
+                """Answer with the service metrics."""
+                if self.path != '/metrics':
+
+                    self._send(404, json.dumps({'error': 'not found'}))
+                    return
+
+                self._send(200, json.dumps(service.metrics()))
+
+            def do_POST(self):  # pylint: disable=invalid-name
+                """Answer with the metadata of the posted message."""
+                length = int(self.headers.get('Content-Length') or 0)
+                body = self.rfile.read(length)
+                if self.path != '/metadata':
+
+                    self._send(404, json.dumps({'error': 'not found'}))
+                    return
+
+                try:
+
+                    message = body.decode('utf-8')
+
+                except UnicodeDecodeError:
+
+                    self._send(400, json.dumps({'error': 'not UTF-8'}))
+                    return
+
+                try:
+
+                    payload = service.batcher(message)
+
+                except Exception as error:  # pylint: disable=broad-except
+
+                    self._send(500, json.dumps({'error': '{0}'.format(error)}))
+                    return
+
+                self._send(200, payload)
+
+            def log_message(self, *args):
+                """Keep the service quiet."""
+
+        return Handler
+
+    def start(self):
+        """Start serving in a background thread."""
+        self._server = _Server(self._address, self._handler())
+        self._thread = threading.Thread(target=self._server.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def serve_forever(self):
+        """Serve on the calling thread until interrupted."""
+        self._server = _Server(self._address, self._handler())
+        try:
+
+            self._server.serve_forever()
+
+        finally:
+
+            self._server.server_close()
+            self._server = None
+            self.batcher.close()
+            self.extractor.close()
+
+    def stop(self):
+        """Stop serving and handle any waiting messages."""
+        if self._server is not None:
+
+            self._server.shutdown()
+            self._server.server_close()
+            self._thread.join()
+            self._server = None
+
+        self.batcher.close()
+        self.extractor.close()
+
+
+def main(argv=None):
+    """Run the service from the command line."""
+    parser = argparse.ArgumentParser(
+        description='Serve Metadata.json for messages over HTTP.',
+    )
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--window', type=float, default=WINDOW)
+    parser.add_argument('--max-batch', type=int, default=MAX_BATCH)
+    parser.add_argument('--fetch-workers', type=int, default=FETCH_WORKERS)
+    parser.add_argument(
+        '--fetch-timeout',
+        type=float,
+        default=FETCH_TIMEOUT,
+        help='The most seconds to wait to connect to a page or for its data.',
+    )
+    parser.add_argument(
+        '--dns-ttl',
+        type=float,
+        default=resolvers.TTL,
+        help='The longest seconds to cache a host name lookup.',
+    )
+    args = parser.parse_args(argv)
+    resolver = resolvers.CachingResolver(ttl=args.dns_ttl)
+    body_provider = functools.partial(
+        href.streaming_body_provider,
+        session=resolvers.session(resolver),
+        timeout=args.fetch_timeout,
+    )
+    service = Service(
+        host=args.host,
+        port=args.port,
+        window=args.window,
+        max_batch=args.max_batch,
+        extractor=Extractor(
+            title_provider=functools.partial(
+                href.titles,
+                body_provider=body_provider,
+            ),
+            fetch_workers=args.fetch_workers,
+            resolver=resolver,
+        ),
+    )
+    print('Serving on {0}:{1}'.format(args.host, args.port))
+    try:
+
+        service.serve_forever()
+
+    except KeyboardInterrupt:
+
+        pass
+
+
+if __name__ == '__main__':
+
+    main()
@@ -0,0 +1,183 @@
+"""Tools for extracting content from messages that arrive in chunks."""
+
+from __future__ import division
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import unicode_literals
+
+from . import emoticon
+from . import href
+from . import mention
+
+
+CHUNK_SIZE = 65536
+MAX_TOKEN = 8192
+WHITESPACE = ' \t\n\r\x0b\x0c'
+
+
+def chunks(source, chunk_size=CHUNK_SIZE):
+    """Generate the chunks of text from a source.
+
+    Args:
+        source: A string, an iterable of strings, or a file-like object with
+            a read method.
+        chunk_size (int): The number of characters to read at a time from a
+            file-like object.
+
+    Returns:
+        iter of str: An iterable of the chunks of the source text.
+    """
+    if isinstance(source, type('')):
+
+        yield source
+        return
+
+    if hasattr(source, 'read'):
+
+        read = source.read
+        source = iter(lambda: read(chunk_size), '')
+
+    for chunk in source:
+
+        if chunk:
+
+            yield chunk
+
+
+def segments(source, chunk_size=CHUNK_SIZE, max_token=MAX_TOKEN):
+    """Generate pieces of text that are split only at whitespace.
+
+    Hrefs and @mentions never contain whitespace, so each piece can be given
+    to their extractors on its own. Text after the last whitespace of a chunk
+    is carried into the next one.
+
+    Args:
+        source: A string, an iterable of strings, or a file-like object.
+        chunk_size (int): The number of characters to read at a time from a
+            file-like object.
+        max_token (int): The most text to carry between chunks. A run of text
+            longer than this without whitespace is split where it stands.
+
+    Returns:
+        iter of str: An iterable of the pieces of the source text.
+    """
+    carry = ''
+    for chunk in chunks(source, chunk_size):
+
+        text = carry + chunk
+        cut = max(text.rfind(char) for char in WHITESPACE)
+        if cut > 0:
+
+            yield text[:cut]
+            carry = text[cut:]
+
+        elif len(text) > max_token:
+
+            yield text
+            carry = ''
+
+        else:
+
+            carry = text
+
+    if carry:
+
+        yield carry
+
+
+def hrefs(source, chunk_size=CHUNK_SIZE, max_token=MAX_TOKEN):
+    """Generate an iterable of http://hrefs.com from chunks of text.
+
+    Args:
+        source: A string, an iterable of strings, or a file-like object.
+        chunk_size (int): The number of characters to read at a time from a
+            file-like object.
+        max_token (int): The longest href that is guaranteed to be found
+            whole when it is split between chunks.
+
+    Returns:
+        iter of str: An iterable of strings that represent the hrefs contained
+            within the text, produced as they are found.
+    """
+    for segment in segments(source, chunk_size, max_token):
+
+        for match in href.hrefs(segment):
+
+            yield match
+
+
+def mentions(source, chunk_size=CHUNK_SIZE, max_token=MAX_TOKEN):
+    """Generate an iterable of @mentions from chunks of text.
+
+    Args:
+        source: A string, an iterable of strings, or a file-like object.
+        chunk_size (int): The number of characters to read at a time from a
+            file-like object.
+        max_token (int): The longest @mention that is guaranteed to be found
+            whole when it is split between chunks.
+
+    Returns:
+        iter of str: An iterable of strings that represent the @mentions used
+            within the text, produced as they are found.
+    """
+    for segment in segments(source, chunk_size, max_token):
+
+        for match in mention.mentions(segment):
+
+            yield match
+
+
+def emoticons(
+        source,
+        max_length=emoticon.MAX_EMOTICON_LENGTH,
+        chunk_size=CHUNK_SIZE,
+):
+    """Generate an iterable of emoticons from chunks of text.
+
+    This finds the same emoticons as emoticon.emoticons. Only the text after
+    an opening parenthesis is kept, and no more than max_length characters of
+    it, so memory does not grow with the size of the message.
+
+    Args:
+        source: A string, an iterable of strings, or a file-like object.
+        max_length (int): The maximum string length of a valid emoticon.
+        chunk_size (int): The number of characters to read at a time from a
+            file-like object.
+
+    Returns:
+        iter of str: An iterable of strings that represent the emoticons used
+            within the text, produced as they are found.
+    """
+    level = 0
+    pieces = None
+    size = 0
+    for chunk in chunks(source, chunk_size):
+
+        position = 0
+        for match in emoticon.PAREN_REGEX.finditer(chunk):
+
+            index = match.start()
+            closing = match.group() == ')'
+            if pieces is not None and closing:
+
+                size += index - position
+                if 0 < size <= max_length:
+
+                    pieces.append(chunk[position:index])
+                    yield ''.join(pieces)
+
+            pieces = None
+            level += -1 if closing else 1
+            if level == 1 and not closing:
+
+                pieces = []
+                size = 0
+
+            position = index + 1
+
+        if pieces is not None:
+
+            size += len(chunk) - position
+            if size <= max_length:
+
+                pieces.append(chunk[position:])
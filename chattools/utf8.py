@@ -0,0 +1,249 @@
+"""Tools for extracting content directly from UTF-8 encoded messages.
+
+These extractors accept bytes, bytearray, or memoryview input and only decode
+the matches they find. Each one finds the same content as its counterpart in
+the href, mention, or emoticon modules would find in the decoded text. Bytes
+patterns only know ASCII word characters, so any non-ASCII byte is treated as
+a possible word character and the few matches where that matters are checked
+against the text patterns after decoding.
+"""
+
+from __future__ import division
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import re
+
+from . import emoticon
+from . import href
+
+
+ENCODING = 'utf-8'
+ERRORS = 'surrogateescape'
+
+# The trailing punctuation of the href pattern includes non-ASCII quotes that
+# cannot be expressed as single bytes. They are removed here and any match
+# that could end in one is trimmed by the text pattern instead. The leading
+# word boundary is relaxed to allow any match after a non-ASCII byte because
+# whether that is a boundary depends on the decoded character.
+HREF_REGEX = re.compile(
+    href.REGEX.replace('«»“”‘’', '').replace(
+        '\n\\b\n',
+        '\n(?:\\b|(?<=[\\x80-\\xff]))\n',
+        1,
+    ).encode('ascii'),
+    re.IGNORECASE | re.MULTILINE | re.VERBOSE,
+)
+MENTION_REGEX = re.compile(br'(?<!\w)@([\w\x80-\xff]+)', re.MULTILINE)
+PAREN_REGEX = re.compile(br'[()]')
+SPACE_REGEX = re.compile(br'\s')
+# Bytes that may be whitespace or punctuation in text but not in bytes.
+SUSPECT_REGEX = re.compile(br'[\x1c-\x1f\x80-\xff]')
+WORD_REGEX = re.compile(r'\w+', re.UNICODE)
+
+
+def _decode(data):
+    """Decode a slice of a message."""
+    return bytes(data).decode(ENCODING, ERRORS)
+
+
+def _size(text):
+    """Get the encoded size of decoded text."""
+    return len(text.encode(ENCODING, ERRORS))
+
+
+def _previous(data, position):
+    """Get the offset of the character before an offset."""
+    start = max(position - 1, 0)
+    while start > 0 and position - start < 4 and 0x80 <= data[start] < 0xc0:
+
+        start -= 1
+
+    return start
+
+
+def _is_word(byte):
+    """Determine if an ASCII byte is a word character."""
+    return byte == 0x5f or 0x30 <= byte <= 0x39 or 0x41 <= byte <= 0x5a or (
+        0x61 <= byte <= 0x7a
+    )
+
+
+def _follows_word(data, position):
+    """Determine if the character before an offset is a word character."""
+    previous = _decode(data[_previous(data, position):position])
+    return WORD_REGEX.match(previous) is not None
+
+
+def href_spans(data):
+    """Generate an iterable of hrefs and their location in a UTF-8 message.
+
+    Args:
+        data (bytes): The UTF-8 encoded body of a chat message. Any object
+            that supports the buffer protocol, such as a memoryview, may be
+            given.
+
+    Returns:
+        iter of (int, int, str): An iterable of three-tuples in the form of
+            (start, end, href) where start and end are byte offsets.
+    """
+    match = HREF_REGEX.search(data)
+    while match:
+
+        start, end = match.span(1)
+        if start and data[start - 1] >= 0x80 and (
+                _follows_word(data, start) == _is_word(data[start])
+        ):
+
+            match = HREF_REGEX.search(data, start + 1)
+            continue
+
+        if not SUSPECT_REGEX.search(data, start, end + 1):
+
+            yield start, end, _decode(data[start:end])
+            match = HREF_REGEX.search(data, end)
+            continue
+
+        # Text matches never cross ASCII whitespace so the token, and the
+        # character before it, is enough context for the text pattern to
+        # decide where the href ends.
+        space = SPACE_REGEX.search(data, end)
+        context = _previous(data, start)
+        token = _decode(data[context:space.start() if space else len(data)])
+        text_match = href.HREF_REGEX.match(
+            token,
+            len(_decode(data[context:start])),
+        )
+        if not text_match:
+
+            match = HREF_REGEX.search(data, start + 1)
+            continue
+
+        value = text_match.group(1)
+        end = start + _size(value)
+        yield start, end, value
+        match = HREF_REGEX.search(data, end)
+
+
+def hrefs(data):
+    """Generate an iterable of http://hrefs.com from a UTF-8 message.
+
+    Args:
+        data (bytes): The UTF-8 encoded body of a chat message.
+
+    Returns:
+        iter of str: An iterable of strings that represent the hrefs contained
+            within the body.
+    """
+    for _, _, value in href_spans(data):
+
+        yield value
+
+
+def mention_spans(data):
+    """Generate an iterable of @mentions and their location in a UTF-8 message.
+
+    Args:
+        data (bytes): The UTF-8 encoded body of a chat message.
+
+    Returns:
+        iter of (int, int, str): An iterable of three-tuples in the form of
+            (start, end, mention) where start and end are the byte offsets of
+            the @mention, including the @.
+    """
+    for match in MENTION_REGEX.finditer(data):
+
+        start = match.start()
+        if start and data[start - 1] >= 0x80 and _follows_word(data, start):
+
+            continue
+
+        name = match.group(1)
+        if SUSPECT_REGEX.search(name):
+
+            name = WORD_REGEX.match(_decode(name))
+            if not name:
+
+                continue
+
+            name = name.group()
+
+        else:
+
+            name = name.decode(ENCODING)
+
+        yield start, start + 1 + _size(name), name
+
+
+def mentions(data):
+    """Generate an iterable of @mentions from a UTF-8 message.
+
+    Args:
+        data (bytes): The UTF-8 encoded body of a chat message.
+
+    Returns:
+        iter of str: An iterable of strings that represent the @mentions used
+            within the body.
+    """
+    for _, _, value in mention_spans(data):
+
+        yield value
+
+
+def emoticon_spans(data, max_length=emoticon.MAX_EMOTICON_LENGTH):
+    """Generate an iterable of emoticons and their location in a UTF-8 message.
+
+    Parenthesis characters never occur within a multi-byte UTF-8 sequence so
+    the message is scanned as bytes and only candidates are decoded.
+
+    Args:
+        data (bytes): The UTF-8 encoded body of a chat message.
+        max_length (int): The maximum length, in characters, of a valid
+            emoticon.
+
+    Returns:
+        iter of (int, int, str): An iterable of three-tuples in the form of
+            (start, end, emoticon) where start and end are the byte offsets of
+            the (emoticon), including the parenthesis.
+    """
+    level = 0
+    start = previous = None
+    for match in PAREN_REGEX.finditer(data):
+
+        position = match.start()
+        if data[position] == 0x28:
+
+            level += 1
+            if level == 1:
+
+                start = position
+
+        else:
+
+            level -= 1
+            if level == 0 and previous == start and position - start > 1:
+
+                result = _decode(data[start + 1:position])
+                if len(result) <= max_length:
+
+                    yield start, position + 1, result
+
+        previous = position
+
+
+def emoticons(data, max_length=emoticon.MAX_EMOTICON_LENGTH):
+    """Generate an iterable of emoticons from a UTF-8 message.
+
+    Args:
+        data (bytes): The UTF-8 encoded body of a chat message.
+        max_length (int): The maximum length, in characters, of a valid
+            emoticon.
+
+    Returns:
+        iter of str: An iterable of strings that represent the emoticons used
+            within the body.
+    """
+    for _, _, value in emoticon_spans(data, max_length):
+
+        yield value
@@ -17,14 +17,18 @@ setup(
     author_email="kevinjacobconway@gmail.com",
     long_description=README,
     license='MIT',
+    python_requires='>=3.9',
     packages=find_packages(exclude=['tests', 'build', 'dist', 'docs']),
     install_requires=[
-        'requests',
+        'requests>=2.16',
+        'urllib3>=1.23',
         'defusedxml',
     ],
     entry_points={
         'console_scripts': [
-
+            'chattools-loadtest=chattools.loadtest:main',
+            'chattools-replay=chattools.recorder:main',
+            'chattools-serve=chattools.service:main',
         ],
     },
     include_package_data=True,
@@ -0,0 +1,95 @@
+"""Test suites for the content analytics tools."""
+
+from __future__ import division
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import collections
+import random
+
+from chattools import analytics
+from chattools import metadata
+
+
+def zipf(count, seed):
+    """Generate a skewed stream of items."""
+    rng = random.Random(seed)
+    return [
+        'item{0}'.format(int(rng.paretovariate(1.2)))
+        for _ in range(count)
+    ]
+
+
+def test_space_saving_is_exact_below_capacity():
+    """Ensure counts are exact while every item fits."""
+    summary = analytics.SpaceSaving(capacity=10)
+    summary.update('abacabad')
+    assert summary.top(2) == [('a', 4, 0), ('b', 2, 0)]
+
+
+def test_space_saving_finds_heavy_hitters_in_fixed_memory():
+    """Ensure frequent items are found and memory does not grow."""
+    items = zipf(20000, seed=1)
+    summary = analytics.SpaceSaving(capacity=50)
+    summary.update(items)
+    assert len(summary) == 50
+    exact = collections.Counter(items).most_common(5)
+    found = summary.top(5)
+    assert [item for item, _ in exact] == [item for item, _, _ in found]
+    for (_, count), (_, estimate, error) in zip(exact, found):
+
+        assert estimate - error <= count <= estimate
+
+
+def test_space_saving_merges_partial_summaries():
+    """Ensure summaries of separate workers combine into one."""
+    first_items = zipf(10000, seed=2)
+    second_items = zipf(10000, seed=3)
+    first = analytics.SpaceSaving(capacity=50)
+    second = analytics.SpaceSaving(capacity=50)
+    first.update(first_items)
+    second.update(second_items)
+    merged = first.merge(second)
+    exact = collections.Counter(first_items + second_items)
+    for item, estimate, error in merged.top(5):
+
+        assert estimate - error <= exact[item] <= estimate
+
+    assert [item for item, _, _ in merged.top(3)] == [
+        item for item, _ in exact.most_common(3)
+    ]
+
+
+def test_space_saving_snapshot_is_independent():
+    """Ensure a snapshot does not change with later counts."""
+    summary = analytics.SpaceSaving()
+    summary.add('a')
+    snapshot = summary.snapshot()
+    summary.add('a')
+    assert snapshot.top() == [('a', 1, 0)]
+    assert summary.top() == [('a', 2, 0)]
+
+
+def test_trends_counts_metadata_without_titles():
+    """Ensure messages are counted by emoticon, mention, and domain."""
+    def title_provider(urls):
+
+        raise AssertionError('Titles should not be fetched.')
+
+    trends = analytics.Trends()
+    for message in (
+            '@mary (beer) https://Example.com/a',
+            '@mary @geetha (beer) example.com http://other.org/',
+    ):
+
+        trends.add_metadata(
+            metadata.Metadata(message, title_provider=title_provider),
+        )
+
+    top = trends.merge(analytics.Trends()).top(1)
+    assert top['emoticons'] == [{'value': 'beer', 'count': 2, 'error': 0}]
+    assert top['mentions'] == [{'value': 'mary', 'count': 2, 'error': 0}]
+    assert top['domains'] == [
+        {'value': 'example.com', 'count': 2, 'error': 0},
+    ]
@@ -0,0 +1,91 @@
+"""Test suites for extractor bundles."""
+
+from __future__ import division
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import io
+import json
+import pickle
+
+from chattools import bundle
+from chattools import href
+from chattools import metadata
+
+
+TEXT = 'See sites.com, sites.io/page and https://www.sites.org (beer) @mary'
+
+
+def fake_titles(urls):
+    """Produce a title from each url."""
+    return ('Title of {0}'.format(url) for url in urls)
+
+
+def test_default_tlds_reproduce_the_href_regex():
+    """Ensure the default domains compile to the same matches."""
+    assert 'com' in bundle.TLDS
+    assert 'museum' in bundle.TLDS
+    assert tuple(bundle.Bundle(tlds=bundle.TLDS).hrefs(TEXT)) == tuple(
+        href.hrefs(TEXT),
+    )
+    assert tuple(bundle.Bundle().href_spans(TEXT)) == tuple(
+        href.href_spans(TEXT),
+    )
+
+
+def test_bundle_limits_naked_domains_to_its_tlds():
+    """Ensure only the listed domains match without a scheme."""
+    extractor = bundle.Bundle(tlds=('io',))
+    assert tuple(extractor.hrefs(TEXT)) == (
+        'sites.io/page',
+        'https://www.sites.org',
+    )
+
+
+def test_bundle_compiles_on_first_use():
+    """Ensure nothing is compiled until a matcher is needed."""
+    extractor = bundle.Bundle(tlds=('com',))
+    assert extractor._href_regex is None
+    tuple(extractor.hrefs(TEXT))
+    assert extractor._href_regex is not None
+
+
+def test_bundle_pickles_without_matchers(tmpdir):
+    """Ensure a warm bundle pickles as its settings and still works."""
+    path = str(tmpdir.join('catalog.txt'))
+    with io.open(path, 'w', encoding='utf-8') as catalog_file:
+
+        catalog_file.write('(beer)\tbeer\n:)\tsmile\n')
+
+    extractor = bundle.Bundle(
+        tlds=('com', 'io'),
+        catalog_path=path,
+        title_provider=fake_titles,
+    )
+    cold = pickle.dumps(extractor)
+    assert pickle.dumps(extractor.warm()) == cold
+    assert len(pickle.dumps(bundle.Bundle())) < 200
+    copy = pickle.loads(cold)
+    assert copy._href_regex is None and copy._catalog is None
+    assert copy(TEXT + ' :)').json == extractor(TEXT + ' :)').json
+    method = pickle.loads(pickle.dumps(extractor.emoticon_spans))
+    assert tuple(method('(beer) :)')) == ((0, 6, 'beer'), (7, 9, 'smile'))
+
+
+def test_bundle_respects_the_emoticon_length():
+    """Ensure long (emoticons) are dropped without a catalog."""
+    extractor = bundle.Bundle(max_emoticon_length=4)
+    assert tuple(extractor.emoticons('(beer) (coffee)')) == ('beer',)
+    assert tuple(extractor.emoticon_spans('(beer) (coffee)')) == (
+        (0, 6, 'beer'),
+    )
+
+
+def test_bundle_replaces_metadata():
+    """Ensure the bundle produces the same JSON as Metadata."""
+    extractor = bundle.Bundle(title_provider=fake_titles)
+    assert json.loads(extractor(TEXT).json) == json.loads(
+        metadata.Metadata(TEXT, title_provider=fake_titles).json,
+    )
+    assert tuple(extractor.mention_spans(TEXT)) == ((62, 67, 'mary'),)
@@ -0,0 +1,140 @@
+"""Test suites for href canonicalization tools."""
+
+from __future__ import division
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import pytest
+
+from chattools import canonical
+
+
+@pytest.mark.parametrize(
+    'url',
+    (
+        'HTTP://Example.com/',
+        'http://EXAMPLE.com:80/',
+        'example.com',
+        'example.com/',
+        'http://example.com/?utm_source=x',
+        'http://example.com/?utm_source=x&fbclid=y#top',
+        'http://example.com.',
+    ),
+)
+def test_canonicalize_collapses_equivalent_hrefs(url):
+    """Ensure equivalent spellings of an href share one canonical form."""
+    assert canonical.canonicalize(url) == 'http://example.com/'
+
+
+def test_canonicalize_keeps_non_default_port():
+    """Ensure only the default port of the scheme is removed."""
+    assert (
+        canonical.canonicalize('https://example.com:443/a') ==
+        'https://example.com/a'
+    )
+    assert (
+        canonical.canonicalize('https://example.com:8443/a') ==
+        'https://example.com:8443/a'
+    )
+
+
+def test_canonicalize_keeps_path_case_and_other_parameters():
+    """Ensure the path and non-tracking parameters are left untouched."""
+    url = 'https://Example.com/Some/Page?b=2&utm_medium=chat&a=1'
+    assert (
+        canonical.canonicalize(url) ==
+        'https://example.com/Some/Page?b=2&a=1'
+    )
+
+
+def test_canonicalize_uses_configured_rules():
+    """Ensure the tracking rules can be replaced."""
+    url = 'http://example.com/?ref=chat&utm_source=x'
+    assert (
+        canonical.canonicalize(url, tracking_parameters=('ref',)) ==
+        'http://example.com/?utm_source=x'
+    )
+
+
+def test_title_cache_evicts_least_recently_used():
+    """Ensure the cache holds at most max_size titles."""
+    cache = canonical.TitleCache(max_size=2)
+    cache.set('a', 'A')
+    cache.set('b', 'B')
+    assert cache.get('a') == 'A'
+    cache.set('c', 'C')
+    assert cache.get('b') is None
+    assert cache.get('a') == 'A'
+    assert cache.get('c') == 'C'
+    assert len(cache) == 2
+
+
+def test_title_cache_expires_stale_titles():
+    """Ensure titles older than max_age are not returned."""
+    now = [0]
+    cache = canonical.TitleCache(max_age=10, clock=lambda: now[0])
+    cache.set('a', 'A')
+    now[0] = 5
+    assert cache.get('a') == 'A'
+    now[0] = 11
+    assert cache.get('a', 'stale') == 'stale'
+
+
+def test_title_cache_expires_failures_sooner():
+    """Ensure a missing title is only kept for the negative age."""
+    now = [0]
+    cache = canonical.TitleCache(negative_max_age=5, clock=lambda: now[0])
+    cache.set('a', 'A')
+    cache.set('b', None)
+    now[0] = 6
+    assert cache.get('a') == 'A'
+    assert cache.get('b', 'stale') == 'stale'
+
+
+def test_titles_fetches_each_canonical_href_once():
+    """Ensure duplicate hrefs within a message are fetched once."""
+    fetched = []
+
+    def title_provider(urls):
+
+        for url in urls:
+
+            fetched.append(url)
+            yield 'TITLE'
+
+    urls = ('HTTP://Example.com/', 'example.com', 'https://other.com')
+    results = tuple(canonical.titles(urls, title_provider=title_provider))
+    assert results == ('TITLE', 'TITLE', 'TITLE')
+    assert fetched == ['http://example.com/', 'https://other.com/']
+
+
+def test_titles_reuses_cache_across_messages():
+    """Ensure a shared cache prevents fetching the same href again."""
+    fetched = []
+
+    def title_provider(urls):
+
+        for url in urls:
+
+            fetched.append(url)
+            yield None
+
+    cache = canonical.TitleCache()
+    first = tuple(
+        canonical.titles(
+            ('example.com',),
+            cache=cache,
+            title_provider=title_provider,
+        )
+    )
+    second = tuple(
+        canonical.titles(
+            ('http://example.com/?utm_source=x',),
+            cache=cache,
+            title_provider=title_provider,
+        )
+    )
+    assert first == (None,)
+    assert second == (None,)
+    assert fetched == ['http://example.com/']
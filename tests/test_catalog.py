@@ -0,0 +1,88 @@
+"""Test suites for the emoticon catalog tools."""
+
+from __future__ import division
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import io
+
+import pytest
+
+from chattools import catalog
+
+
+def write(path, text):
+    """Write a catalog file."""
+    with io.open(path, 'w', encoding='utf-8') as catalog_file:
+
+        catalog_file.write(text)
+
+
+@pytest.fixture
+def catalog_path(tmpdir):
+    """Get the path of a small catalog file."""
+    path = str(tmpdir.join('catalog.txt'))
+    write(path, ':)\tsmile\n:-)\tsmile\n\n:party_parrot:\n(beer)\tbeer\n')
+    return path
+
+
+def test_load_catalog_reads_names(catalog_path):
+    """Ensure shortcuts without a name are named after themselves."""
+    assert catalog.load_catalog(catalog_path) == (
+        (':)', 'smile'),
+        (':-)', 'smile'),
+        (':party_parrot:', ':party_parrot:'),
+        ('(beer)', 'beer'),
+    )
+
+
+def test_automaton_finds_overlapping_hits():
+    """Ensure every occurrence of every shortcut is found with offsets."""
+    automaton = catalog.Automaton(
+        (shortcut, shortcut) for shortcut in ('he', 'she', 'his', 'hers')
+    )
+    assert sorted(automaton.matches('ushers')) == [
+        (1, 4, 'she'),
+        (2, 4, 'he'),
+        (2, 6, 'hers'),
+    ]
+
+
+def test_catalog_matches_shortcuts_and_emoticons(catalog_path):
+    """Ensure catalog hits and (emoticons) are reported in order once."""
+    shortcuts = catalog.Catalog(catalog_path)
+    text = 'ship it :party_parrot: (beer) (success) :-)'
+    assert tuple(shortcuts.matches(text)) == (
+        (8, 22, ':party_parrot:'),
+        (23, 29, 'beer'),
+        (30, 39, 'success'),
+        (40, 43, 'smile'),
+    )
+    assert tuple(shortcuts.emoticons('(beer) :)')) == ('beer', 'smile')
+
+
+def test_catalog_reload_swaps_automaton(catalog_path):
+    """Ensure a reload picks up new shortcuts."""
+    shortcuts = catalog.Catalog(catalog_path)
+    assert not tuple(shortcuts.emoticons(':team:'))
+    write(catalog_path, ':team:\tteam\n')
+    shortcuts.reload().join()
+    assert tuple(shortcuts.emoticons(':team: :)')) == ('team',)
+
+
+def test_catalog_reports_leftmost_longest_hits_outside_hrefs(tmpdir):
+    """Ensure overlapping hits and hits within an href are dropped."""
+    path = str(tmpdir.join('catalog.txt'))
+    write(path, ':/\tconfused\n:p\ttongue\n:party_parrot:\n')
+    shortcuts = catalog.Catalog(path)
+    text = 'see https://example.com/x :party_parrot: :/'
+    assert tuple(shortcuts.matches(text)) == (
+        (26, 40, ':party_parrot:'),
+        (41, 43, 'confused'),
+    )
+    automaton = catalog.Automaton(catalog.load_catalog(path))
+    assert tuple(automaton.matches(':party_parrot:')) == (
+        (0, 2, 'tongue'),
+        (0, 14, ':party_parrot:'),
+    )
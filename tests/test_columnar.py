@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""Test suites for columnar output."""
+
+from __future__ import division
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import io
+
+import pytest
+
+from chattools import columnar
+from chattools import utf8
+
+
+MESSAGES = (
+    '@mary (beer) see http://sites.com',
+    'nothing to see',
+    '(beer) @bob and @mary, http://sites.com/ünï',
+)
+
+
+def test_extract_produces_a_row_per_entity():
+    """Ensure every entity is a row with its message and span."""
+    columns = columnar.extract(MESSAGES)
+    rows = tuple(columns.rows())
+    assert rows == (
+        (0, 'emoticon', 6, 12, 'beer'),
+        (0, 'href', 17, 33, 'http://sites.com'),
+        (0, 'mention', 0, 5, 'mary'),
+        (2, 'emoticon', 0, 6, 'beer'),
+        (2, 'href', 23, 43, 'http://sites.com/ünï'),
+        (2, 'mention', 7, 11, 'bob'),
+        (2, 'mention', 16, 21, 'mary'),
+    )
+    for message, _, start, end, value in rows:
+
+        assert value in MESSAGES[message][start:end]
+
+
+def test_extract_stores_each_string_once():
+    """Ensure repeated entities share an entry of the strings table."""
+    columns = columnar.extract(MESSAGES)
+    assert len(columns.strings) == 5
+    assert columns.value[0] == columns.value[3]
+
+
+def test_extract_accepts_utf8_span_providers():
+    """Ensure byte offsets are stored when given the utf8 span functions."""
+    data = MESSAGES[2].encode('utf-8')
+    columns = columnar.extract(
+        (data,),
+        emoticon_spans=utf8.emoticon_spans,
+        href_spans=utf8.href_spans,
+        mention_spans=utf8.mention_spans,
+    )
+    for _, _, start, end, value in columns.rows():
+
+        assert value in data[start:end].decode('utf-8')
+
+
+def test_written_file_loads_through_mmap(tmpdir):
+    """Ensure a written file reads back with the same rows."""
+    columns = columnar.extract(MESSAGES)
+    path = str(tmpdir.join('entities.col'))
+    columns.write(path)
+    with columnar.load(path) as loaded:
+
+        assert len(loaded) == len(columns)
+        assert tuple(loaded.rows()) == tuple(columns.rows())
+        assert list(loaded.kind) == list(columns.kind)
+        assert [int(value) for value in loaded.start] == list(columns.start)
+        assert loaded.string(1) == 'http://sites.com'
+        assert sum(
+            1 for kind in loaded.kind if kind == columnar.MENTION
+        ) == 3
+
+
+def test_empty_columns_round_trip(tmpdir):
+    """Ensure a batch without entities still writes a valid file."""
+    path = str(tmpdir.join('empty.col'))
+    columnar.extract(('no entities',)).write(path)
+    with columnar.load(path) as loaded:
+
+        assert len(loaded) == 0
+        assert loaded.strings == []
+
+
+def test_load_rejects_other_files(tmpdir):
+    """Ensure files that were not written as columns are refused."""
+    path = str(tmpdir.join('other.col'))
+    with io.open(path, 'wb') as other:
+
+        other.write(b'{"mentions": ["mary"]}')
+
+    with pytest.raises(ValueError):
+
+        columnar.load(path)
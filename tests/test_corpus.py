@@ -0,0 +1,138 @@
+"""Test suites for the bulk archive tools."""
+
+from __future__ import division
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import pytest
+
+from chattools import corpus
+from chattools import utf8
+
+
+LINES = tuple(
+    '@user{0} see http://site{0}.com/ (beer)'.format(index).encode('utf-8')
+    for index in range(100)
+)
+
+
+def count_mentions(line):
+    """Handle a line in a worker process."""
+    assert tuple(utf8.mentions(line))
+
+
+@pytest.fixture
+def archive(tmpdir):
+    """Get the path of a small archive."""
+    path = tmpdir.join('archive.log')
+    path.write_binary(b'\n'.join(LINES) + b'\n')
+    return str(path)
+
+
+def test_lines_are_memoryviews(archive):
+    """Ensure lines are read without copies and without line endings."""
+    results = tuple(corpus.lines(archive))
+    assert len(results) == len(LINES)
+    for (_, line), expected in zip(results, LINES):
+
+        assert isinstance(line, memoryview)
+        assert line.tobytes() == expected
+
+
+def test_lines_resume_from_offset(archive):
+    """Ensure reading can resume from any produced offset."""
+    offsets = tuple(offset for offset, _ in corpus.lines(archive))
+    resumed = tuple(
+        line.tobytes() for _, line in corpus.lines(archive, offsets[49])
+    )
+    assert resumed == LINES[50:]
+
+
+def test_lines_strip_carriage_returns(tmpdir):
+    """Ensure windows line endings are removed."""
+    path = tmpdir.join('archive.log')
+    path.write_binary(b'one\r\ntwo')
+    results = tuple(line.tobytes() for _, line in corpus.lines(str(path)))
+    assert results == (b'one', b'two')
+
+
+@pytest.mark.parametrize('count', (1, 3, 7, 1000))
+def test_shards_are_line_aligned(archive, count):
+    """Ensure shards cover the archive and split only between lines."""
+    ranges = corpus.shards(archive, count)
+    assert ranges[0][0] == 0
+    lines = []
+    for start, end in ranges:
+
+        lines.extend(line.tobytes() for _, line in corpus.lines(
+            archive,
+            start,
+            end,
+        ))
+
+    assert tuple(lines) == LINES
+    assert len(ranges) <= min(count, len(LINES))
+
+
+def test_shards_of_empty_archive(tmpdir):
+    """Ensure an empty archive has no shards."""
+    path = tmpdir.join('archive.log')
+    path.write_binary(b'')
+    assert corpus.shards(str(path), 4) == ()
+
+
+def test_backfill_resumes_from_checkpoint(archive, tmpdir):
+    """Ensure an interrupted backfill picks up where it stopped."""
+    checkpoint = corpus.Checkpoint(str(tmpdir.join('checkpoint')))
+    seen = []
+
+    def interrupt(line):
+
+        if len(seen) == 25:
+
+            raise KeyboardInterrupt()
+
+        seen.append(line.tobytes())
+
+    with pytest.raises(KeyboardInterrupt):
+
+        corpus.backfill(archive, interrupt, checkpoint=checkpoint, interval=10)
+
+    assert checkpoint.load() > 0
+    handled = corpus.backfill(
+        archive,
+        lambda line: seen.append(line.tobytes()),
+        checkpoint=checkpoint,
+        interval=10,
+    )
+    assert handled == 80
+    assert tuple(seen[:20] + seen[25:]) == LINES
+
+
+def test_process_handles_every_line(archive, tmpdir):
+    """Ensure the worker processes handle each line once."""
+    prefix = str(tmpdir.join('checkpoint'))
+    assert corpus.process(archive, count_mentions, 3, prefix) == len(LINES)
+    assert corpus.process(archive, count_mentions, 3, prefix) == 0
+
+
+def test_process_resumes_with_other_worker_counts(archive, tmpdir):
+    """Ensure a resumed run keeps the shards of the first run."""
+    prefix = str(tmpdir.join('checkpoint'))
+    assert corpus.process(archive, count_mentions, 3, prefix) == len(LINES)
+    assert corpus.process(archive, count_mentions, 2, prefix) == 0
+    assert corpus.process(archive, count_mentions, 4, prefix) == 0
+
+
+def test_process_rejects_changed_archives(archive, tmpdir):
+    """Ensure saved shards are not reused for a different archive."""
+    prefix = str(tmpdir.join('checkpoint'))
+    corpus.process(archive, count_mentions, 2, prefix)
+    with open(archive, 'ab') as archive_file:
+
+        archive_file.write(LINES[0] + b'\n')
+
+    with pytest.raises(ValueError):
+
+        corpus.process(archive, count_mentions, 2, prefix)
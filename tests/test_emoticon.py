@@ -177,3 +177,32 @@ def test_emoticon_skips_too_long(emoticons):
         emoticons('(1234567890123456).')
     )
     assert not results
+
+
+def test_emoticon_spans_locate_emoticons():
+    """Ensure emoticon spans cover the parenthesis and content.
+
+    Example: (alert) (emoti(con)) (beer)
+    Results: ((0, 7, 'alert'), (21, 27, 'beer'))
+    """
+    text = '(alert) (emoti(con)) (beer)'
+    results = tuple(emoticon.emoticon_spans(text))
+    assert results == ((0, 7, 'alert'), (21, 27, 'beer'))
+    for start, end, value in results:
+
+        assert text[start:end] == '({0})'.format(value)
+
+
+@pytest.mark.parametrize(
+    'text',
+    (
+        '(emoti (con).',
+        '(emoti(con)).',
+        ') (a) )(b) ((c) (d)',
+        '(1234567890123456) () (ok)',
+    ),
+)
+def test_emoticon_spans_match_emoticons(text):
+    """Ensure the spans find exactly the emoticons of the scanner."""
+    results = tuple(value for _, _, value in emoticon.emoticon_spans(text))
+    assert results == tuple(emoticon.emoticons(text))
@@ -0,0 +1,185 @@
+"""Test suites for hedged title fetches."""
+
+from __future__ import division
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import threading
+import timeit
+
+import pytest
+import requests
+
+from chattools import hedge
+from chattools import loadtest
+
+
+URL = 'http://sites.com/page'
+
+
+def primed(fetcher, seconds=0.01, count=hedge.MIN_SAMPLES):
+    """Record enough fast samples for the host to be hedged."""
+    histogram = fetcher.histogram('sites.com')
+    for _ in range(count):
+
+        histogram.record(seconds)
+
+    return fetcher
+
+
+def test_histogram_percentiles_are_within_a_bucket():
+    """Ensure percentiles are accurate to within the bucket growth."""
+    histogram = hedge.LatencyHistogram()
+    assert histogram.percentile(50) is None
+    for _ in range(90):
+
+        histogram.record(0.01)
+
+    for _ in range(10):
+
+        histogram.record(0.5)
+
+    assert 0.01 <= histogram.percentile(50) <= 0.01 * hedge.GROWTH
+    assert 0.5 <= histogram.percentile(99) <= 0.5 * hedge.GROWTH
+
+
+def test_histogram_favours_recent_samples():
+    """Ensure old samples fade once the sample limit is reached."""
+    histogram = hedge.LatencyHistogram(max_samples=100)
+    for _ in range(99):
+
+        histogram.record(1.0)
+
+    for _ in range(200):
+
+        histogram.record(0.01)
+
+    assert histogram.percentile(90) < 0.02
+
+
+def test_budget_limits_hedges():
+    """Ensure hedges are only allowed as tokens are earned."""
+    budget = hedge.HedgeBudget(ratio=0.5, burst=1)
+    assert budget.withdraw()
+    assert not budget.withdraw()
+    budget.deposit()
+    assert not budget.withdraw()
+    budget.deposit()
+    assert budget.withdraw()
+
+
+def test_fetcher_waits_for_samples_before_hedging():
+    """Ensure hosts without history use the default timeout."""
+    fetcher = hedge.HedgingFetcher(default_timeout=7)
+    assert fetcher.delays('sites.com') == (None, 7)
+    primed(fetcher)
+    hedge_after, timeout = fetcher.delays('sites.com')
+    assert 0.01 <= hedge_after <= 0.012
+    assert timeout == hedge.MIN_TIMEOUT
+
+
+def test_fetcher_forgets_least_recently_used_hosts():
+    """Ensure latency is kept for a bounded number of hosts."""
+    fetcher = hedge.HedgingFetcher(max_hosts=2)
+    primed(fetcher)
+    fetcher.histogram('a.com')
+    fetcher.delays('sites.com')
+    fetcher.histogram('b.com')
+    assert sorted(fetcher.metrics()['hosts']) == ['b.com', 'sites.com']
+    assert fetcher.histogram('sites.com').total == hedge.MIN_SAMPLES
+
+
+def test_fetcher_hedges_slow_requests():
+    """Ensure a slow request is raced by a duplicate that wins."""
+    calls = []
+    release = threading.Event()
+
+    def body_provider(url, timeout=None):
+        """Hang on the first call and answer the rest at once."""
+        calls.append(timeout)
+        if len(calls) == 1:
+
+            release.wait(5)
+            return 'slow'
+
+        return 'fast'
+
+    fetcher = primed(hedge.HedgingFetcher(body_provider))
+    start = timeit.default_timer()
+    assert fetcher(URL) == 'fast'
+    assert timeit.default_timer() - start < 0.4
+    release.set()
+    metrics = fetcher.metrics()
+    assert metrics['hedges'] == 1
+    assert metrics['hedge_wins'] == 1
+    assert calls[0] == calls[1] == hedge.MIN_TIMEOUT
+
+
+def test_fetcher_respects_the_budget():
+    """Ensure nothing is hedged when the budget is spent."""
+    calls = []
+
+    def body_provider(url, timeout=None):
+        """Answer after a short delay."""
+        calls.append(url)
+        threading.Event().wait(0.05)
+        return 'body'
+
+    fetcher = primed(hedge.HedgingFetcher(
+        body_provider,
+        budget=hedge.HedgeBudget(ratio=0, burst=0),
+    ))
+    assert fetcher(URL) == 'body'
+    assert len(calls) == 1
+    assert fetcher.metrics()['hedges'] == 0
+
+
+def test_fetcher_gives_up_at_the_timeout():
+    """Ensure a hung request produces None at the timeout."""
+    release = threading.Event()
+
+    def body_provider(url, timeout=None):
+        """Hang until released."""
+        release.wait(5)
+        return 'late'
+
+    fetcher = hedge.HedgingFetcher(body_provider, default_timeout=0.05)
+    start = timeit.default_timer()
+    assert fetcher(URL) is None
+    assert timeit.default_timer() - start < 1
+    release.set()
+    assert fetcher.metrics()['timeouts'] == 1
+
+
+@pytest.mark.parametrize(
+    'error',
+    (requests.ConnectionError, requests.Timeout, ValueError),
+)
+def test_fetcher_treats_request_errors_as_missing(error):
+    """Ensure failed requests produce None and are still recorded."""
+    def body_provider(url, timeout=None):
+        """Fail every request."""
+        raise error('failed')
+
+    fetcher = hedge.HedgingFetcher(body_provider)
+    assert fetcher(URL) is None
+    assert fetcher.histogram('sites.com').total == 1
+
+
+def test_fetcher_records_read_timeouts():
+    """Ensure a body that stalls mid-read is recorded once it fails."""
+    with loadtest.StubOrigin(drip=50, drip_delay=0.5) as origin:
+
+        fetcher = hedge.HedgingFetcher(default_timeout=0.2)
+        host = origin.url.split('//')[1].split(':')[0]
+        start = timeit.default_timer()
+        assert fetcher(origin.url + '/slow') is None
+        while (
+                not fetcher.histogram(host).total and
+                timeit.default_timer() - start < 5
+        ):
+
+            threading.Event().wait(0.01)
+
+    assert fetcher.histogram(host).percentile(99) >= 0.2
@@ -5,10 +5,16 @@ from __future__ import absolute_import
 from __future__ import print_function
 from __future__ import unicode_literals
 
+import copy
+import pickle
+import zlib
+
 import pytest
+import requests
 import responses
 
 from chattools import href
+from chattools import loadtest
 
 
 def test_hrefs_are_empty_if_not_present():
@@ -107,6 +113,37 @@ def test_href_detects_multiline():
     assert len(results) == 3
 
 
+def test_href_spans_locate_hrefs():
+    """Ensure href spans give the offsets of each href.
+
+    Example: See https://one.com, and two.org!
+    Results: ((4, 19, 'https://one.com'), (25, 32, 'two.org'))
+    """
+    results = tuple(href.href_spans('See https://one.com, and two.org!'))
+    assert results == ((4, 19, 'https://one.com'), (25, 32, 'two.org'))
+
+
+def test_lazy_pattern_compiles_on_first_use():
+    """Ensure a lazy pattern compiles once and acts like re.compile."""
+    pattern = href.LazyPattern(r'(a+)', href.FLAGS)
+    assert pattern._compiled is None  # pylint: disable=protected-access
+    assert pattern.findall('caaab ab') == ['aaa', 'a']
+    assert pattern.compiled() is pattern.compiled()
+    assert pattern.pattern == '(a+)'
+
+
+def test_lazy_pattern_pickles_and_copies():
+    """Ensure copies of a lazy pattern match like the original."""
+    for copied in (
+            pickle.loads(pickle.dumps(href.HREF_REGEX)),
+            copy.copy(href.HREF_REGEX),
+            copy.deepcopy(href.HREF_REGEX),
+    ):
+
+        assert isinstance(copied, href.LazyPattern)
+        assert copied.findall('see sites.com') == ['sites.com']
+
+
 @responses.activate
 def test_requests_body_provider_success():
     """Ensure the provider returns a content body on success."""
@@ -161,6 +198,85 @@ def test_requests_body_provider_fail_low(status):
     assert href.requests_body_provider(url) is None
 
 
+@responses.activate
+def test_streaming_body_provider_success():
+    """Ensure the streaming provider returns a content body on success."""
+    url = 'https://coolsite.com/pages/3'
+    body = '<html><head><title>TEST</title></head></html>'
+    responses.add(
+        responses.GET,
+        url,
+        body=body,
+        status=200,
+        content_type='text/html'
+    )
+    assert href.streaming_body_provider(url) == body
+
+
+@responses.activate
+@pytest.mark.parametrize('status', (199, 301, 404, 500))
+def test_streaming_body_provider_fail(status):
+    """Ensure non-2xx responses evaluate to None."""
+    url = 'https://coolsite.com/pages/3'
+    responses.add(
+        responses.GET,
+        url,
+        body='<html></html>',
+        status=status,
+        content_type='text/html'
+    )
+    assert href.streaming_body_provider(url) is None
+
+
+@pytest.mark.parametrize('encoding', ('gzip', 'deflate'))
+def test_streaming_body_provider_decompresses(encoding):
+    """Ensure compressed pages are requested and inflated."""
+    with loadtest.StubOrigin(size=100000, encoding=encoding) as origin:
+
+        body = href.streaming_body_provider(origin.url + '/compressed')
+
+    assert href.scanning_title_provider(body) == 'Page /compressed'
+    assert origin.sent < 10000
+
+
+def test_streaming_body_provider_stops_after_title():
+    """Ensure the rest of the page is not downloaded once the title ends."""
+    with loadtest.StubOrigin(
+            size=500000,
+            drip=100,
+            drip_delay=0.01,
+    ) as origin:
+
+        body = href.streaming_body_provider(origin.url + '/large')
+
+    assert href.scanning_title_provider(body) == 'Page /large'
+    assert len(body) < 100000
+    assert origin.sent < 500000
+
+
+def test_streaming_body_provider_raises_requests_errors():
+    """Ensure a read timeout mid-body is raised as a requests error."""
+    with loadtest.StubOrigin(drip=50, drip_delay=0.5) as origin:
+
+        with pytest.raises(requests.ConnectionError):
+
+            href.streaming_body_provider(origin.url + '/slow', timeout=0.2)
+
+
+def test_decoder_accepts_raw_deflate():
+    """Ensure deflate bodies sent without a zlib header are inflated."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, -zlib.MAX_WBITS)
+    data = compressor.compress(b'<title>TEST</title>') + compressor.flush()
+    decode = href._decoder('deflate')  # pylint: disable=protected-access
+    assert decode(data[:5]) + decode(data[5:]) == b'<title>TEST</title>'
+
+
+def test_decoder_rejects_unknown_encodings():
+    """Ensure unsupported encodings are not treated as plain text."""
+    decode = href._decoder('compress')  # pylint: disable=protected-access
+    assert decode is None
+
+
 def test_etree_title_provider_invalid_xhtml():
     """Ensure the provider returns None when the content body is invalid."""
     body = '<html><head><title>TEST</title></head>'
@@ -299,3 +415,52 @@ def test_titles_generates_none_if_no_title():
     for title in titles:
 
         assert title is None
+
+
+def test_titles_generates_one_title_per_href():
+    """Ensure failed fetches do not produce extra titles."""
+    def body_provider(url):
+
+        return None if 'digg' in url else '<title>TEST</title>'
+
+    hrefs = (
+        'https://www.reddit.com/',
+        'http://digg.com/',
+        'https://news.ycombinator.com/',
+    )
+    titles = tuple(
+        href.titles(
+            hrefs,
+            body_provider=body_provider,
+            title_provider=href.scanning_title_provider,
+        )
+    )
+    assert titles == ('TEST', None, 'TEST')
+
+
+def test_titles_reads_whole_pages_by_default():
+    """Ensure title providers that parse whole documents get whole bodies."""
+    with loadtest.StubOrigin(size=50000) as origin:
+
+        lengths = tuple(
+            href.titles(
+                (origin.url + '/large',),
+                title_provider=lambda body: len(body),
+            )
+        )
+
+    assert lengths == (50000,)
+
+
+def test_streaming_titles_stops_after_title():
+    """Ensure streaming titles are found without reading whole pages."""
+    with loadtest.StubOrigin(
+            size=500000,
+            drip=100,
+            drip_delay=0.01,
+    ) as origin:
+
+        titles = tuple(href.streaming_titles((origin.url + '/large',)))
+
+    assert titles == ('Page /large',)
+    assert origin.sent < 500000
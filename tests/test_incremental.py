@@ -0,0 +1,86 @@
+"""Test suites for the incremental extraction tools."""
+
+from __future__ import division
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import json
+
+import pytest
+
+from chattools import incremental
+
+
+@pytest.mark.parametrize(
+    'old,new',
+    (
+        ('@mary see http://a.com (beer)', '@mary see http://a.com (beer) now'),
+        ('@mary see http://a.com (beer)', 'hi @mary see http://b.com (beer)'),
+        ('@mary see http://a.com (beer)', '@mary see http://a.com/x (beer)'),
+        ('(ok) @mary and (beer)', '(ok) @mary and (beer'),
+        ('(ok) @mary and beer)', '(ok) @mary and (beer)'),
+        ('@mary@geetha', '@mary @geetha'),
+        ('(hello world) @x', '(hello  world) @x'),
+        ('', '@mary (beer) x.com'),
+        ('@mary (beer) x.com', ''),
+    ),
+)
+def test_revise_matches_full_extraction(old, new):
+    """Ensure incremental extraction finds the same content as a full one."""
+    for margin in (0, 1, incremental.MARGIN):
+
+        revised = incremental.revise(incremental.extract(old), new, margin)
+        expected = incremental.extract(new)
+        assert revised.emoticons == expected.emoticons
+        assert revised.hrefs == expected.hrefs
+        assert revised.mentions == expected.mentions
+
+
+def test_revise_only_scans_the_changed_region():
+    """Ensure the extractors are given the edited window, not the message."""
+    scanned = []
+
+    def provider(text):
+
+        scanned.append(text)
+        return ()
+
+    words = ' '.join('word{0}'.format(index) for index in range(1000))
+    previous = incremental.extract(words)
+    incremental.revise(
+        previous,
+        words.replace('word500', 'edit500'),
+        emoticon_provider=provider,
+        href_provider=provider,
+        mention_provider=provider,
+    )
+    assert len(scanned) == 3
+    for text in scanned:
+
+        assert 'edit500' in text
+        assert len(text) < 2 * incremental.MARGIN + 20
+
+
+def test_revise_reuses_titles_of_unchanged_hrefs():
+    """Ensure only new hrefs are fetched for a revised message."""
+    fetched = []
+
+    def title_provider(urls):
+
+        for url in urls:
+
+            fetched.append(url)
+            yield url.upper()
+
+    previous = incremental.extract('see http://a.com and (beer)')
+    payload = json.loads(previous.metadata(title_provider=title_provider).json)
+    assert payload['links'][0]['title'] == 'HTTP://A.COM'
+    revised = incremental.revise(previous, 'see http://a.com or http://b.com')
+    payload = json.loads(revised.metadata(title_provider=title_provider).json)
+    assert fetched == ['http://a.com', 'http://b.com']
+    assert [link['title'] for link in payload['links']] == [
+        'HTTP://A.COM',
+        'HTTP://B.COM',
+    ]
+    assert 'emoticons' not in payload
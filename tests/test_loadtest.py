@@ -0,0 +1,135 @@
+"""Test suites for the load testing tools."""
+
+from __future__ import division
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import errno
+import json
+import socket
+from http.server import BaseHTTPRequestHandler
+
+import pytest
+import requests
+
+from chattools import href
+from chattools import loadtest
+from chattools import metadata
+
+
+def test_stub_origin_serves_titled_pages():
+    """Ensure pages of the requested size are titled after their path."""
+    with loadtest.StubOrigin(size=5000, drip=3, drip_delay=0.001) as origin:
+
+        body = href.requests_body_provider(origin.url + '/page/7')
+
+    assert href.scanning_title_provider(body) == 'Page /page/7'
+    assert len(body) == 5000
+    assert origin.requests == 1
+
+
+def test_stub_origin_injects_errors():
+    """Ensure the error rate is applied to responses."""
+    with loadtest.StubOrigin(error_rate=1.0) as origin:
+
+        response = requests.get(origin.url + '/page/1')
+
+    assert response.status_code == 500
+
+
+def test_messages_link_to_origin():
+    """Ensure synthetic messages contain extractable content."""
+    texts = tuple(loadtest.messages('http://127.0.0.1:8000', 20, seed=1))
+    assert len(texts) == 20
+    assert all(tuple(metadata.Metadata(text).mentions) for text in texts)
+    assert any(
+        url.startswith('http://127.0.0.1:8000/page/')
+        for text in texts for url in href.hrefs(text)
+    )
+
+
+def test_drive_reports_latency_and_errors():
+    """Ensure every message is measured or counted as an error."""
+    class Failing(object):
+
+        """A metadata container whose JSON cannot be produced."""
+
+        def __init__(self, message):
+
+            self.message = message
+
+        @property
+        def json(self):
+            """Fail for messages that mention failure."""
+            if 'fail' in self.message:
+
+                raise ValueError(self.message)
+
+            return '{}'
+
+    report = loadtest.drive(
+        ('ok', 'fail', 'ok', 'ok'),
+        rate=1000,
+        concurrency=2,
+        factory=Failing,
+    )
+    assert len(report.latencies) == 3
+    assert report.errors == 1
+    assert report.throughput > 0
+    assert json.loads(json.dumps(report.summary()))['completed'] == 3
+
+
+@pytest.mark.parametrize(
+    'percent,expected',
+    ((0, 1), (50, 5), (90, 9), (99, 10), (100, 10)),
+)
+def test_report_percentiles_use_nearest_rank(percent, expected):
+    """Ensure percentiles pick the nearest ranked latency."""
+    report = loadtest.Report(range(10, 0, -1), 0, 1)
+    assert report.percentile(percent) == expected
+
+
+def test_drive_fetches_titles_from_origin():
+    """Ensure the full title path runs against the origin."""
+    with loadtest.StubOrigin(seed=1) as origin:
+
+        report = loadtest.drive(
+            ('see {0}/page/1'.format(origin.url),),
+            rate=100,
+            factory=lambda text: metadata.Metadata(text),
+        )
+
+    assert report.errors == 0
+    assert origin.requests == 1
+
+
+@pytest.mark.parametrize('number', (errno.ECONNRESET, errno.EPIPE))
+def test_server_ignores_early_disconnects(capsys, number):
+    """Ensure clients that hang up early do not print tracebacks."""
+    server = loadtest._Server(('127.0.0.1', 0), BaseHTTPRequestHandler)
+    try:
+
+        raise socket.error(number, 'disconnected')
+
+    except socket.error:
+
+        server.handle_error(None, ('127.0.0.1', 0))
+
+    server.server_close()
+    assert capsys.readouterr().err == ''
+
+
+def test_server_reports_other_errors(capsys):
+    """Ensure unexpected handler errors are still reported."""
+    server = loadtest._Server(('127.0.0.1', 0), BaseHTTPRequestHandler)
+    try:
+
+        raise ValueError('broken')
+
+    except ValueError:
+
+        server.handle_error(None, ('127.0.0.1', 0))
+
+    server.server_close()
+    assert 'ValueError' in capsys.readouterr().err
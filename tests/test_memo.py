@@ -0,0 +1,119 @@
+"""Test suites for message memoization."""
+
+from __future__ import division
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import functools
+import json
+
+from chattools import canonical
+from chattools import memo
+from chattools import mention
+from chattools import metadata
+
+
+def fake_titles(urls):
+    """Produce a title from each url and count the fetches."""
+    fake_titles.fetched.extend(urls)
+    return ('Title of {0}'.format(url) for url in urls)
+
+
+def counting(provider, calls):
+    """Wrap a provider so that its calls are counted."""
+    def wrapped(message):
+        """Count a call and run the provider."""
+        calls.append(message)
+        return provider(message)
+
+    return wrapped
+
+
+def test_digest_separates_namespaces():
+    """Ensure the same message hashes differently per configuration."""
+    assert memo.digest('hello') == memo.digest(b'hello')
+    assert memo.digest('hello') != memo.digest('hello', b'other')
+    assert memo.digest('hello') != memo.digest('hello!')
+
+
+def test_memo_extracts_repeated_messages_once():
+    """Ensure repeated messages reuse the cached extraction."""
+    fake_titles.fetched = []
+    calls = []
+    factory = memo.Memo(
+        mention_provider=counting(mention.mentions, calls),
+        title_provider=fake_titles,
+    )
+    message = '@mary (beer) http://sites.com'
+    payloads = [factory(message).json for _ in range(5)]
+    assert len(set(payloads)) == 1
+    assert calls == [message]
+    assert fake_titles.fetched == ['http://sites.com/']
+    stats = factory.stats()
+    assert stats['hits'] == 4
+    assert stats['misses'] == 1
+    assert stats['hit_rate'] == 0.8
+    assert stats['titles'] == 1
+    assert json.loads(payloads[0]) == json.loads(metadata.Metadata(
+        message,
+        title_provider=functools.partial(
+            canonical.titles,
+            title_provider=fake_titles,
+        ),
+    ).json)
+
+
+def test_memo_keeps_titles_fresh_through_the_title_cache():
+    """Ensure titles expire on their own schedule."""
+    now = [0.0]
+    fake_titles.fetched = []
+    factory = memo.Memo(
+        title_provider=fake_titles,
+        title_cache=canonical.TitleCache(max_age=10, clock=lambda: now[0]),
+    )
+    tuple(factory('http://sites.com').links)
+    tuple(factory('http://sites.com').links)
+    now[0] = 11
+    tuple(factory('http://sites.com').links)
+    assert fake_titles.fetched == ['http://sites.com/', 'http://sites.com/']
+    assert factory.stats()['hits'] == 2
+
+
+def test_memo_separates_provider_configurations():
+    """Ensure factories with different providers do not share results."""
+    shared = memo.MemoCache()
+    plain = memo.Memo(cache=shared)
+    shouting = memo.Memo(
+        mention_provider=lambda text: (name.upper() for name in ('mary',)),
+        cache=shared,
+    )
+    assert plain.extract('@mary')[2] == ('mary',)
+    assert shouting.extract('@mary')[2] == ('MARY',)
+    assert len(shared) == 2
+
+
+def test_memo_cache_evicts_by_entries():
+    """Ensure the least recently used entry is evicted first."""
+    cache = memo.MemoCache(max_entries=2)
+    cache.set(b'a', 1, 0)
+    cache.set(b'b', 2, 0)
+    assert cache.get(b'a') == 1
+    cache.set(b'c', 3, 0)
+    assert cache.get(b'b') is None
+    assert cache.get(b'a') == 1
+    assert cache.stats()['evictions'] == 1
+
+
+def test_memo_cache_evicts_by_bytes():
+    """Ensure the byte limit is respected and oversize values skipped."""
+    limit = 3 * (memo.ENTRY_OVERHEAD + 1 + 100)
+    cache = memo.MemoCache(max_bytes=limit)
+    for key in (b'a', b'b', b'c', b'd'):
+
+        cache.set(key, key, 100)
+
+    assert len(cache) == 3
+    assert cache.size <= limit
+    cache.set(b'e', b'e', limit)
+    assert cache.get(b'e') is None
@@ -111,3 +111,13 @@ def test_mention_skips_emails():
     assert 'ourcorp' not in results
     assert 'ourcorp.com' not in results
     assert len(results) == 1
+
+
+def test_mention_spans_locate_mentions():
+    """Ensure mention spans cover the @ and the name.
+
+    Example: Hey, @mary & @geetha!
+    Results: ((5, 10, 'mary'), (13, 20, 'geetha'))
+    """
+    results = tuple(mention.mention_spans('Hey, @mary & @geetha!'))
+    assert results == ((5, 10, 'mary'), (13, 20, 'geetha'))
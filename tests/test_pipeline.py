@@ -0,0 +1,143 @@
+"""Test suites for the staged pipeline."""
+
+from __future__ import division
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import json
+import threading
+import time
+
+import pytest
+
+from chattools import metadata
+from chattools import pipeline
+
+
+def fake_titles(urls):
+    """Produce a title from each url."""
+    return ('Title of {0}'.format(url) for url in urls)
+
+
+def test_pipeline_matches_metadata():
+    """Ensure every payload matches that of Metadata.json."""
+    messages = (
+        '@mary (beer) http://sites.com/a',
+        'nothing here',
+        'https://other.com (shrug) @bob',
+    )
+    results = []
+    with pipeline.Pipeline(
+            results.append,
+            title_provider=fake_titles,
+    ) as running:
+
+        for message in messages:
+
+            running.put(message)
+
+    assert [job.message for job in results] == list(messages)
+    for job in results:
+
+        assert job.error is None
+        assert json.loads(job.payload) == json.loads(
+            metadata.Metadata(job.message, title_provider=fake_titles).json,
+        )
+
+
+def test_pipeline_preserves_conversation_order():
+    """Ensure slow fetches do not reorder the messages of a conversation."""
+    def slow_titles(urls):
+        """Take longer for earlier messages."""
+        time.sleep(0.05 if 'slow' in urls[0] else 0)
+        return fake_titles(urls)
+
+    results = []
+    with pipeline.Pipeline(
+            results.append,
+            title_provider=slow_titles,
+            fetch_workers=4,
+    ) as running:
+
+        running.put('http://slow.com', conversation='a')
+        running.put('plain text', conversation='a')
+        running.put('http://fast.com', conversation='a')
+        running.put('other conversation', conversation='b')
+
+    order = [job.message for job in results if job.conversation == 'a']
+    assert order == ['http://slow.com', 'plain text', 'http://fast.com']
+    assert results[0].message == 'other conversation'
+
+
+def test_pipeline_reports_errors():
+    """Ensure a failing stage marks the job rather than losing it."""
+    def broken_titles(urls):
+        """Fail every fetch."""
+        raise ValueError('broken')
+
+    results = []
+    with pipeline.Pipeline(
+            results.append,
+            title_provider=broken_titles,
+    ) as running:
+
+        running.put('http://sites.com')
+        running.put('@mary')
+
+    assert isinstance(results[0].error, ValueError)
+    assert results[0].payload is None
+    assert json.loads(results[1].payload) == {'mentions': ['mary']}
+
+
+def test_pipeline_applies_backpressure():
+    """Ensure put waits while too many messages are in flight."""
+    release = threading.Event()
+
+    def blocked_titles(urls):
+        """Wait until the test releases the fetch."""
+        release.wait(5)
+        return fake_titles(urls)
+
+    results = []
+    running = pipeline.Pipeline(
+        results.append,
+        title_provider=blocked_titles,
+        max_in_flight=2,
+    )
+    running.put('http://one.com')
+    running.put('http://two.com')
+    producer = threading.Thread(target=running.put, args=('@three',))
+    producer.start()
+    producer.join(0.1)
+    assert producer.is_alive()
+    assert running.metrics()['in_flight'] == 2
+    release.set()
+    producer.join(5)
+    running.close()
+    assert [job.message for job in results] == [
+        'http://one.com', 'http://two.com', '@three',
+    ]
+    with pytest.raises(RuntimeError):
+
+        running.put('too late')
+
+
+def test_pipeline_metrics_cover_each_stage():
+    """Ensure every stage reports its load."""
+    with pipeline.Pipeline(
+            lambda job: None,
+            title_provider=fake_titles,
+            fetch_workers=2,
+    ) as running:
+
+        running.put('http://sites.com')
+        running.put('no links')
+
+    metrics = running.metrics()
+    assert metrics['in_flight'] == 0
+    assert sorted(metrics['stages']) == ['extract', 'fetch', 'serialize']
+    assert metrics['stages']['extract']['processed'] == 2
+    assert metrics['stages']['fetch']['processed'] == 1
+    assert metrics['stages']['fetch']['workers'] == 2
+    assert 0 <= metrics['stages']['serialize']['utilization'] <= 1
@@ -0,0 +1,98 @@
+"""Test suites for the slow message recorder."""
+
+from __future__ import division
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import io
+import json
+
+from chattools import recorder
+
+
+class Clock(object):
+
+    """A timer that only moves when told to."""
+
+    def __init__(self):
+        """Start the clock at zero."""
+        self.now = 0.0
+
+    def __call__(self):
+        """Get the current time."""
+        return self.now
+
+    def slow(self, seconds, values):
+        """Create a provider that takes a number of seconds."""
+        def provider(_):
+
+            self.now += seconds
+            return iter(values)
+
+        return provider
+
+
+def test_recorder_keeps_slow_messages_with_timings(tmpdir):
+    """Ensure slow messages are recorded with a per stage breakdown."""
+    clock = Clock()
+    path = str(tmpdir.join('slow.log'))
+    slow = recorder.Recorder(threshold=1, path=path, timer=clock)
+    meta = slow.metadata(
+        '@mary see http://example.com',
+        title_provider=clock.slow(2, ('Example',)),
+        mention_provider=clock.slow(0.5, ('mary',)),
+    )
+    payload = json.loads(meta.json)
+    assert payload['links'][0]['title'] == 'Example'
+    assert len(slow.cases) == 1
+    case = slow.cases[0]
+    assert case['message'] == '@mary see http://example.com'
+    assert case['total'] == 2.5
+    assert case['timings']['title'] == 2
+    assert case['timings']['mention'] == 0.5
+    assert recorder.load(path) == [case]
+
+
+def test_recorder_times_each_payload_alone():
+    """Ensure stage timings do not add up across payloads."""
+    clock = Clock()
+    slow = recorder.Recorder(threshold=1, timer=clock)
+    meta = slow.metadata('@mary', mention_provider=clock.slow(1, ('mary',)))
+    assert meta.json == meta.json
+    assert [case['total'] for case in slow.cases] == [1, 1]
+    assert [case['timings']['mention'] for case in slow.cases] == [1, 1]
+
+
+def test_recorder_skips_fast_messages():
+    """Ensure messages under the threshold are not recorded."""
+    clock = Clock()
+    slow = recorder.Recorder(threshold=1, timer=clock)
+    slow.metadata('(beer)', emoticon_provider=clock.slow(0.5, ())).json
+    assert not slow.cases
+
+
+def test_recorder_is_bounded():
+    """Ensure only the most recent cases are kept in memory."""
+    clock = Clock()
+    slow = recorder.Recorder(threshold=1, capacity=2, timer=clock)
+    extract = slow.extractor('mention', clock.slow(1, ('mary',)))
+    for message in ('one', 'two', 'three'):
+
+        assert extract(message) == ('mary',)
+
+    assert [case['message'] for case in slow.cases] == ['two', 'three']
+    assert slow.cases[0]['timings'] == {'mention': 1}
+
+
+def test_replay_profiles_recorded_cases():
+    """Ensure recorded cases are run again under the profiler."""
+    cases = [{'message': '@mary see http://example.com', 'total': 1}]
+    output = io.StringIO()
+    stats = recorder.replay(
+        cases,
+        stream=output,
+        title_provider=lambda urls: ('Example' for _ in urls),
+    )
+    assert stats.total_calls
+    assert 'function calls' in output.getvalue()
@@ -0,0 +1,151 @@
+"""Test suites for the host name resolvers."""
+
+from __future__ import division
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import functools
+import socket
+import time
+
+import pytest
+import requests
+
+from chattools import href
+from chattools import loadtest
+from chattools import resolver
+
+
+class Clock(object):
+
+    """A clock that only moves when told to."""
+
+    def __init__(self):
+        """Start the clock at zero."""
+        self.now = 0.0
+
+    def __call__(self):
+        """Get the current time."""
+        return self.now
+
+
+def test_stub_resolver_uses_its_records():
+    """Ensure the stub resolves known names and fails for others."""
+    stub = resolver.StubResolver({'one.com': '10.0.0.1'}, ttl=5)
+    assert stub.lookup('one.com') == (('10.0.0.1',), 5)
+    with pytest.raises(socket.gaierror):
+
+        stub.lookup('two.com')
+
+
+def test_caching_resolver_respects_ttl():
+    """Ensure names are looked up again once their TTL passes."""
+    clock = Clock()
+    stub = resolver.StubResolver({'one.com': ('10.0.0.1', '10.0.0.2')}, 10)
+    cache = resolver.CachingResolver(stub, prefetch=None, clock=clock)
+    assert cache.resolve('one.com') == ('10.0.0.1', '10.0.0.2')
+    clock.now = 9
+    assert cache.resolve('one.com') == ('10.0.0.1', '10.0.0.2')
+    assert stub.lookups['one.com'] == 1
+    clock.now = 10
+    cache.resolve('one.com')
+    assert stub.lookups['one.com'] == 2
+    metrics = cache.metrics()
+    assert metrics['hits'] == 1
+    assert metrics['misses'] == 2
+    assert metrics['lookups'] == 2
+
+
+def test_caching_resolver_caps_reported_ttl():
+    """Ensure a long TTL from the resolver is limited to the cache TTL."""
+    clock = Clock()
+    stub = resolver.StubResolver({'one.com': '10.0.0.1'}, ttl=86400)
+    cache = resolver.CachingResolver(stub, ttl=60, prefetch=None, clock=clock)
+    cache.resolve('one.com')
+    clock.now = 61
+    cache.resolve('one.com')
+    assert stub.lookups['one.com'] == 2
+
+
+def test_caching_resolver_caches_failures():
+    """Ensure failed lookups are cached for the negative TTL."""
+    clock = Clock()
+    stub = resolver.StubResolver({})
+    cache = resolver.CachingResolver(stub, negative_ttl=5, clock=clock)
+    for _ in range(3):
+
+        with pytest.raises(socket.gaierror):
+
+            cache.resolve('gone.com')
+
+    assert stub.lookups['gone.com'] == 1
+    assert cache.metrics()['negative_hits'] == 2
+    stub.records['gone.com'] = '10.0.0.3'
+    clock.now = 5
+    assert cache.resolve('gone.com') == ('10.0.0.3',)
+
+
+def test_caching_resolver_prefetches_hot_names():
+    """Ensure a name used late in its TTL is refreshed in the background."""
+    clock = Clock()
+    stub = resolver.StubResolver({'one.com': '10.0.0.1'}, ttl=10)
+    cache = resolver.CachingResolver(stub, prefetch=0.5, clock=clock)
+    cache.resolve('one.com')
+    clock.now = 6
+    stub.records['one.com'] = '10.0.0.9'
+    assert cache.resolve('one.com') == ('10.0.0.1',)
+    deadline = time.time() + 5
+    while cache.lookups < 2 and time.time() < deadline:
+
+        time.sleep(0.01)
+
+    clock.now = 8
+    assert cache.resolve('one.com') == ('10.0.0.9',)
+    assert stub.lookups['one.com'] == 2
+    assert cache.metrics()['prefetches'] == 1
+
+
+def test_caching_resolver_skips_addresses():
+    """Ensure IP addresses are not looked up or cached."""
+    stub = resolver.StubResolver({})
+    cache = resolver.CachingResolver(stub)
+    assert cache.resolve('127.0.0.1') == ('127.0.0.1',)
+    assert cache.resolve('::1') == ('::1',)
+    assert not stub.lookups
+    assert not len(cache)
+
+
+def test_caching_resolver_bounds_its_size():
+    """Ensure the least recently used names are evicted."""
+    stub = resolver.StubResolver(
+        dict(('{0}.com'.format(index), '10.0.0.1') for index in range(5)),
+    )
+    cache = resolver.CachingResolver(stub, max_size=2)
+    cache.warm('{0}.com'.format(index) for index in range(5))
+    cache.warm(('missing.com',))
+    assert len(cache) == 2
+
+
+def test_session_fetches_through_the_resolver():
+    """Ensure a session connects to the address given by the resolver."""
+    stub = resolver.StubResolver({'origin.test': '127.0.0.1'})
+    cache = resolver.CachingResolver(stub)
+    fetcher = resolver.session(cache)
+    with loadtest.StubOrigin() as origin:
+
+        port = origin.url.rsplit(':', 1)[1]
+        url = 'http://origin.test:{0}/dns'.format(port)
+        titles = href.titles(
+            (url, url),
+            body_provider=functools.partial(
+                href.streaming_body_provider,
+                session=fetcher,
+            ),
+        )
+        assert tuple(titles) == ('Page /dns', 'Page /dns')
+
+    assert stub.lookups['origin.test'] == 1
+    with pytest.raises(requests.ConnectionError):
+
+        fetcher.get('http://missing.test/')
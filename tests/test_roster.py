@@ -0,0 +1,85 @@
+"""Test suites for the @mention roster tools."""
+
+from __future__ import division
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import pytest
+
+from chattools import mention
+from chattools import roster
+
+
+@pytest.fixture
+def roster_path(tmpdir):
+    """Get the path of a roster file with a few hundred names."""
+    path = str(tmpdir.join('roster.txt'))
+    names = ['user{0}'.format(index) for index in range(500)]
+    names.extend(('Mary', 'GEETHA', 'Renée', 'mary'))
+    roster.write_roster(names, path)
+    return path
+
+
+def test_roster_file_is_sorted_and_folded(roster_path):
+    """Ensure the roster file holds one sorted, folded name per line."""
+    with open(roster_path, 'rb') as roster_file:
+
+        lines = roster_file.read().split(b'\n')
+
+    assert lines == sorted(lines)
+    assert b'mary' in lines
+    assert b'Mary' not in lines
+    assert len(lines) == 503
+
+
+def test_write_roster_rejects_line_breaks(tmpdir):
+    """Ensure names that would corrupt the file are refused."""
+    with pytest.raises(ValueError):
+
+        roster.write_roster(('mary\ngeetha',), str(tmpdir.join('roster')))
+
+
+@pytest.mark.parametrize(
+    'name',
+    ('mary', 'MARY', 'geetha', 'renée', 'RENÉE', 'user0', 'user499'),
+)
+def test_roster_contains_names_regardless_of_case(roster_path, name):
+    """Ensure names are found with case folding."""
+    with roster.Roster(roster_path) as names:
+
+        assert name in names
+
+
+@pytest.mark.parametrize(
+    'name',
+    ('mar', 'maryy', 'user500', 'a', 'zzz', ''),
+)
+def test_roster_excludes_unknown_names(roster_path, name):
+    """Ensure names missing from the file are not found."""
+    with roster.Roster(roster_path) as names:
+
+        assert name not in names
+
+
+def test_roster_resolves_mentions_in_bulk(roster_path):
+    """Ensure resolved and unresolved mentions are reported in order."""
+    text = '@Mary @nobody, @here @user42 and @team @geetha @nobody'
+    with roster.Roster(roster_path, aliases=('here',)) as names:
+
+        resolved, unresolved = names.resolve(mention.mentions(text))
+
+    assert resolved == ('Mary', 'here', 'user42', 'geetha')
+    assert unresolved == ('nobody', 'team', 'nobody')
+
+
+def test_roster_handles_empty_file(tmpdir):
+    """Ensure an empty roster resolves only aliases."""
+    path = str(tmpdir.join('roster.txt'))
+    roster.write_roster((), path)
+    with roster.Roster(path) as names:
+
+        resolved, unresolved = names.resolve(('mary', 'Everyone'))
+
+    assert resolved == ('Everyone',)
+    assert unresolved == ('mary',)
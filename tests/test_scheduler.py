@@ -0,0 +1,149 @@
+"""Test suites for the fair fetch scheduler."""
+
+from __future__ import division
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import json
+import threading
+
+import pytest
+
+from chattools import metadata
+from chattools import scheduler
+
+
+class Gate(object):
+
+    """A fetch function that records its order and waits to be opened."""
+
+    def __init__(self):
+        """Start with the gate closed."""
+        self.order = []
+        self.opened = threading.Event()
+
+    def __call__(self, url):
+        """Record the href and produce its title once the gate opens."""
+        self.opened.wait(5)
+        self.order.append(url)
+        return 'Title of {0}'.format(url)
+
+
+def run(submissions, **options):
+    """Submit hrefs while the only worker is busy and get the fetch order."""
+    gate = Gate()
+    fair = scheduler.FairScheduler(gate, workers=1, **options)
+    blocker = fair.submit('warmup', 'blocker')
+    while fair.stats()['warmup']['active'] != 1:
+
+        gate.opened.wait(0.001)
+
+    tickets = [fair.submit(*submission) for submission in submissions]
+    gate.opened.set()
+    blocker.result(5)
+    for ticket in tickets:
+
+        ticket.result(5)
+
+    fair.close()
+    return gate.order[1:], fair.stats()
+
+
+def test_scheduler_interleaves_tenants():
+    """Ensure a tenant with many hrefs does not starve the others."""
+    order, _ = run(
+        [('noisy', 'n{0}'.format(index)) for index in range(4)] +
+        [('quiet', 'q0'), ('quiet', 'q1')],
+    )
+    assert order == ['n0', 'q0', 'n1', 'q1', 'n2', 'n3']
+
+
+def test_scheduler_honours_weights():
+    """Ensure a heavier tenant gets a larger share."""
+    order, _ = run(
+        [('big', 'b{0}'.format(index)) for index in range(4)] +
+        [('small', 's{0}'.format(index)) for index in range(2)],
+        weights={'big': 2},
+    )
+    assert order == ['b0', 'b1', 's0', 'b2', 'b3', 's1']
+
+
+def test_scheduler_serves_first_links_before_bulk():
+    """Ensure higher priority hrefs skip ahead of bulk traffic."""
+    order, _ = run([
+        ('backfill', 'b0', scheduler.BULK),
+        ('backfill', 'b1', scheduler.BULK),
+        ('live', 'l1', scheduler.NORMAL),
+        ('live', 'l0', scheduler.FIRST),
+    ])
+    assert order == ['l0', 'l1', 'b0', 'b1']
+
+
+def test_scheduler_limits_first_links_per_tenant():
+    """Ensure a flood of FIRST hrefs cannot hold back other tenants."""
+    order, stats = run(
+        [
+            ('noisy', 'n{0}'.format(index), scheduler.FIRST)
+            for index in range(4)
+        ] + [('quiet', 'q0', scheduler.NORMAL)],
+        max_first=1,
+    )
+    assert order == ['n0', 'q0', 'n1', 'n2', 'n3']
+    assert stats['noisy']['demoted'] == 3
+
+
+def test_scheduler_sheds_beyond_the_queue_quota():
+    """Ensure hrefs beyond a tenant's quota get no title."""
+    order, stats = run(
+        [('noisy', 'n{0}'.format(index)) for index in range(4)],
+        max_queued=2,
+    )
+    assert order == ['n0', 'n1']
+    stats = stats['noisy']
+    assert stats['shed'] == 2
+    assert stats['completed'] == 2
+
+
+def test_scheduler_limits_active_fetches():
+    """Ensure a tenant never fetches more than its active limit at once."""
+    active = []
+    peak = []
+    lock = threading.Lock()
+
+    def fetch(url):
+        """Track how many fetches run at once."""
+        with lock:
+
+            active.append(url)
+            peak.append(len(active))
+
+        threading.Event().wait(0.01)
+        with lock:
+
+            active.remove(url)
+
+        return url
+
+    fair = scheduler.FairScheduler(fetch, workers=4, max_active=2)
+    urls = ['u{0}'.format(index) for index in range(8)]
+    titles = tuple(fair.titles(urls, 'tenant'))
+    fair.close()
+    assert titles == tuple(urls)
+    assert max(peak) == 2
+
+
+def test_scheduler_plugs_into_metadata():
+    """Ensure a tenant bound provider can replace the title provider."""
+    fair = scheduler.FairScheduler(lambda url: 'Title of {0}'.format(url))
+    payload = metadata.Metadata(
+        '@mary http://sites.com',
+        title_provider=fair.title_provider('workspace'),
+    ).json
+    fair.close()
+    assert json.loads(payload)['links'] == [
+        {'url': 'http://sites.com', 'title': 'Title of http://sites.com'},
+    ]
+    with pytest.raises(RuntimeError):
+
+        fair.submit('workspace', 'http://late.com')
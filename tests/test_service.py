@@ -0,0 +1,343 @@
+"""Test suites for the metadata service."""
+
+from __future__ import division
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import errno
+import json
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler
+
+import pytest
+import requests
+
+from chattools import canonical
+from chattools import metadata
+from chattools import resolver
+from chattools import service
+
+
+def fake_titles(urls):
+    """Produce a title from each url and remember what was fetched."""
+    fake_titles.fetched.extend(urls)
+    return ('Title of {0}'.format(url) for url in urls)
+
+
+@pytest.fixture
+def fetched():
+    """Reset and provide the list of urls given to fake_titles."""
+    fake_titles.fetched = []
+    return fake_titles.fetched
+
+
+def test_batcher_collects_concurrent_items():
+    """Ensure items submitted within the window share a batch."""
+    batches = []
+
+    def handler(items):
+        """Record each batch and echo its items."""
+        batches.append(list(items))
+        return [item * 2 for item in items]
+
+    batcher = service.MicroBatcher(handler, window=0.2)
+    pending = [batcher.submit(number) for number in range(5)]
+    assert [item.result(5) for item in pending] == [0, 2, 4, 6, 8]
+    batcher.close()
+    assert batches == [[0, 1, 2, 3, 4]]
+    metrics = batcher.metrics()
+    assert metrics['batches'] == 1
+    assert metrics['largest'] == 5
+    assert metrics['sizes'] == {'8': 1}
+    assert metrics['depth'] == 0
+
+
+def test_batcher_limits_batch_size():
+    """Ensure batches never exceed the maximum size."""
+    sizes = []
+
+    def handler(items):
+        """Record the size of each batch."""
+        sizes.append(len(items))
+        return items
+
+    batcher = service.MicroBatcher(handler, window=0.2, max_size=2)
+    pending = [batcher.submit(number) for number in range(5)]
+    assert [item.result(5) for item in pending] == list(range(5))
+    batcher.close()
+    assert max(sizes) == 2
+    assert sum(sizes) == 5
+
+
+def test_batcher_reports_handler_errors():
+    """Ensure every item of a failed batch sees the error."""
+    def handler(items):
+        """Fail every batch."""
+        raise ValueError('broken')
+
+    batcher = service.MicroBatcher(handler, window=0)
+    with pytest.raises(ValueError):
+
+        batcher(1, timeout=5)
+
+    batcher.close()
+    with pytest.raises(RuntimeError):
+
+        batcher.submit(2)
+
+
+def test_batcher_isolates_failing_items():
+    """Ensure only the items that fail see an error."""
+    def handler(items):
+        """Fail any batch holding a bad item."""
+        if 'bad' in items:
+
+            raise ValueError('broken')
+
+        return [item.upper() for item in items]
+
+    batcher = service.MicroBatcher(handler, window=0.2)
+    pending = [batcher.submit(item) for item in ('one', 'bad', 'two')]
+    assert pending[0].result(5) == 'ONE'
+    assert pending[2].result(5) == 'TWO'
+    with pytest.raises(ValueError):
+
+        pending[1].result(5)
+
+    batcher.close()
+
+
+def test_batcher_does_not_wait_for_slow_batches():
+    """Ensure a batch is handled while an earlier one is still running."""
+    started = threading.Event()
+    release = threading.Event()
+
+    def handler(items):
+        """Hang on the slow item until released."""
+        if 'slow' in items:
+
+            started.set()
+            release.wait(5)
+
+        return items
+
+    batcher = service.MicroBatcher(handler, window=0)
+    slow = batcher.submit('slow')
+    assert started.wait(5)
+    assert batcher('fast', timeout=1) == 'fast'
+    release.set()
+    assert slow.result(5) == 'slow'
+    batcher.close()
+
+
+def test_extractor_matches_metadata(fetched):
+    """Ensure batch payloads match those of Metadata.json."""
+    messages = [
+        '@mary (beer) http://sites.com/a',
+        'nothing here',
+        'http://Sites.com/a?utm_source=x and https://other.com (shrug)',
+    ]
+    extractor = service.Extractor(title_provider=fake_titles)
+    payloads = extractor(messages)
+    extractor.close()
+    for message, payload in zip(messages, payloads):
+
+        expected = metadata.Metadata(
+            message,
+            title_provider=lambda urls: (
+                'Title of {0}'.format(url) for url in urls
+            ),
+        ).json
+        assert json.loads(payload).keys() == json.loads(expected).keys()
+
+    assert json.loads(payloads[2])['links'][0]['title'] == (
+        'Title of http://sites.com/a'
+    )
+    assert sorted(fetched) == ['http://sites.com/a', 'https://other.com/']
+    assert extractor.hrefs == 3
+    assert extractor.fetches == 2
+
+
+def test_extractor_reuses_cached_titles(fetched):
+    """Ensure titles fetched for one batch serve later batches."""
+    extractor = service.Extractor(title_provider=fake_titles)
+    extractor(['http://sites.com'])
+    extractor(['see http://sites.com/ again'])
+    extractor.close()
+    assert fetched == ['http://sites.com/']
+
+
+def test_extractor_survives_failed_fetches():
+    """Ensure a failing href gets no title and other messages succeed."""
+    def failing_titles(urls):
+        """Fail for one host and produce a title for the rest."""
+        for url in urls:
+
+            if 'dead' in url:
+
+                raise requests.ConnectionError('refused')
+
+            yield 'Title of {0}'.format(url)
+
+    extractor = service.Extractor(title_provider=failing_titles)
+    payloads = extractor([
+        'hi @bob',
+        'see http://dead.com/x and http://sites.com',
+    ])
+    extractor.close()
+    assert json.loads(payloads[0]) == {'mentions': ['bob']}
+    assert json.loads(payloads[1])['links'] == [
+        {'url': 'http://dead.com/x', 'title': None},
+        {'url': 'http://sites.com', 'title': 'Title of http://sites.com/'},
+    ]
+    assert extractor.errors == 1
+
+
+def test_extractor_shares_fetches_across_batches():
+    """Ensure batches that run at once wait for the same fetch."""
+    fetched = []
+    release = threading.Event()
+
+    def slow_titles(urls):
+        """Produce titles once released."""
+        fetched.extend(urls)
+        release.wait(5)
+        return ('Title of {0}'.format(url) for url in urls)
+
+    extractor = service.Extractor(title_provider=slow_titles)
+    with service.Service(port=0, window=0, extractor=extractor) as running:
+
+        pending = [running.batcher.submit('@user0 http://sites.com')]
+        while not fetched and not release.wait(0.01):
+
+            continue
+
+        pending.extend(
+            running.batcher.submit('@user{0} http://sites.com'.format(index))
+            for index in range(1, 4)
+        )
+        release.wait(0.2)
+        batches = running.batcher.metrics()['batches']
+        release.set()
+        payloads = [json.loads(item.result(5)) for item in pending]
+
+    assert batches >= 2
+    assert fetched == ['http://sites.com/']
+    assert [payload['links'][0]['title'] for payload in payloads] == [
+        'Title of http://sites.com/',
+    ] * 4
+
+
+def test_extractor_retries_failed_fetches():
+    """Ensure a failed title is not kept for longer than the negative age."""
+    now = [0]
+    calls = []
+
+    def flaky_titles(urls):
+        """Fail the first fetch and succeed afterwards."""
+        calls.extend(urls)
+        if len(calls) == 1:
+
+            raise requests.ConnectionError('refused')
+
+        return ('Title of {0}'.format(url) for url in urls)
+
+    extractor = service.Extractor(
+        title_provider=flaky_titles,
+        cache=canonical.TitleCache(clock=lambda: now[0]),
+    )
+    first = json.loads(extractor(['http://sites.com'])[0])
+    now[0] = canonical.NEGATIVE_MAX_AGE + 1
+    second = json.loads(extractor(['http://sites.com'])[0])
+    extractor.close()
+    assert first['links'][0]['title'] is None
+    assert second['links'][0]['title'] == 'Title of http://sites.com/'
+    assert len(calls) == 2
+
+
+def test_service_fetches_shared_hrefs_once(fetched):
+    """Ensure concurrent requests for one href cause a single fetch."""
+    extractor = service.Extractor(title_provider=fake_titles)
+    with service.Service(port=0, window=0.2, extractor=extractor) as running:
+
+        responses = [None] * 4
+
+        def post(index):
+            """Request the metadata of a message."""
+            responses[index] = requests.post(
+                running.url + '/metadata',
+                data='@user{0} http://sites.com'.format(index).encode('utf-8'),
+            )
+
+        threads = [
+            threading.Thread(target=post, args=(index,)) for index in range(4)
+        ]
+        for thread in threads:
+
+            thread.start()
+
+        for thread in threads:
+
+            thread.join()
+
+        metrics = requests.get(running.url + '/metrics').json()
+        missing = requests.get(running.url + '/missing')
+
+    assert [response.status_code for response in responses] == [200] * 4
+    assert responses[2].json() == {
+        'mentions': ['user2'],
+        'links': [
+            {'url': 'http://sites.com', 'title': 'Title of http://sites.com/'},
+        ],
+    }
+    assert fetched == ['http://sites.com/']
+    assert metrics['items'] == 4
+    assert metrics['fetches'] == 1
+    assert metrics['hrefs'] == 4
+    assert missing.status_code == 404
+
+
+def test_service_reports_dns_metrics(fetched):
+    """Ensure the lookup timing of a DNS cache is part of the metrics."""
+    extractor = service.Extractor(
+        title_provider=fake_titles,
+        resolver=resolver.CachingResolver(resolver.StubResolver({})),
+    )
+    running = service.Service(port=0, extractor=extractor)
+    metrics = running.metrics()
+    running.stop()
+    assert metrics['dns']['lookups'] == 0
+    assert 'mean_lookup' in metrics['dns']
+
+
+@pytest.mark.parametrize('number', (errno.ECONNRESET, errno.EPIPE))
+def test_server_ignores_early_disconnects(capsys, number):
+    """Ensure clients that hang up early do not print tracebacks."""
+    server = service._Server(('127.0.0.1', 0), BaseHTTPRequestHandler)
+    try:
+
+        raise socket.error(number, 'disconnected')
+
+    except socket.error:
+
+        server.handle_error(None, ('127.0.0.1', 0))
+
+    server.server_close()
+    assert capsys.readouterr().err == ''
+
+
+def test_server_reports_other_errors(capsys):
+    """Ensure unexpected handler errors are still reported."""
+    server = service._Server(('127.0.0.1', 0), BaseHTTPRequestHandler)
+    try:
+
+        raise ValueError('broken')
+
+    except ValueError:
+
+        server.handle_error(None, ('127.0.0.1', 0))
+
+    server.server_close()
+    assert 'ValueError' in capsys.readouterr().err
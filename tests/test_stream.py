@@ -0,0 +1,67 @@
+"""Test suites for the chunked extraction tools."""
+
+from __future__ import division
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import io
+
+import pytest
+
+from chattools import emoticon
+from chattools import href
+from chattools import mention
+from chattools import stream
+
+
+TEXT = (
+    '@mary see https://example.com/some_page (mindblown) and '
+    'http://digg.com/ (yes! it is alive!) @geetha (emoti(con)) (beer)'
+)
+
+
+def split(text, size):
+    """Split text into chunks of a given size."""
+    return [text[index:index + size] for index in range(0, len(text), size)]
+
+
+@pytest.mark.parametrize('size', (1, 2, 3, 7, 16, 1000))
+def test_streams_match_whole_message(size):
+    """Ensure entities split between chunks are found whole."""
+    chunks = split(TEXT, size)
+    assert tuple(stream.hrefs(chunks)) == tuple(href.hrefs(TEXT))
+    assert tuple(stream.mentions(chunks)) == tuple(mention.mentions(TEXT))
+    assert tuple(stream.emoticons(chunks)) == tuple(emoticon.emoticons(TEXT))
+
+
+def test_streams_read_file_like_objects():
+    """Ensure file-like sources are read in chunks."""
+    assert tuple(stream.mentions(io.StringIO(TEXT), chunk_size=4)) == (
+        'mary',
+        'geetha',
+    )
+
+
+def test_streams_accept_strings():
+    """Ensure a whole message can be given as a string."""
+    assert tuple(stream.emoticons(TEXT)) == ('mindblown', 'beer')
+
+
+def test_emoticons_produce_results_as_found():
+    """Ensure results are produced before the source is exhausted."""
+    def source():
+
+        yield '(beer) (mind'
+        yield 'blown'
+        raise AssertionError('Read past the first emoticons.')
+
+    results = stream.emoticons(source())
+    assert next(results) == 'beer'
+
+
+def test_segments_bound_carried_text():
+    """Ensure text without whitespace is not carried without limit."""
+    pieces = tuple(stream.segments(['x' * 10] * 10, max_token=25))
+    assert max(len(piece) for piece in pieces) <= 35
+    assert ''.join(pieces) == 'x' * 100
@@ -0,0 +1,58 @@
+"""Test suites for the UTF-8 extraction tools."""
+
+from __future__ import division
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import pytest
+
+from chattools import emoticon
+from chattools import href
+from chattools import mention
+from chattools import utf8
+
+
+TEXTS = (
+    'is anybody there?',
+    '@mary check https://example.com/some_page (beer)',
+    '@josé and @名前 shared http://example.com/café (ok)',
+    'é@mary “@geetha” @@riddhi devtools@ourcorp.com',
+    'Quoted “http://example.com/page” and «http://one.com»',
+    'ßhttp://two.net éexample.com example.comé .q.co.uk/ü',
+    '(emoti(con)) (日本) (1234567890123456) (ünïcödé) ()',
+)
+
+
+@pytest.mark.parametrize('text', TEXTS)
+@pytest.mark.parametrize('kind', (bytes, bytearray, memoryview))
+def test_utf8_extractors_match_text_extractors(text, kind):
+    """Ensure the bytes extractors find the same content as the text ones."""
+    data = kind(text.encode('utf-8'))
+    assert tuple(utf8.hrefs(data)) == tuple(href.hrefs(text))
+    assert tuple(utf8.mentions(data)) == tuple(mention.mentions(text))
+    assert tuple(utf8.emoticons(data)) == tuple(emoticon.emoticons(text))
+
+
+@pytest.mark.parametrize('text', TEXTS)
+def test_utf8_spans_are_byte_offsets(text):
+    """Ensure spans index the encoded message."""
+    data = text.encode('utf-8')
+    for start, end, value in utf8.href_spans(data):
+
+        assert data[start:end].decode('utf-8') == value
+
+    for start, end, value in utf8.mention_spans(data):
+
+        assert data[start:end].decode('utf-8') == '@' + value
+
+    for start, end, value in utf8.emoticon_spans(data):
+
+        assert data[start:end].decode('utf-8') == '({0})'.format(value)
+
+
+def test_utf8_emoticon_length_counts_characters():
+    """Ensure the maximum emoticon length is measured in characters."""
+    data = '(ééééé)'.encode('utf-8')
+    assert tuple(utf8.emoticons(data, max_length=5)) == ('ééééé',)
+    assert not tuple(utf8.emoticons(data, max_length=4))